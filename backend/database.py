@@ -2,10 +2,11 @@
 Database configuration and models for video metadata caching
 """
 import os
-from sqlalchemy import create_engine, Column, String, Integer, Text, DateTime, JSON
+from sqlalchemy import create_engine, Column, String, Integer, Float, Text, DateTime, JSON, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
+from contextlib import contextmanager
 
 # Database URL from environment variable (Railway provides DATABASE_URL)
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -36,16 +37,25 @@ class VideoMetadata(Base):
     title = Column(String(500))
     thumbnail_url = Column(String(500))
     view_count = Column(Integer)
+    like_count = Column(Integer, nullable=True)
+    comment_count = Column(Integer, nullable=True)
     channel_id = Column(String(50))
     channel_title = Column(String(200))
+    published_at = Column(String(30), nullable=True)  # ISO 8601, drives the adaptive TTL
+    view_velocity = Column(Float, nullable=True)      # Views/hour observed between stats refreshes
     
     # Cached data
     transcript = Column(Text, nullable=True)  # Full transcript
     comments = Column(JSON, nullable=True)    # Top 50 comments as JSON array
     
+    # Negative cache - {"transcript": {"reason": ..., "checked_at": ...}, "comments": {...}}
+    unavailable = Column(JSON, nullable=True)
+    
     # Metadata
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    stats_refreshed_at = Column(DateTime, nullable=True)  # Last statistics-only refresh
+    comments_refreshed_at = Column(DateTime, nullable=True)  # Last comment fetch, even if it stored nothing new
     
     def to_dict(self):
         """Convert to dictionary for easy serialization"""
@@ -54,12 +64,19 @@ class VideoMetadata(Base):
             'title': self.title,
             'thumbnail_url': self.thumbnail_url,
             'view_count': self.view_count,
+            'like_count': self.like_count,
+            'comment_count': self.comment_count,
             'channel_id': self.channel_id,
             'channel_title': self.channel_title,
+            'published_at': self.published_at,
+            'view_velocity': self.view_velocity,
             'transcript': self.transcript,
             'comments': self.comments,
+            'unavailable': self.unavailable,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'stats_refreshed_at': self.stats_refreshed_at.isoformat() if self.stats_refreshed_at else None,
+            'comments_refreshed_at': self.comments_refreshed_at.isoformat() if self.comments_refreshed_at else None
         }
 
 
@@ -81,6 +98,7 @@ class ChannelCache(Base):
     # Metadata
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    stats_refreshed_at = Column(DateTime, nullable=True)  # Last statistics-only refresh
     
     def to_dict(self):
         """Convert to dictionary for easy serialization"""
@@ -92,16 +110,139 @@ class ChannelCache(Base):
             'video_count': self.video_count,
             'videos': self.videos,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'stats_refreshed_at': self.stats_refreshed_at.isoformat() if self.stats_refreshed_at else None
         }
 
 
+class ChannelSyncState(Base):
+    """
+    Incremental sync watermark for a channel's uploads playlist
+    Lets get_channel_videos page only until it reaches already-known videos
+    """
+    __tablename__ = "channel_sync_state"
+    
+    channel_id = Column(String(50), primary_key=True, index=True)
+    uploads_playlist_id = Column(String(50))
+    
+    # Watermark - newest upload seen on the last sync
+    newest_video_id = Column(String(20), nullable=True)
+    newest_published_at = Column(String(30), nullable=True)
+    
+    # Every upload ID seen (newest first, shorts included) and the long-form video objects
+    known_video_ids = Column(JSON, nullable=True)
+    videos = Column(JSON, nullable=True)
+    
+    # Metadata
+    last_synced_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ApiQuotaUsage(Base):
+    """
+    Persistent ledger of YouTube Data API quota units, one row per quota day and endpoint
+    """
+    __tablename__ = "api_quota_usage"
+    
+    day = Column(String(10), primary_key=True)        # Pacific-time date (quota reset boundary)
+    endpoint = Column(String(50), primary_key=True)   # e.g. 'search', 'videos'
+    units = Column(Integer, default=0)
+    calls = Column(Integer, default=0)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ApiKeyUsage(Base):
+    """
+    Per-key YouTube Data API usage for one quota day, including quarantine after quotaExceeded
+    """
+    __tablename__ = "api_key_usage"
+    
+    day = Column(String(10), primary_key=True)        # Pacific-time date (quota reset boundary)
+    key_id = Column(String(16), primary_key=True)     # Hash of the key - never the key itself
+    units = Column(Integer, default=0)
+    calls = Column(Integer, default=0)
+    quarantine_reason = Column(String(50), nullable=True)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ApiResponseCache(Base):
+    """
+    Raw YouTube API list responses with their ETag, revalidated with If-None-Match
+    """
+    __tablename__ = "api_response_cache"
+    
+    cache_key = Column(String(64), primary_key=True)   # sha256 of endpoint + request params
+    endpoint = Column(String(50))
+    etag = Column(String(100))
+    body = Column(JSON)
+    
+    # Metadata
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    revalidated_at = Column(DateTime, nullable=True)   # Last 304 Not Modified
+
+
+class ChannelHandle(Base):
+    """
+    Resolved @handle -> channel_id mappings (handles rarely change, so lookups are memoized)
+    """
+    __tablename__ = "channel_handles"
+    
+    handle = Column(String(100), primary_key=True)   # Lowercased, with leading '@'
+    channel_id = Column(String(50), nullable=True)   # None if the handle did not resolve
+    
+    # Metadata
+    resolved_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class LLMResponseCache(Base):
+    """
+    OpenAI completions keyed by a hash of the full request (model, messages, sampling params)
+    """
+    __tablename__ = "llm_response_cache"
+
+    cache_key = Column(String(64), primary_key=True)   # sha256 of the canonical request
+    model = Column(String(100))
+    response = Column(Text)
+    size_bytes = Column(Integer, default=0)
+    hit_count = Column(Integer, default=0)
+
+    # Metadata
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)   # For LRU eviction
+
+
 def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
     print("✅ Database tables created successfully")
 
 
+def add_missing_columns():
+    """
+    create_all() does not alter existing tables - add any nullable columns
+    introduced since a table was first created
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {col['name'] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                print(f"✅ Added column {table.name}.{column.name}")
+
+
 def get_db():
     """Get database session"""
     db = SessionLocal()
@@ -110,3 +251,13 @@ def get_db():
     finally:
         db.close()
 
+
+
+@contextmanager
+def session_scope():
+    """Database session for code running outside a request (services, background tasks)"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -1,22 +1,30 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, BackgroundTasks
 from sqlalchemy.orm import Session
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 import os
 import json
 import re
 from dotenv import load_dotenv
 
 from services.youtube_service import YouTubeService
-from services.ai_service import AIService
+from services.ai_service import AIService, DEFAULT_MODEL
 from services.pdf_service import PDFService
 from services.niche_service import NicheService
 from services.static_data_service import StaticDataService
 from services.db_service import DatabaseService
+from services.quota_service import QuotaExceededError
+from services.channel_refresh import ChannelRefresher
+from services.refresh_scheduler import RefreshAheadScheduler
+from services.prefetcher import SpeculativePrefetcher
+from services.priority_lanes import request_lane, BACKGROUND
+from services.streaming import IncrementalJSONParser, sse_event, sse_response
+from services.prompt_budget import PromptBuilder
+from services.map_reduce import MapReduceAnalyzer
 
 # Database imports
-from database import init_db, get_db
+from database import init_db, get_db, session_scope
 
 # Force load .env file and override any existing environment variables
 load_dotenv(override=True)
@@ -58,18 +66,25 @@ app.add_middleware(
 
 # Initialize services with error handling
 try:
+    # YOUTUBE_API_KEYS (comma-separated) spreads quota over several keys
+    youtube_api_keys = [k.strip() for k in os.getenv("YOUTUBE_API_KEYS", "").split(",") if k.strip()]
     youtube_api_key = os.getenv("YOUTUBE_API_KEY")
+    if youtube_api_key and youtube_api_key not in youtube_api_keys:
+        youtube_api_keys.insert(0, youtube_api_key)
     openai_api_key = os.getenv("OPENAI_API_KEY")
     
-    if not youtube_api_key:
+    if not youtube_api_keys:
         print("WARNING: YOUTUBE_API_KEY not set")
     if not openai_api_key:
         print("WARNING: OPENAI_API_KEY not set")
     
-    youtube_service = YouTubeService(api_key=youtube_api_key)
+    youtube_service = YouTubeService(api_keys=youtube_api_keys)
     ai_service = AIService(api_key=openai_api_key)
     pdf_service = PDFService()
     niche_service = NicheService()
+    channel_refresher = ChannelRefresher(youtube_service)
+    refresh_scheduler = RefreshAheadScheduler(channel_refresher, youtube_service.quota)
+    prefetcher = SpeculativePrefetcher(youtube_service)
     static_data_service = StaticDataService()
     print("✅ All services initialized successfully")
 except Exception as e:
@@ -77,6 +92,31 @@ except Exception as e:
     raise
 
 
+@app.on_event("startup")
+async def resolve_niche_handles():
+    """Resolve niche channel handles once so niche sweeps never pay for lookups"""
+    try:
+        await niche_service.resolve_handles(youtube_service)
+    except Exception as e:
+        print(f"⚠️ Could not resolve niche channel handles: {e}")
+
+
+@app.on_event("startup")
+async def start_refresh_scheduler():
+    """Start refreshing hot channel caches ahead of expiry"""
+    if os.getenv("REFRESH_AHEAD_ENABLED", "true").lower() != "false":
+        refresh_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_services():
+    """Stop background jobs and close pooled HTTP clients on shutdown"""
+    await refresh_scheduler.stop()
+    await prefetcher.stop()
+    await youtube_service.close()
+    await ai_service.close()
+
+
 # Health check endpoint for Railway
 @app.get("/")
 async def root():
@@ -90,7 +130,7 @@ async def health_check():
     return {
         "status": "healthy", 
         "service": "YouTube Topic Analyzer API",
-        "youtube_api": "configured" if os.getenv("YOUTUBE_API_KEY") else "missing",
+        "youtube_api": "configured" if len(youtube_service.key_pool) else "missing",
         "openai_api": "configured" if os.getenv("OPENAI_API_KEY") else "missing"
     }
 
@@ -107,6 +147,8 @@ class ChannelSetupRequest(BaseModel):
     channel_id: str
     channel_name: str
     max_videos: Optional[int] = 100
+    stale_while_revalidate: bool = True  # Serve a recently-expired cache and refresh in the background
+    prefetch: Optional[bool] = None       # Warm top videos' transcripts/comments (default: PREFETCH_ENABLED)
 
 
 class VideoSelectionRequest(BaseModel):
@@ -123,12 +165,14 @@ class SuggestSeriesRequest(BaseModel):
     selected_video_ids: List[str]
     has_pdf_data: bool = False
     additional_prompt: Optional[str] = None
+    use_cache: bool = True  # False forces a fresh completion
 
 
 class SuggestFormatRequest(BaseModel):
     my_video_ids: List[str]
     competitor_video_ids: List[str]
     additional_prompt: Optional[str] = None
+    use_cache: bool = True  # False forces a fresh completion
 
 
 class SearchSimilarTitlesRequest(BaseModel):
@@ -146,12 +190,15 @@ class ReverseEngineeringPromptRequest(BaseModel):
     filenames: List[str]
     custom_prompt: str
     selected_video_ids: Optional[List[str]] = None
+    use_cache: bool = True  # False forces a fresh completion
+    mode: str = "single"  # 'single', 'map_reduce', or 'auto' (map-reduce only when the videos don't fit one prompt)
 
 
 class ReverseEngineeringChatRequest(BaseModel):
     filenames: List[str]
     conversation_history: List[Dict]
     new_message: str
+    use_cache: bool = True  # False forces a fresh completion
 
 
 class TopicAnalysisRequest(BaseModel):
@@ -160,6 +207,7 @@ class TopicAnalysisRequest(BaseModel):
     custom_prompt: str
     filenames: Optional[List[str]] = []
     channel_ids: Optional[List[str]] = []
+    use_cache: bool = True  # False forces a fresh completion
 
 
 class TopicChatRequest(BaseModel):
@@ -169,6 +217,7 @@ class TopicChatRequest(BaseModel):
     new_message: str
     filenames: Optional[List[str]] = []
     channel_ids: Optional[List[str]] = []
+    use_cache: bool = True  # False forces a fresh completion
 
 
 class SearchNicheTitlesRequest(BaseModel):
@@ -182,49 +231,83 @@ class SearchNicheTitlesRequest(BaseModel):
 
 
 @app.post("/api/channel/setup")
-async def setup_channel(request: ChannelSetupRequest, db: Session = Depends(get_db)):
+async def setup_channel(request: ChannelSetupRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """Setup primary channel and fetch basic info (with database caching)"""
     try:
         db_service = DatabaseService(db)
+        max_vids = request.max_videos if request.max_videos else 100
+        refresh_scheduler.record_access(request.channel_id, max_vids)
+        prefetch = prefetcher.enabled if request.prefetch is None else request.prefetch
         
-        # Check if channel is cached and fresh (< 24 hours old)
+        # Check if channel is cached and fresh (TTL adapts to how recently the channel uploaded)
         cached_channel = db_service.get_channel_cache(request.channel_id)
-        if cached_channel and db_service.is_channel_cache_fresh(request.channel_id, max_age_hours=24):
-            print(f"💾 Using cached channel data for {request.channel_id}")
-            return {
-                "success": True,
-                "channel": {
-                    "id": cached_channel.channel_id,
-                    "title": cached_channel.channel_title,
-                    "subscriber_count": cached_channel.subscriber_count,
-                    "video_count": cached_channel.video_count
-                },
-                "recent_videos": cached_channel.videos,
-                "from_cache": True
-            }
+        if cached_channel:
+            expires_in = db_service.channel_cache_expires_in(cached_channel)
+            stale = expires_in <= 0
+            
+            # Stale but within the grace window - answer from the DB, revalidate after responding
+            if not stale or (request.stale_while_revalidate and channel_refresher.within_grace(expires_in)):
+                refreshing = False
+                if stale:
+                    channel_refresher.stats["stale_served"] += 1
+                    channel_refresher.schedule(background_tasks, request.channel_id, max_vids)
+                    refreshing = channel_refresher.is_refreshing(request.channel_id)
+                    print(f"💾 Serving stale channel data for {request.channel_id} while revalidating")
+                else:
+                    print(f"💾 Using cached channel data for {request.channel_id}")
+                if prefetch:
+                    background_tasks.add_task(prefetcher.start, [v.get('video_id') for v in cached_channel.videos or []])
+                return {
+                    "success": True,
+                    "channel": {
+                        "id": cached_channel.channel_id,
+                        "title": cached_channel.channel_title,
+                        "subscriber_count": cached_channel.subscriber_count,
+                        "video_count": cached_channel.video_count
+                    },
+                    "recent_videos": cached_channel.videos,
+                    "from_cache": True,
+                    "stale": stale,
+                    "refreshing": refreshing
+                }
         
-        # Cache miss or stale - fetch from YouTube API
+        # Cache miss or too stale - fetch from YouTube API
         print(f"📥 Fetching fresh channel data for {request.channel_id}")
-        channel_info = await youtube_service.get_channel_info(request.channel_id)
-        max_vids = request.max_videos if request.max_videos else 100
-        recent_videos = await youtube_service.get_channel_videos(request.channel_id, max_results=max_vids)
-        
-        # Save to database cache
-        db_service.save_channel_cache(
-            channel_id=request.channel_id,
-            channel_title=channel_info.get('title', ''),
-            thumbnail_url=channel_info.get('thumbnail', ''),
-            subscriber_count=int(channel_info.get('subscriber_count', 0)),
-            video_count=int(channel_info.get('video_count', 0)),
-            videos=recent_videos
-        )
-        print(f"✅ Saved channel {request.channel_id} to database cache")
+        fresh = await channel_refresher.refresh_inline(request.channel_id, max_vids)
+        if prefetch:
+            background_tasks.add_task(prefetcher.start, [v.get('video_id') for v in fresh["recent_videos"]])
         
         return {
             "success": True,
-            "channel": channel_info,
-            "recent_videos": recent_videos,
-            "from_cache": False
+            "channel": fresh["channel"],
+            "recent_videos": fresh["recent_videos"],
+            "from_cache": False,
+            "stale": False,
+            "refreshing": False
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def quota_http_exception(e: QuotaExceededError) -> HTTPException:
+    """429 with Retry-After for calls refused by the quota admission controller"""
+    return HTTPException(
+        status_code=429,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after_seconds)}
+    )
+
+
+@app.get("/api/quota")
+async def get_quota_usage(days: int = 7):
+    """YouTube API quota usage with per-endpoint, per-day and per-key breakdowns"""
+    import asyncio
+    try:
+        return {
+            "success": True,
+            **(await asyncio.to_thread(youtube_service.quota.get_report, days=days)),
+            "keys": youtube_service.key_pool.get_report(),
+            "key_failovers": youtube_service.key_pool.failovers
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -252,6 +335,18 @@ async def clear_channel_cache(channel_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/cache/refresh-stats")
+async def refresh_cached_statistics(channel_id: Optional[str] = None):
+    """Patch view/like/comment counts of cached videos (one channel, or all) without a full re-fetch"""
+    try:
+        result = await youtube_service.refresh_statistics(channel_id)
+        return {"success": True, **result}
+    except QuotaExceededError as e:
+        raise quota_http_exception(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/cache/stats")
 async def get_cache_stats(db: Session = Depends(get_db)):
     """Get cache statistics"""
@@ -266,9 +361,10 @@ async def get_cache_stats(db: Session = Depends(get_db)):
         return {
             **video_stats,
             "total_channels": channel_count,
+            "etag_revalidation": youtube_service.etag_store.get_stats(),
             "cache_info": {
                 "video_cache_ttl": "永久 (permanent)",
-                "channel_cache_ttl": "24 hours",
+                "channel_cache_ttl": db_service.ttl_policy.describe('channel'),
                 "database_type": "PostgreSQL" if "postgresql" in os.getenv("DATABASE_URL", "") else "SQLite"
             }
         }
@@ -276,6 +372,71 @@ async def get_cache_stats(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/cache/memory")
+async def get_memory_cache_stats():
+    """Hit/miss/eviction counters for the in-process caches and in-flight call sharing"""
+    return {
+        "success": True,
+        "caches": [
+            youtube_service.transcript_cache.stats(),
+            youtube_service.comments_cache.stats()
+        ],
+        "singleflight": youtube_service.singleflight.get_stats(),
+        "channel_revalidation": channel_refresher.get_stats(),
+        "prefetch": prefetcher.get_stats()
+    }
+
+
+@app.get("/api/cache/refresh-ahead")
+async def get_refresh_ahead_stats():
+    """Refresh-ahead scheduler queue, hottest channels and last-run stats"""
+    try:
+        return {"success": True, **refresh_scheduler.get_stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/cache/llm")
+async def get_llm_cache_stats():
+    """Hit/miss counters, evictions and size of the LLM response cache"""
+    import asyncio
+    try:
+        return {"success": True, **(await asyncio.to_thread(ai_service.cache.get_stats))}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/cache/llm/clear")
+async def clear_llm_cache():
+    """Delete every cached LLM response"""
+    import asyncio
+    try:
+        deleted = await asyncio.to_thread(ai_service.cache.clear)
+        return {"success": True, "message": f"Cleared {deleted} cached LLM responses"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/scheduler/lanes")
+async def get_lane_metrics():
+    """Per-lane queue depth, in-flight calls and queue-wait percentiles for each upstream"""
+    return {
+        "success": True,
+        "youtube": youtube_service.client.scheduler.get_metrics(),
+        "transcripts": youtube_service.transcript_fetcher.scheduler.get_metrics(),
+        "openai": ai_service.scheduler.get_metrics()
+    }
+
+
+@app.get("/api/transcripts/metrics")
+async def get_transcript_metrics():
+    """Queue depth, latency percentiles and retry counters for the transcript thread pool"""
+    return {
+        "success": True,
+        **youtube_service.transcript_fetcher.get_metrics()
+    }
+
+
 @app.get("/api/cache/channels")
 async def get_cached_channels(db: Session = Depends(get_db)):
     """Get list of all cached channels for quick access"""
@@ -302,277 +463,330 @@ class TemplateAnalysisRequest(BaseModel):
     video_ids: List[str]
     template_id: str
     custom_prompt: str
+    use_cache: bool = True  # False forces a fresh completion
 
 
-@app.post("/api/analyze/template")
-async def analyze_with_template(request: TemplateAnalysisRequest, db: Session = Depends(get_db)):
-    """Analyze videos with a specific template (with database caching)"""
-    try:
-        print(f"🔍 Fetching data for {len(request.video_ids)} videos...")
-        
-        # Initialize database service
-        db_service = DatabaseService(db)
-        
-        # Check cache first
-        cached_videos = db_service.get_multiple_videos(request.video_ids)
-        print(f"💾 Found {len(cached_videos)}/{len(request.video_ids)} videos in cache")
-        
-        # Separate cached and uncached videos
-        uncached_video_ids = [vid for vid in request.video_ids if vid not in cached_videos]
-        
-        # Fetch uncached videos from YouTube API
-        import asyncio
-        video_infos = []
-        video_data_map = {}
+async def build_template_prompt(request: TemplateAnalysisRequest, db: Session) -> str:
+    """Load the selected videos (database cache first, then YouTube) and build the template prompt"""
+    db_service = DatabaseService(db)
+    
+    # Check cache first - rows written only by the transcript/comment cache
+    # have no title yet, so their video info still has to be fetched; stale rows
+    # (per the age/velocity TTL policy) are re-fetched too
+    cached_videos = {
+        vid: video for vid, video in db_service.get_multiple_videos(request.video_ids).items()
+        if video.title and db_service.is_video_fresh(video)
+    }
+    print(f"💾 Found {len(cached_videos)}/{len(request.video_ids)} videos in cache")
+    
+    # Separate cached and uncached videos
+    uncached_video_ids = [vid for vid in request.video_ids if vid not in cached_videos]
+    
+    # Fetch uncached videos from YouTube API
+    import asyncio
+    video_infos = []
+    video_data_map = {}
+    
+    if uncached_video_ids:
+        print(f"📥 Fetching {len(uncached_video_ids)} videos from YouTube API...")
+        video_info_tasks = [youtube_service.get_video_info(vid) for vid in uncached_video_ids]
+        video_data_task = youtube_service.get_video_data_parallel(uncached_video_ids, max_comments=50)
+        
+        uncached_infos, uncached_data = await asyncio.gather(
+            asyncio.gather(*video_info_tasks, return_exceptions=True),
+            video_data_task
+        )
         
-        if uncached_video_ids:
-            print(f"📥 Fetching {len(uncached_video_ids)} videos from YouTube API...")
-            video_info_tasks = [youtube_service.get_video_info(vid) for vid in uncached_video_ids]
-            video_data_task = youtube_service.get_video_data_parallel(uncached_video_ids, max_comments=50)
+        # Save to database
+        for i, video_id in enumerate(uncached_video_ids):
+            video_info = uncached_infos[i]
+            if isinstance(video_info, Exception):
+                print(f"⚠️ Error fetching video {video_id}: {video_info}")
+                continue
             
-            uncached_infos, uncached_data = await asyncio.gather(
-                asyncio.gather(*video_info_tasks, return_exceptions=True),
-                video_data_task
-            )
+            data = uncached_data.get(video_id, {})
             
             # Save to database
-            for i, video_id in enumerate(uncached_video_ids):
-                video_info = uncached_infos[i]
-                if isinstance(video_info, Exception):
-                    print(f"⚠️ Error fetching video {video_id}: {video_info}")
-                    continue
-                
-                data = uncached_data.get(video_id, {})
-                
-                # Save to database
-                try:
-                    db_service.save_video_metadata(
-                        video_id=video_id,
-                        title=video_info.get('title', ''),
-                        thumbnail_url=video_info.get('thumbnail', ''),
-                        view_count=int(video_info.get('view_count', 0)) if video_info.get('view_count') else 0,
-                        channel_id=video_info.get('channel_id', ''),
-                        channel_title=video_info.get('channel_title', ''),
-                        transcript=data.get('transcript'),
-                        comments=data.get('comments')
-                    )
-                    print(f"✅ Saved video {video_id} to database")
-                except Exception as e:
-                    print(f"⚠️ Error saving video {video_id} to database: {e}")
-            
-            video_infos = uncached_infos
-            video_data_map = uncached_data
-        
-        # Build comprehensive context from cache + fresh data
-        context_parts = []
-        context_parts.append("=== VIDEO DATA ===\n")
-        
-        for i, video_id in enumerate(request.video_ids):
-            # Get data from cache or fresh fetch
-            if video_id in cached_videos:
-                cached_video = cached_videos[video_id]
-                title = cached_video.title
-                view_count = cached_video.view_count
-                thumbnail = cached_video.thumbnail_url
-                transcript = cached_video.transcript or ''
-                comments = cached_video.comments or []
-                print(f"💾 Using cached data for video {video_id}")
-            else:
-                # Find in freshly fetched data
-                video_idx = uncached_video_ids.index(video_id) if video_id in uncached_video_ids else -1
-                if video_idx == -1 or video_idx >= len(video_infos):
-                    print(f"⚠️ Skipping video {video_id} - not found")
-                    continue
-                
-                video_info = video_infos[video_idx]
-                if isinstance(video_info, Exception):
-                    print(f"⚠️ Skipping video {video_id} due to error: {video_info}")
-                    continue
-                
-                data = video_data_map.get(video_id, {})
-                title = video_info.get('title', 'N/A')
-                view_count = video_info.get('view_count', 0)
-                thumbnail = video_info.get('thumbnail', 'N/A')
-                transcript = data.get('transcript', '')
-                comments = data.get('comments', [])
-            
-            context_parts.append(f"\n--- VIDEO {i+1} ---")
-            context_parts.append(f"Title: {title}")
-            
-            # Format view count safely (handle both int and string)
             try:
-                view_count_int = int(view_count) if view_count else 0
-                context_parts.append(f"Views: {view_count_int:,}")
-            except (ValueError, TypeError):
-                context_parts.append(f"Views: {view_count}")
-            
-            context_parts.append(f"Thumbnail: {thumbnail}")
-            
-            if transcript:
-                # Include more transcript for better analysis
-                context_parts.append(f"\nTranscript (first 3000 chars):\n{transcript[:3000]}")
+                db_service.save_video_metadata(
+                    video_id=video_id,
+                    title=video_info.get('title', ''),
+                    thumbnail_url=video_info.get('thumbnail', ''),
+                    view_count=int(video_info.get('view_count', 0)) if video_info.get('view_count') else 0,
+                    channel_id=video_info.get('channel_id', ''),
+                    channel_title=video_info.get('channel_title', ''),
+                    transcript=data.get('transcript'),
+                    comments=data.get('comments'),
+                    like_count=int(video_info['like_count']) if video_info.get('like_count') else None,
+                    comment_count=int(video_info['comment_count']) if video_info.get('comment_count') else None,
+                    published_at=video_info.get('published_at')
+                )
+                print(f"✅ Saved video {video_id} to database")
+            except Exception as e:
+                print(f"⚠️ Error saving video {video_id} to database: {e}")
+        
+        video_infos = uncached_infos
+        video_data_map = uncached_data
+    
+    # Build comprehensive context from cache + fresh data
+    context_parts = []
+    context_parts.append("=== VIDEO DATA ===\n")
+    
+    for i, video_id in enumerate(request.video_ids):
+        # Get data from cache or fresh fetch
+        if video_id in cached_videos:
+            cached_video = cached_videos[video_id]
+            title = cached_video.title
+            view_count = cached_video.view_count
+            thumbnail = cached_video.thumbnail_url
+            transcript = cached_video.transcript or ''
+            comments = cached_video.comments or []
+            print(f"💾 Using cached data for video {video_id}")
+        else:
+            # Find in freshly fetched data
+            video_idx = uncached_video_ids.index(video_id) if video_id in uncached_video_ids else -1
+            if video_idx == -1 or video_idx >= len(video_infos):
+                print(f"⚠️ Skipping video {video_id} - not found")
+                continue
             
-            if comments:
-                comment_texts = []
-                for c in comments[:20]:  # Top 20 comments
-                    text = c.get('text', '')
-                    likes = c.get('like_count', 0)
-                    comment_texts.append(f"[{likes} likes] {text}")
-                context_parts.append(f"\nTop Comments:\n" + "\n".join(comment_texts))
+            video_info = video_infos[video_idx]
+            if isinstance(video_info, Exception):
+                print(f"⚠️ Skipping video {video_id} due to error: {video_info}")
+                continue
             
-            context_parts.append("\n")
+            data = video_data_map.get(video_id, {})
+            title = video_info.get('title', 'N/A')
+            view_count = video_info.get('view_count', 0)
+            thumbnail = video_info.get('thumbnail', 'N/A')
+            transcript = data.get('transcript', '')
+            comments = data.get('comments', [])
         
-        full_context = "\n".join(context_parts)
+        context_parts.append(f"\n--- VIDEO {i+1} ---")
+        context_parts.append(f"Title: {title}")
         
-        # Run AI analysis - use ONLY the template prompt, no additional instructions
-        analysis_prompt = f"""{request.custom_prompt}
+        # Format view count safely (handle both int and string)
+        try:
+            view_count_int = int(view_count) if view_count else 0
+            context_parts.append(f"Views: {view_count_int:,}")
+        except (ValueError, TypeError):
+            context_parts.append(f"Views: {view_count}")
+        
+        context_parts.append(f"Thumbnail: {thumbnail}")
+        
+        if transcript:
+            # Include more transcript for better analysis
+            context_parts.append(f"\nTranscript (first 3000 chars):\n{transcript[:3000]}")
+        
+        if comments:
+            comment_texts = []
+            for c in comments[:20]:  # Top 20 comments
+                text = c.get('text', '')
+                likes = c.get('like_count', 0)
+                comment_texts.append(f"[{likes} likes] {text}")
+            context_parts.append(f"\nTop Comments:\n" + "\n".join(comment_texts))
+        
+        context_parts.append("\n")
+    
+    full_context = "\n".join(context_parts)
+    
+    # Run AI analysis - use ONLY the template prompt, no additional instructions
+    analysis_prompt = f"""{request.custom_prompt}
 
 {full_context}
 """
+    
+    return analysis_prompt
+
+
+def normalize_template_topic(item) -> Optional[Dict]:
+    """Coerce one item of a template response into {topic, reason}"""
+    if isinstance(item, dict):
+        topic_text = item.get('topic', '') or item.get('title', '')
+        reason_text = item.get('reason', '') or item.get('why', '') or item.get('explanation', '')
         
-        print(f"🤖 Running AI analysis with template: {request.template_id}")
-        response = await ai_service.generate_response(analysis_prompt)
-        
-        # Parse response - try to extract JSON array
-        print(f"📝 Raw AI response preview: {response[:500]}...")
-        
-        try:
-            # Clean the response - remove markdown code blocks if present
-            cleaned_response = response.strip()
-            if '```json' in cleaned_response:
-                # Extract content between ```json and ```
-                json_match = re.search(r'```json\s*([\s\S]*?)\s*```', cleaned_response)
-                if json_match:
-                    cleaned_response = json_match.group(1)
-            elif '```' in cleaned_response:
-                # Extract content between ``` and ```
-                json_match = re.search(r'```\s*([\s\S]*?)\s*```', cleaned_response)
-                if json_match:
-                    cleaned_response = json_match.group(1)
-            
-            # Try to find JSON array in response
-            json_match = re.search(r'\[[\s\S]*\]', cleaned_response)
+        if topic_text:
+            return {
+                'topic': topic_text.strip(),
+                'reason': reason_text.strip() if reason_text else 'This topic was identified based on the template analysis.'
+            }
+    elif isinstance(item, str):
+        return {
+            'topic': item.strip(),
+            'reason': 'This topic was identified based on the template analysis.'
+        }
+    return None
+
+
+def parse_template_topics(request: TemplateAnalysisRequest, response: str) -> Dict:
+    """Extract topics from a template analysis response (JSON array, else numbered-list fallback)"""
+    # Parse response - try to extract JSON array
+    print(f"📝 Raw AI response preview: {response[:500]}...")
+    
+    try:
+        # Clean the response - remove markdown code blocks if present
+        cleaned_response = response.strip()
+        if '```json' in cleaned_response:
+            # Extract content between ```json and ```
+            json_match = re.search(r'```json\s*([\s\S]*?)\s*```', cleaned_response)
             if json_match:
-                topics = json.loads(json_match.group())
-                if isinstance(topics, list):
-                    # Validate format
-                    parsed_topics = []
-                    for item in topics:
-                        if isinstance(item, dict):
-                            topic_text = item.get('topic', '') or item.get('title', '')
-                            reason_text = item.get('reason', '') or item.get('why', '') or item.get('explanation', '')
-                            
-                            if topic_text:
-                                parsed_topics.append({
-                                    'topic': topic_text.strip(),
-                                    'reason': reason_text.strip() if reason_text else 'This topic was identified based on the template analysis.'
-                                })
-                        elif isinstance(item, str):
-                            parsed_topics.append({
-                                'topic': item.strip(),
-                                'reason': 'This topic was identified based on the template analysis.'
-                            })
-                    
-                    if parsed_topics:
-                        print(f"✅ Successfully parsed {len(parsed_topics)} topics with reasons")
-                        print(f"📊 Sample topic: {parsed_topics[0]}")
-                        return {
-                            "success": True,
-                            "template_id": request.template_id,
-                            "topics": parsed_topics[:15],  # Return max 15 topics
-                            "videos_analyzed": len(request.video_ids)
-                        }
-            
-            # Fallback: Try to parse numbered list with "Why:" format
-            print("⚠️  JSON parsing failed, trying text-based extraction...")
-            lines = response.split('\n')
-            parsed_topics = []
-            current_topic = None
-            current_reason = None
-            
-            for line in lines:
-                line = line.strip()
-                # Look for numbered lines or bold topics
-                if re.match(r'^\d+\.\s*\*\*(.+?)\*\*', line):
-                    # Format: 1. **Topic Title**
-                    match = re.match(r'^\d+\.\s*\*\*(.+?)\*\*', line)
-                    if current_topic:
-                        parsed_topics.append({
-                            'topic': current_topic,
-                            'reason': current_reason or 'This topic was identified based on the template analysis.'
-                        })
-                    current_topic = match.group(1).strip()
-                    current_reason = None
-                    
-                    # Check if reason is on same line
-                    if '*Why:*' in line or 'Why:' in line:
-                        reason_match = re.search(r'\*Why:\*\s*(.+)', line) or re.search(r'Why:\s*(.+)', line)
-                        if reason_match:
-                            current_reason = reason_match.group(1).strip()
+                cleaned_response = json_match.group(1)
+        elif '```' in cleaned_response:
+            # Extract content between ``` and ```
+            json_match = re.search(r'```\s*([\s\S]*?)\s*```', cleaned_response)
+            if json_match:
+                cleaned_response = json_match.group(1)
+        
+        # Try to find JSON array in response
+        json_match = re.search(r'\[[\s\S]*\]', cleaned_response)
+        if json_match:
+            topics = json.loads(json_match.group())
+            if isinstance(topics, list):
+                # Validate format
+                parsed_topics = [topic for topic in map(normalize_template_topic, topics) if topic]
+                
+                if parsed_topics:
+                    print(f"✅ Successfully parsed {len(parsed_topics)} topics with reasons")
+                    print(f"📊 Sample topic: {parsed_topics[0]}")
+                    return {
+                        "success": True,
+                        "template_id": request.template_id,
+                        "topics": parsed_topics[:15],  # Return max 15 topics
+                        "videos_analyzed": len(request.video_ids)
+                    }
+        
+        # Fallback: Try to parse numbered list with "Why:" format
+        print("⚠️  JSON parsing failed, trying text-based extraction...")
+        lines = response.split('\n')
+        parsed_topics = []
+        current_topic = None
+        current_reason = None
+        
+        for line in lines:
+            line = line.strip()
+            # Look for numbered lines or bold topics
+            if re.match(r'^\d+\.\s*\*\*(.+?)\*\*', line):
+                # Format: 1. **Topic Title**
+                match = re.match(r'^\d+\.\s*\*\*(.+?)\*\*', line)
+                if current_topic:
+                    parsed_topics.append({
+                        'topic': current_topic,
+                        'reason': current_reason or 'This topic was identified based on the template analysis.'
+                    })
+                current_topic = match.group(1).strip()
+                current_reason = None
                 
-                elif current_topic and ('*Why:*' in line or 'Why:' in line):
-                    # Reason on separate line
+                # Check if reason is on same line
+                if '*Why:*' in line or 'Why:' in line:
                     reason_match = re.search(r'\*Why:\*\s*(.+)', line) or re.search(r'Why:\s*(.+)', line)
                     if reason_match:
                         current_reason = reason_match.group(1).strip()
             
-            # Add last topic
-            if current_topic:
-                parsed_topics.append({
-                    'topic': current_topic,
-                    'reason': current_reason or 'This topic was identified based on the template analysis.'
-                })
-            
-            if parsed_topics:
-                print(f"✅ Text extraction successful: {len(parsed_topics)} topics")
-                print(f"📊 Sample topic: {parsed_topics[0]}")
-                return {
-                    "success": True,
-                    "template_id": request.template_id,
-                    "topics": parsed_topics[:8],
-                    "videos_analyzed": len(request.video_ids)
-                }
-            
-            # Last resort fallback - only accept properly formatted lines
-            print("⚠️  All parsing methods failed, returning error")
-            # Don't try to parse broken output - force AI to retry with correct format
-            raise Exception("AI response was not in valid JSON format. Please try again.")
-            
-        except Exception as e:
-            print(f"⚠️ JSON parsing failed: {e}")
-            # Return error instead of broken output
-            raise HTTPException(
-                status_code=500, 
-                detail=f"AI returned invalid format. Please try regenerating. Error: {str(e)}"
-            )
+            elif current_topic and ('*Why:*' in line or 'Why:' in line):
+                # Reason on separate line
+                reason_match = re.search(r'\*Why:\*\s*(.+)', line) or re.search(r'Why:\s*(.+)', line)
+                if reason_match:
+                    current_reason = reason_match.group(1).strip()
+        
+        # Add last topic
+        if current_topic:
+            parsed_topics.append({
+                'topic': current_topic,
+                'reason': current_reason or 'This topic was identified based on the template analysis.'
+            })
+        
+        if parsed_topics:
+            print(f"✅ Text extraction successful: {len(parsed_topics)} topics")
+            print(f"📊 Sample topic: {parsed_topics[0]}")
+            return {
+                "success": True,
+                "template_id": request.template_id,
+                "topics": parsed_topics[:8],
+                "videos_analyzed": len(request.video_ids)
+            }
+        
+        # Last resort fallback - only accept properly formatted lines
+        print("⚠️  All parsing methods failed, returning error")
+        # Don't try to parse broken output - force AI to retry with correct format
+        raise Exception("AI response was not in valid JSON format. Please try again.")
+        
+    except Exception as e:
+        print(f"⚠️ JSON parsing failed: {e}")
+        # Return error instead of broken output
+        raise HTTPException(
+            status_code=500, 
+            detail=f"AI returned invalid format. Please try regenerating. Error: {str(e)}"
+        )
+
+
+def template_error_detail(error_msg: str) -> str:
+    """User-facing message for a failed template analysis"""
+    # Provide more specific error messages
+    if "quota" in error_msg.lower():
+        return "YouTube API quota exceeded. Please wait or use a different API key."
+    elif "api" in error_msg.lower() and "key" in error_msg.lower():
+        return "YouTube API key error. Please check your YOUTUBE_API_KEY environment variable."
+    elif "openai" in error_msg.lower():
+        return "OpenAI API error. Please check your OPENAI_API_KEY environment variable."
+    elif "database" in error_msg.lower() or "connection" in error_msg.lower():
+        return "Database connection error. The service may be starting up. Please try again in a moment."
+    else:
+        return error_msg
+
+
+@app.post("/api/analyze/template")
+async def analyze_with_template(request: TemplateAnalysisRequest, db: Session = Depends(get_db)):
+    """Analyze videos with a specific template (with database caching)"""
+    try:
+        print(f"🔍 Fetching data for {len(request.video_ids)} videos...")
+        prefetcher.record_use(request.video_ids)
+        
+        analysis_prompt = await build_template_prompt(request, db)
+        
+        print(f"🤖 Running AI analysis with template: {request.template_id}")
+        response = await ai_service.generate_response(analysis_prompt, use_cache=request.use_cache)
+        
+        return parse_template_topics(request, response)
         
     except Exception as e:
         error_msg = str(e)
         print(f"❌ Template analysis error: {error_msg}")
-        
-        # Provide more specific error messages
-        if "quota" in error_msg.lower():
-            raise HTTPException(
-                status_code=500, 
-                detail="YouTube API quota exceeded. Please wait or use a different API key."
-            )
-        elif "api" in error_msg.lower() and "key" in error_msg.lower():
-            raise HTTPException(
-                status_code=500, 
-                detail="YouTube API key error. Please check your YOUTUBE_API_KEY environment variable."
-            )
-        elif "openai" in error_msg.lower():
-            raise HTTPException(
-                status_code=500, 
-                detail="OpenAI API error. Please check your OPENAI_API_KEY environment variable."
-            )
-        elif "database" in error_msg.lower() or "connection" in error_msg.lower():
-            raise HTTPException(
-                status_code=500, 
-                detail="Database connection error. The service may be starting up. Please try again in a moment."
-            )
-        else:
-            raise HTTPException(status_code=500, detail=error_msg)
+        raise HTTPException(status_code=500, detail=template_error_detail(error_msg))
+
+
+@app.post("/api/analyze/template/stream")
+async def analyze_with_template_stream(request: TemplateAnalysisRequest):
+    """
+    Streaming variant of /api/analyze/template (server-sent events)
+    Events: 'status', 'token' (raw model output), 'item' (each topic as soon as it is
+    complete), then 'done' with the same payload as the non-streaming endpoint, or 'error'
+    """
+    prefetcher.record_use(request.video_ids)
+    
+    async def events():
+        try:
+            yield sse_event("status", {"stage": "loading_videos", "videos": len(request.video_ids)})
+            with session_scope() as db:
+                analysis_prompt = await build_template_prompt(request, db)
+            
+            yield sse_event("status", {"stage": "generating"})
+            print(f"🤖 Streaming AI analysis with template: {request.template_id}")
+            parser = IncrementalJSONParser(max_depth=1)
+            parts = []
+            async for delta in ai_service.stream_response(analysis_prompt, use_cache=request.use_cache):
+                parts.append(delta)
+                yield sse_event("token", {"text": delta})
+                for path, value in parser.feed(delta):
+                    topic = normalize_template_topic(value) if isinstance(path[0], int) else None
+                    if topic:
+                        yield sse_event("item", {"index": path[0], "topic": topic})
+            
+            yield sse_event("done", parse_template_topics(request, "".join(parts)))
+        except Exception as e:
+            error_msg = getattr(e, "detail", None) or str(e)
+            print(f"❌ Template analysis error: {error_msg}")
+            yield sse_event("error", {"detail": template_error_detail(error_msg)})
+    
+    return sse_response(events())
 
 
 @app.post("/api/upload-pdf")
@@ -598,19 +812,22 @@ async def upload_pdf(file: UploadFile = File(...)):
 async def get_video_details(request: VideoSelectionRequest):
     """Get detailed information about selected videos including transcripts and comments"""
     try:
-        videos_data = []
+        import asyncio
         
-        for video_id in request.video_ids:
-            video_info = await youtube_service.get_video_info(video_id)
-            transcript = await youtube_service.get_transcript(video_id)
-            comments = await youtube_service.get_comments(video_id, max_results=50)
-            
-            videos_data.append({
+        async def fetch_details(video_id: str) -> Dict:
+            video_info, transcript, comments = await asyncio.gather(
+                youtube_service.get_video_info(video_id),
+                youtube_service.get_transcript(video_id),
+                youtube_service.get_comments(video_id, max_results=50)
+            )
+            return {
                 "video_id": video_id,
                 "info": video_info,
                 "transcript": transcript,
                 "comments": comments
-            })
+            }
+        
+        videos_data = await asyncio.gather(*[fetch_details(vid) for vid in request.video_ids])
         
         return {
             "success": True,
@@ -630,6 +847,8 @@ async def search_videos(request: SearchRequest):
             "success": True,
             "results": results
         }
+    except QuotaExceededError as e:
+        raise quota_http_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -657,10 +876,49 @@ async def search_channel(request: SearchRequest):
             "channels": channel_results,
             "videos": videos
         }
+    except QuotaExceededError as e:
+        raise quota_http_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def load_series_inputs(request: SuggestSeriesRequest) -> Tuple[Dict, List[Dict]]:
+    """Fetch channel context plus transcript/comments for the selected videos"""
+    # Fetch video data in PARALLEL (huge speed improvement!)
+    video_data_map = await youtube_service.get_video_data_parallel(
+        request.selected_video_ids, 
+        max_comments=100
+    )
+    
+    # Get video info in parallel as well
+    import asyncio
+    video_info_tasks = [youtube_service.get_video_info(vid) for vid in request.selected_video_ids]
+    video_infos = await asyncio.gather(*video_info_tasks, return_exceptions=True)
+    
+    # Combine data
+    videos_data = []
+    for video_id, video_info in zip(request.selected_video_ids, video_infos):
+        if isinstance(video_info, Exception):
+            print(f"⚠️ Skipping video {video_id} due to error: {video_info}")
+            continue
+    
+        video_data = video_data_map.get(video_id, {})
+        videos_data.append({
+            "title": video_info.get("title", "Unknown"),
+            "description": video_info.get("description", ""),
+            "transcript": video_data.get("transcript"),
+            "comments": video_data.get("comments", [])
+        })
+    
+    if not videos_data:
+        raise Exception("Failed to fetch data for any of the selected videos")
+    
+    # Get channel context
+    channel_info = await youtube_service.get_channel_info(request.primary_channel_id)
+    
+    return channel_info, videos_data
+
+
 @app.post("/api/suggest-series")
 async def suggest_series(request: SuggestSeriesRequest):
     """Analyze videos and suggest series topics - OPTIMIZED with parallel processing"""
@@ -669,37 +927,9 @@ async def suggest_series(request: SuggestSeriesRequest):
         print(f"🎯 SUGGEST SERIES - Processing {len(request.selected_video_ids)} videos")
         print(f"{'='*80}\n")
         
-        # Fetch video data in PARALLEL (huge speed improvement!)
-        video_data_map = await youtube_service.get_video_data_parallel(
-            request.selected_video_ids, 
-            max_comments=100
-        )
-        
-        # Get video info in parallel as well
-        import asyncio
-        video_info_tasks = [youtube_service.get_video_info(vid) for vid in request.selected_video_ids]
-        video_infos = await asyncio.gather(*video_info_tasks, return_exceptions=True)
-        
-        # Combine data
-        videos_data = []
-        for video_id, video_info in zip(request.selected_video_ids, video_infos):
-            if isinstance(video_info, Exception):
-                print(f"⚠️ Skipping video {video_id} due to error: {video_info}")
-                continue
-                
-            video_data = video_data_map.get(video_id, {})
-            videos_data.append({
-                "title": video_info.get("title", "Unknown"),
-                "description": video_info.get("description", ""),
-                "transcript": video_data.get("transcript"),
-                "comments": video_data.get("comments", [])
-            })
-        
-        if not videos_data:
-            raise Exception("Failed to fetch data for any of the selected videos")
+        prefetcher.record_use(request.selected_video_ids)
         
-        # Get channel context
-        channel_info = await youtube_service.get_channel_info(request.primary_channel_id)
+        channel_info, videos_data = await load_series_inputs(request)
         
         print(f"\n🤖 Sending {len(videos_data)} videos to AI for analysis...")
         
@@ -707,7 +937,8 @@ async def suggest_series(request: SuggestSeriesRequest):
         suggestions = await ai_service.suggest_series(
             channel_context=channel_info,
             videos_data=videos_data,
-            additional_prompt=request.additional_prompt
+            additional_prompt=request.additional_prompt,
+            use_cache=request.use_cache
         )
         
         print(f"✅ AI analysis complete!\n")
@@ -721,6 +952,44 @@ async def suggest_series(request: SuggestSeriesRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/suggest-series/stream")
+async def suggest_series_stream(request: SuggestSeriesRequest):
+    """
+    Streaming variant of /api/suggest-series (server-sent events)
+    Events: 'status', 'token' (raw JSON text), 'item' (each series suggestion, topic or
+    gap as soon as it is complete), then 'done' with the same payload as the
+    non-streaming endpoint, or 'error'
+    """
+    prefetcher.record_use(request.selected_video_ids)
+    
+    async def events():
+        try:
+            yield sse_event("status", {"stage": "loading_videos", "videos": len(request.selected_video_ids)})
+            channel_info, videos_data = await load_series_inputs(request)
+            
+            yield sse_event("status", {"stage": "generating", "videos": len(videos_data)})
+            print(f"\n🤖 Streaming {len(videos_data)} videos to AI for analysis...")
+            parser = IncrementalJSONParser()
+            async for delta in ai_service.stream_suggest_series(
+                channel_context=channel_info,
+                videos_data=videos_data,
+                additional_prompt=request.additional_prompt,
+                use_cache=request.use_cache
+            ):
+                yield sse_event("token", {"text": delta})
+                for path, value in parser.feed(delta):
+                    if len(path) == 2:
+                        yield sse_event("item", {"section": path[0], "index": path[1], "value": value})
+            
+            print(f"✅ AI analysis complete!\n")
+            yield sse_event("done", {"success": True, "suggestions": parser.result()})
+        except Exception as e:
+            print(f"❌ Error in suggest_series: {str(e)}")
+            yield sse_event("error", {"detail": str(e)})
+    
+    return sse_response(events())
+
+
 @app.post("/api/suggest-format")
 async def suggest_format(request: SuggestFormatRequest):
     """Analyze competitor videos and suggest format conversions - OPTIMIZED with parallel processing"""
@@ -730,6 +999,7 @@ async def suggest_format(request: SuggestFormatRequest):
         print(f"{'='*80}\n")
         
         import asyncio
+        prefetcher.record_use(request.my_video_ids + request.competitor_video_ids)
         
         # Fetch ALL video data in parallel
         my_data_task = youtube_service.get_video_data_parallel(request.my_video_ids, max_comments=10)
@@ -787,7 +1057,8 @@ async def suggest_format(request: SuggestFormatRequest):
         suggestions = await ai_service.suggest_format(
             my_videos=my_videos_data,
             competitor_videos=competitor_videos_data,
-            additional_prompt=request.additional_prompt
+            additional_prompt=request.additional_prompt,
+            use_cache=request.use_cache
         )
         
         print(f"✅ AI format analysis complete!\n")
@@ -830,6 +1101,10 @@ async def search_similar_titles(request: SearchSimilarTitlesRequest):
         ]
         search_results_list = await asyncio.gather(*search_tasks, return_exceptions=True)
         
+        # Every search refused by the quota admission controller - surface it instead of an empty result
+        if search_results_list and all(isinstance(r, QuotaExceededError) for r in search_results_list):
+            raise search_results_list[0]
+        
         # Combine and deduplicate results
         for search_results in search_results_list:
             if isinstance(search_results, Exception):
@@ -936,6 +1211,8 @@ async def search_similar_titles(request: SearchSimilarTitlesRequest):
             "videos": top_videos,
             "count": len(top_videos)
         }
+    except QuotaExceededError as e:
+        raise quota_http_exception(e)
     except Exception as e:
         print(f"❌ Error in search_similar_titles: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1021,6 +1298,7 @@ async def reload_niche_channels():
     """Reload niche channels from JSON file"""
     try:
         niche_service.reload_channels()
+        await niche_service.resolve_handles(youtube_service)
         return {
             "success": True,
             "message": f"Reloaded {len(niche_service.channels)} channels",
@@ -1191,9 +1469,88 @@ async def load_static_data(request: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+CUSTOM_ANALYSIS_SYSTEM_PROMPT = "You are a YouTube content analyst providing detailed insights based on video transcripts and comments."
+CUSTOM_ANALYSIS_JSON_FORMAT = """Provide your response in JSON format:
+{
+  "analysis_summary": "Brief overview of your findings",
+  "key_findings": ["Finding 1", "Finding 2", ...],
+  "patterns": ["Pattern 1", "Pattern 2", ...],
+  "insights": ["Insight 1", "Insight 2", ...],
+  "recommendations": ["Recommendation 1", "Recommendation 2", ...]
+}
+"""
+
+
+def render_custom_analysis_prompt(videos_data: List[Dict], custom_prompt: str) -> str:
+    """User prompt for a custom-prompt analysis over (already trimmed) videos"""
+    videos_summary = []
+    for idx, video in enumerate(videos_data, 1):
+        video_text = f"""
+═══ VIDEO {idx}: {video['title']} ═══
+
+DESCRIPTION: {video.get('description') or 'N/A'}
+
+TRANSCRIPT EXCERPT: {video.get('transcript') or 'N/A'}
+
+TOP COMMENTS:
+"""
+        if video.get('comments'):
+            for cidx, comment in enumerate(video['comments'], 1):
+                comment_text = comment.get('text', '') if isinstance(comment, dict) else str(comment)
+                video_text += f"{cidx}. {comment_text}\n"
+        else:
+            video_text += "No comments.\n"
+        
+        videos_summary.append(video_text)
+    
+    return f"""You are analyzing YouTube video content to extract insights.
+
+VIDEOS TO ANALYZE:
+{''.join(videos_summary)}
+
+USER'S CUSTOM ANALYSIS REQUEST:
+{custom_prompt}
+
+Please provide a detailed analysis based on the user's request. Structure your response clearly with:
+1. Key findings
+2. Patterns and themes
+3. Actionable insights
+4. Recommendations
+
+{CUSTOM_ANALYSIS_JSON_FORMAT}"""
+
+
+def render_custom_reduce_prompt(partials: List[Dict], custom_prompt: str) -> str:
+    """Prompt merging custom analyses of separate batches of videos into one"""
+    partials_summary = []
+    for idx, partial in enumerate(partials, 1):
+        partials_summary.append(f"""
+═══ BATCH {idx} ANALYSIS ═══
+{json.dumps(partial, ensure_ascii=False)}
+""")
+
+    return f"""You are combining analyses of separate batches of videos from the same YouTube dataset into one analysis of the whole dataset.
+
+USER'S CUSTOM ANALYSIS REQUEST:
+{custom_prompt}
+
+BATCH ANALYSES:
+{''.join(partials_summary)}
+
+Merge them into a single analysis that answers the user's request for the full dataset:
+1. Combine findings that say the same thing, keeping the most specific evidence and examples
+2. Rank patterns seen across several batches above those seen in only one
+3. Keep batch-specific insights only when they are significant
+
+{CUSTOM_ANALYSIS_JSON_FORMAT}"""
+
+
 @app.post("/api/reverse-engineering/analyze")
 async def analyze_with_custom_prompt(request: ReverseEngineeringPromptRequest):
     """Run custom prompt analysis on static data"""
+    if request.mode not in ("auto", "single", "map_reduce"):
+        raise HTTPException(status_code=400, detail=f"Unknown analysis mode: {request.mode}")
+    
     try:
         print(f"\n{'='*80}")
         print(f"🔍 REVERSE ENGINEERING ANALYSIS")
@@ -1213,193 +1570,191 @@ async def analyze_with_custom_prompt(request: ReverseEngineeringPromptRequest):
         
         print(f"📊 Total videos to analyze: {len(videos)}")
         
-        # Smart truncation based on number of videos
-        # Adaptive limits to stay under 100k tokens (~75k words)
-        if len(videos) > 100:
-            transcript_limit = 500
-            comments_limit = 3
-            comment_char_limit = 100
-            max_videos = 100
-            print(f"⚠️  Large dataset detected! Limiting to first {max_videos} videos with reduced detail")
-            videos = videos[:max_videos]
-        elif len(videos) > 50:
-            transcript_limit = 1000
-            comments_limit = 5
-            comment_char_limit = 150
-        elif len(videos) > 20:
-            transcript_limit = 2000
-            comments_limit = 10
-            comment_char_limit = 200
-        else:
-            transcript_limit = 3000
-            comments_limit = 15
-            comment_char_limit = 250
-        
-        # Prepare video data for AI analysis
-        videos_data = []
-        for video in videos:
-            videos_data.append({
+        # Fit as much transcript/comment text as the model's context allows
+        builder = PromptBuilder(DEFAULT_MODEL, completion_tokens=3000)
+        videos_data = [
+            {
                 "title": video.get("title", ""),
                 "description": video.get("description", ""),
-                "transcript": video.get("transcript", "")[:transcript_limit],
-                "comments": video.get("comments", [])[:comments_limit]
-            })
-        
-        # Build the prompt
-        videos_summary = []
-        for idx, video in enumerate(videos_data, 1):
-            video_text = f"""
-═══ VIDEO {idx}: {video['title']} ═══
-
-DESCRIPTION: {video.get('description', 'N/A')[:300]}
-
-TRANSCRIPT EXCERPT: {video.get('transcript', 'N/A')}
-
-TOP COMMENTS:
-"""
-            if video.get('comments'):
-                for cidx, comment in enumerate(video['comments'], 1):
-                    comment_text = comment.get('text', '') if isinstance(comment, dict) else str(comment)
-                    video_text += f"{cidx}. {comment_text[:comment_char_limit]}\n"
-            else:
-                video_text += "No comments.\n"
+                "transcript": video.get("transcript", ""),
+                "comments": video.get("comments", [])
+            }
+            for video in videos
+        ]
+        render = lambda fitted: render_custom_analysis_prompt(fitted, request.custom_prompt)
+        
+        analyzer = MapReduceAnalyzer(ai_service, builder)
+        mode = request.mode
+        if mode == "auto":
+            content_tokens = sum(builder.video_tokens(video) for video in videos_data)
+            mode = "map_reduce" if content_tokens > builder.content_budget(render, CUSTOM_ANALYSIS_SYSTEM_PROMPT) else "single"
+        if mode == "map_reduce":
+            # Each shard is a full-size completion - refuse (or, for auto, trim to one prompt) past the ceiling
+            shard_count = len(analyzer.plan(videos_data, render, CUSTOM_ANALYSIS_SYSTEM_PROMPT))
+            if shard_count > analyzer.max_shards:
+                if request.mode == "map_reduce":
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"{len(videos_data)} videos would need {shard_count} shards (limit {analyzer.max_shards}) - select fewer videos"
+                    )
+                print(f"⚠️  {shard_count} shards exceeds the limit of {analyzer.max_shards}, trimming to a single prompt")
+                mode = "single"
+        
+        if mode == "map_reduce":
+            # Too much for one context window - analyze shards concurrently and merge
+            result, prompt_report = await analyzer.run(
+                videos_data,
+                render,
+                lambda partials: render_custom_reduce_prompt(partials, request.custom_prompt),
+                CUSTOM_ANALYSIS_SYSTEM_PROMPT,
+                use_cache=request.use_cache
+            )
+            videos_analyzed = prompt_report["videos_analyzed"]
+        else:
+            prompt, prompt_report = builder.build(videos_data, render, system_prompt=CUSTOM_ANALYSIS_SYSTEM_PROMPT)
+            prompt_report["mode"] = "single"
+            videos_analyzed = prompt_report["videos_included"]
             
-            videos_summary.append(video_text)
-        
-        prompt = f"""You are analyzing YouTube video content to extract insights.
-
-VIDEOS TO ANALYZE:
-{''.join(videos_summary)}
-
-USER'S CUSTOM ANALYSIS REQUEST:
-{request.custom_prompt}
-
-Please provide a detailed analysis based on the user's request. Structure your response clearly with:
-1. Key findings
-2. Patterns and themes
-3. Actionable insights
-4. Recommendations
-
-Provide your response in JSON format:
-{{
-  "analysis_summary": "Brief overview of your findings",
-  "key_findings": ["Finding 1", "Finding 2", ...],
-  "patterns": ["Pattern 1", "Pattern 2", ...],
-  "insights": ["Insight 1", "Insight 2", ...],
-  "recommendations": ["Recommendation 1", "Recommendation 2", ...]
-}}
-"""
-        
-        print(f"🤖 Analyzing {len(videos_data)} videos with custom prompt...")
-        
-        # Call AI service
-        import json
-        response = ai_service.client.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[
-                {"role": "system", "content": "You are a YouTube content analyst providing detailed insights based on video transcripts and comments."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=3000,
-            response_format={"type": "json_object"}
-        )
-        
-        result = json.loads(response.choices[0].message.content)
+            print(f"🤖 Analyzing {videos_analyzed} videos with custom prompt...")
+            
+            # Call AI service
+            response = await ai_service.chat_completion(
+                messages=[
+                    {"role": "system", "content": CUSTOM_ANALYSIS_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                max_tokens=3000,
+                response_format={"type": "json_object"},
+                use_cache=request.use_cache
+            )
+            
+            result = json.loads(response)
         
         print(f"✅ Analysis complete!\n")
         
         return {
             "success": True,
             "analysis": result,
-            "videos_analyzed": len(videos_data),
-            "total_videos_in_data": len(combined_data["videos"])
+            "videos_analyzed": videos_analyzed,
+            "total_videos_in_data": len(combined_data["videos"]),
+            "prompt": prompt_report
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error in reverse engineering analysis: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/reverse-engineering/chat")
-async def chat_with_data(request: ReverseEngineeringChatRequest):
-    """Chat interface for iterative analysis of static data"""
+async def stream_chat_events(messages: List[Dict], use_cache: bool, summary: Dict, label: str):
+    """
+    SSE events for a chat completion: 'token' per delta, then 'done' with the same
+    payload as the non-streaming endpoint (or 'error')
+    """
     try:
-        print(f"\n{'='*80}")
-        print(f"💬 REVERSE ENGINEERING CHAT")
-        print(f"Files: {request.filenames}")
-        print(f"{'='*80}\n")
-        
-        # Load data from files
-        combined_data = static_data_service.load_multiple_files(request.filenames)
-        videos = combined_data["videos"]
-        
-        # Prepare condensed data context
-        data_context = f"""
+        parts = []
+        async for delta in ai_service.stream_chat_completion(
+            messages=messages,
+            temperature=0.7,
+            max_tokens=2000,
+            use_cache=use_cache
+        ):
+            parts.append(delta)
+            yield sse_event("token", {"text": delta})
+        print(f"✅ Chat response streamed!\n")
+        yield sse_event("done", {"success": True, "response": "".join(parts), **summary})
+    except Exception as e:
+        print(f"❌ Error in {label}: {str(e)}")
+        yield sse_event("error", {"detail": str(e)})
+
+
+def build_reverse_engineering_chat(request: ReverseEngineeringChatRequest) -> Tuple[List[Dict], Dict]:
+    """Chat messages over the loaded static data files, plus a summary of what was loaded"""
+    # Load data from files
+    combined_data = static_data_service.load_multiple_files(request.filenames)
+    videos = combined_data["videos"]
+    
+    # Prepare condensed data context
+    data_context = f"""
 You have access to data from {len(combined_data['channels'])} YouTube channels with {len(videos)} total videos.
 
 CHANNELS:
 """
-        for channel in combined_data['channels']:
-            data_context += f"- {channel['channel_name']}: {channel['videos_count']} videos\n"
-        
-        data_context += f"""
+    for channel in combined_data['channels']:
+        data_context += f"- {channel['channel_name']}: {channel['videos_count']} videos\n"
+    
+    data_context += f"""
 SAMPLE VIDEO TITLES (first 10):
 """
-        for idx, video in enumerate(videos[:10], 1):
-            data_context += f"{idx}. {video['title']} ({video['channel_name']})\n"
-        
-        if len(videos) > 10:
-            data_context += f"... and {len(videos) - 10} more videos\n"
-        
-        # Build conversation messages
-        messages = [
-            {
-                "role": "system", 
-                "content": f"""You are a helpful YouTube content analyst with access to pre-loaded video data. 
-                
+    for idx, video in enumerate(videos[:10], 1):
+        data_context += f"{idx}. {video['title']} ({video['channel_name']})\n"
+    
+    if len(videos) > 10:
+        data_context += f"... and {len(videos) - 10} more videos\n"
+    
+    # Build conversation messages
+    messages = [
+        {
+            "role": "system", 
+            "content": f"""You are a helpful YouTube content analyst with access to pre-loaded video data. 
+            
 DATA AVAILABLE:
 {data_context}
 
 You can analyze titles, transcripts, comments, and provide insights. When users ask questions, 
 provide specific, data-driven answers based on the loaded content."""
-            }
-        ]
-        
-        # Add conversation history
-        for msg in request.conversation_history:
-            messages.append({
-                "role": msg.get("role", "user"),
-                "content": msg.get("content", "")
-            })
-        
-        # Add new message
+        }
+    ]
+    
+    # Add conversation history
+    for msg in request.conversation_history:
         messages.append({
-            "role": "user",
-            "content": request.new_message
+            "role": msg.get("role", "user"),
+            "content": msg.get("content", "")
         })
+    
+    # Add new message
+    messages.append({
+        "role": "user",
+        "content": request.new_message
+    })
+    
+    data_summary = {
+        "total_channels": len(combined_data['channels']),
+        "total_videos": len(videos)
+    }
+    return messages, data_summary
+
+
+@app.post("/api/reverse-engineering/chat")
+async def chat_with_data(request: ReverseEngineeringChatRequest):
+    """Chat interface for iterative analysis of static data"""
+    try:
+        print(f"\n{'='*80}")
+        print(f"💬 REVERSE ENGINEERING CHAT")
+        print(f"Files: {request.filenames}")
+        print(f"{'='*80}\n")
+        
+        messages, data_summary = build_reverse_engineering_chat(request)
         
         print(f"🤖 Processing chat message...")
         
         # Call AI service
-        response = ai_service.client.chat.completions.create(
-            model="gpt-4-turbo-preview",
+        assistant_message = await ai_service.chat_completion(
             messages=messages,
             temperature=0.7,
-            max_tokens=2000
+            max_tokens=2000,
+            use_cache=request.use_cache
         )
         
-        assistant_message = response.choices[0].message.content
-        
         print(f"✅ Chat response generated!\n")
         
         return {
             "success": True,
             "response": assistant_message,
-            "data_summary": {
-                "total_channels": len(combined_data['channels']),
-                "total_videos": len(videos)
-            }
+            "data_summary": data_summary
         }
         
     except Exception as e:
@@ -1407,6 +1762,20 @@ provide specific, data-driven answers based on the loaded content."""
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/reverse-engineering/chat/stream")
+async def chat_with_data_stream(request: ReverseEngineeringChatRequest):
+    """Streaming variant of /api/reverse-engineering/chat (server-sent events)"""
+    try:
+        messages, data_summary = build_reverse_engineering_chat(request)
+    except Exception as e:
+        print(f"❌ Error in reverse engineering chat: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return sse_response(stream_chat_events(
+        messages, request.use_cache, {"data_summary": data_summary}, "reverse engineering chat"
+    ))
+
+
 # ===================================
 # TOPIC IDENTIFICATION ENDPOINTS
 # ===================================
@@ -1446,6 +1815,57 @@ def filter_video_data_by_metadata(videos: List[Dict], metadata_fields: List[str]
     return filtered_videos
 
 
+TOPIC_ANALYSIS_SYSTEM_PROMPT = "You are a YouTube content strategist specializing in topic identification and content strategy."
+
+
+def render_topic_analysis_prompt(filtered_videos: List[Dict], request: TopicAnalysisRequest) -> str:
+    """User prompt for a topic analysis over (already trimmed) videos, showing only the selected metadata"""
+    metadata_description = ', '.join(request.metadata_fields)
+    
+    videos_summary = []
+    for idx, video in enumerate(filtered_videos, 1):
+        video_text = f"\n═══ VIDEO {idx} ═══\n"
+        
+        if 'title' in request.metadata_fields:
+            video_text += f"TITLE: {video.get('title', 'N/A')}\n"
+        
+        if 'views' in request.metadata_fields:
+            video_text += f"VIEWS: {video.get('view_count', 0):,}\n"
+        
+        if 'transcript' in request.metadata_fields and video.get('transcript'):
+            video_text += f"TRANSCRIPT: {video['transcript']}\n"
+        
+        if 'comments' in request.metadata_fields and video.get('comments'):
+            video_text += "COMMENTS:\n"
+            for cidx, comment in enumerate(video['comments'], 1):
+                comment_text = comment.get('text', '') if isinstance(comment, dict) else str(comment)
+                video_text += f"  {cidx}. {comment_text}\n"
+        
+        videos_summary.append(video_text)
+    
+    return f"""You are a YouTube content strategist identifying high-potential content topics.
+
+ANALYSIS TYPE: {request.analysis_type.upper()}
+AVAILABLE METADATA: {metadata_description}
+
+VIDEOS TO ANALYZE:
+{''.join(videos_summary)}
+
+USER'S ANALYSIS REQUEST:
+{request.custom_prompt}
+
+Please provide your analysis in JSON format:
+{{
+  "analysis_summary": "Brief overview of your findings",
+  "key_findings": ["Finding 1", "Finding 2", ...],
+  "patterns": ["Pattern 1", "Pattern 2", ...],
+  "insights": ["Insight 1", "Insight 2", ...],
+  "recommendations": ["Recommendation 1", "Recommendation 2", ...]
+}}
+
+Focus on actionable insights that can help create successful content."""
+
+
 @app.post("/api/topics/analyze")
 async def analyze_topics(request: TopicAnalysisRequest):
     """
@@ -1470,12 +1890,16 @@ async def analyze_topics(request: TopicAnalysisRequest):
         
         # Fetch from channels if provided
         if request.channel_ids:
-            for channel_id in request.channel_ids:
-                try:
-                    channel_videos = youtube_service.get_channel_videos(channel_id, max_results=10)
-                    videos.extend(channel_videos)
-                except Exception as e:
-                    print(f"⚠️  Warning: Failed to fetch videos for channel {channel_id}: {str(e)}")
+            import asyncio
+            channel_results = await asyncio.gather(
+                *[youtube_service.get_channel_videos(channel_id, max_results=10) for channel_id in request.channel_ids],
+                return_exceptions=True
+            )
+            for channel_id, channel_videos in zip(request.channel_ids, channel_results):
+                if isinstance(channel_videos, Exception):
+                    print(f"⚠️  Warning: Failed to fetch videos for channel {channel_id}: {str(channel_videos)}")
+                    continue
+                videos.extend(channel_videos)
         
         if not videos:
             raise HTTPException(status_code=400, detail="No videos found to analyze")
@@ -1485,94 +1909,31 @@ async def analyze_topics(request: TopicAnalysisRequest):
         # Filter videos based on selected metadata
         filtered_videos = filter_video_data_by_metadata(videos, request.metadata_fields)
         
-        # Smart truncation based on number of videos and metadata
-        has_transcript = 'transcript' in request.metadata_fields
-        has_comments = 'comments' in request.metadata_fields
-        
-        if has_transcript:
-            if len(videos) > 50:
-                transcript_limit = 500
-                max_videos = 50
-                print(f"⚠️  Large dataset with transcripts! Limiting to first {max_videos} videos")
-                filtered_videos = filtered_videos[:max_videos]
-            elif len(videos) > 20:
-                transcript_limit = 1000
-            else:
-                transcript_limit = 2000
-            
-            # Truncate transcripts
-            for video in filtered_videos:
-                if 'transcript' in video:
-                    video['transcript'] = video['transcript'][:transcript_limit]
-        
-        if has_comments:
-            comments_limit = 10 if len(videos) > 20 else 15
-            for video in filtered_videos:
-                if 'comments' in video:
-                    video['comments'] = video['comments'][:comments_limit]
-        
-        # Build prompt based on available metadata
-        metadata_description = ', '.join(request.metadata_fields)
-        
-        videos_summary = []
-        for idx, video in enumerate(filtered_videos, 1):
-            video_text = f"\n═══ VIDEO {idx} ═══\n"
-            
-            if 'title' in request.metadata_fields:
-                video_text += f"TITLE: {video.get('title', 'N/A')}\n"
-            
-            if 'views' in request.metadata_fields:
-                video_text += f"VIEWS: {video.get('view_count', 0):,}\n"
-            
-            if 'transcript' in request.metadata_fields and video.get('transcript'):
-                video_text += f"TRANSCRIPT: {video['transcript']}\n"
-            
-            if 'comments' in request.metadata_fields and video.get('comments'):
-                video_text += "COMMENTS:\n"
-                for cidx, comment in enumerate(video['comments'][:10], 1):
-                    comment_text = comment.get('text', '') if isinstance(comment, dict) else str(comment)
-                    video_text += f"  {cidx}. {comment_text[:200]}\n"
-            
-            videos_summary.append(video_text)
-        
-        prompt = f"""You are a YouTube content strategist identifying high-potential content topics.
-
-ANALYSIS TYPE: {request.analysis_type.upper()}
-AVAILABLE METADATA: {metadata_description}
-
-VIDEOS TO ANALYZE:
-{''.join(videos_summary)}
-
-USER'S ANALYSIS REQUEST:
-{request.custom_prompt}
-
-Please provide your analysis in JSON format:
-{{
-  "analysis_summary": "Brief overview of your findings",
-  "key_findings": ["Finding 1", "Finding 2", ...],
-  "patterns": ["Pattern 1", "Pattern 2", ...],
-  "insights": ["Insight 1", "Insight 2", ...],
-  "recommendations": ["Recommendation 1", "Recommendation 2", ...]
-}}
-
-Focus on actionable insights that can help create successful content."""
+        # Fit as much transcript/comment text as the model's context allows
+        builder = PromptBuilder(DEFAULT_MODEL, completion_tokens=3000)
+        prompt, prompt_report = builder.build(
+            filtered_videos,
+            lambda fitted: render_topic_analysis_prompt(fitted, request),
+            system_prompt=TOPIC_ANALYSIS_SYSTEM_PROMPT
+        )
+        filtered_videos = filtered_videos[:prompt_report["videos_included"]]
         
         print(f"🤖 Analyzing {len(filtered_videos)} videos...")
         
         # Call AI service
         import json
-        response = ai_service.client.chat.completions.create(
-            model="gpt-4-turbo-preview",
+        response = await ai_service.chat_completion(
             messages=[
-                {"role": "system", "content": "You are a YouTube content strategist specializing in topic identification and content strategy."},
+                {"role": "system", "content": TOPIC_ANALYSIS_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,
             max_tokens=3000,
-            response_format={"type": "json_object"}
+            response_format={"type": "json_object"},
+            use_cache=request.use_cache
         )
         
-        result = json.loads(response.choices[0].message.content)
+        result = json.loads(response)
         
         print(f"✅ Topic analysis complete!\n")
         
@@ -1580,7 +1941,8 @@ Focus on actionable insights that can help create successful content."""
             "success": True,
             "analysis": result,
             "videos_analyzed": len(filtered_videos),
-            "metadata_used": request.metadata_fields
+            "metadata_used": request.metadata_fields,
+            "prompt": prompt_report
         }
         
     except Exception as e:
@@ -1588,97 +1950,106 @@ Focus on actionable insights that can help create successful content."""
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/topics/chat")
-async def chat_topics(request: TopicChatRequest):
-    """
-    Chat interface for topic analysis
-    """
-    try:
-        print(f"\n{'='*80}")
-        print(f"💬 TOPIC IDENTIFICATION CHAT")
-        print(f"Analysis Type: {request.analysis_type}")
-        print(f"Metadata Fields: {request.metadata_fields}")
-        print(f"{'='*80}\n")
-        
-        # Load data
-        videos = []
-        
-        if request.filenames:
-            combined_data = static_data_service.load_multiple_files(request.filenames)
-            videos.extend(combined_data["videos"])
-        
-        if request.channel_ids:
-            for channel_id in request.channel_ids:
-                try:
-                    channel_videos = youtube_service.get_channel_videos(channel_id, max_results=10)
-                    videos.extend(channel_videos)
-                except Exception as e:
-                    print(f"⚠️  Warning: Failed to fetch videos for channel {channel_id}: {str(e)}")
-        
-        if not videos:
-            raise HTTPException(status_code=400, detail="No videos found")
-        
-        # Filter by metadata
-        filtered_videos = filter_video_data_by_metadata(videos, request.metadata_fields)
-        
-        # Create condensed context
-        metadata_description = ', '.join(request.metadata_fields)
-        data_context = f"""
+async def build_topic_chat(request: TopicChatRequest) -> Tuple[List[Dict], int]:
+    """Chat messages over static files and/or live channel videos, plus the number of videos available"""
+    # Load data
+    videos = []
+    
+    if request.filenames:
+        combined_data = static_data_service.load_multiple_files(request.filenames)
+        videos.extend(combined_data["videos"])
+    
+    if request.channel_ids:
+        import asyncio
+        channel_results = await asyncio.gather(
+            *[youtube_service.get_channel_videos(channel_id, max_results=10) for channel_id in request.channel_ids],
+            return_exceptions=True
+        )
+        for channel_id, channel_videos in zip(request.channel_ids, channel_results):
+            if isinstance(channel_videos, Exception):
+                print(f"⚠️  Warning: Failed to fetch videos for channel {channel_id}: {str(channel_videos)}")
+                continue
+            videos.extend(channel_videos)
+    
+    if not videos:
+        raise HTTPException(status_code=400, detail="No videos found")
+    
+    # Filter by metadata
+    filtered_videos = filter_video_data_by_metadata(videos, request.metadata_fields)
+    
+    # Create condensed context
+    metadata_description = ', '.join(request.metadata_fields)
+    data_context = f"""
 You have access to {len(filtered_videos)} YouTube videos.
 Analysis type: {request.analysis_type.upper()}
 Available metadata: {metadata_description}
 
 SAMPLE VIDEO TITLES (first 5):
 """
-        for idx, video in enumerate(filtered_videos[:5], 1):
-            data_context += f"{idx}. {video.get('title', 'Untitled')} - {video.get('channel_name', 'Unknown')}\n"
-        
-        if len(filtered_videos) > 5:
-            data_context += f"... and {len(filtered_videos) - 5} more videos\n"
-        
-        # Build messages
-        messages = [
-            {
-                "role": "system",
-                "content": f"""You are a YouTube content strategist helping identify content topics.
+    for idx, video in enumerate(filtered_videos[:5], 1):
+        data_context += f"{idx}. {video.get('title', 'Untitled')} - {video.get('channel_name', 'Unknown')}\n"
+    
+    if len(filtered_videos) > 5:
+        data_context += f"... and {len(filtered_videos) - 5} more videos\n"
+    
+    # Build messages
+    messages = [
+        {
+            "role": "system",
+            "content": f"""You are a YouTube content strategist helping identify content topics.
 
 {data_context}
 
 Answer questions based on the available data and metadata. Provide specific, actionable insights."""
-            }
-        ]
-        
-        # Add conversation history
-        for msg in request.conversation_history:
-            messages.append({
-                "role": msg.get("role", "user"),
-                "content": msg.get("content", "")
-            })
-        
-        # Add new message
+        }
+    ]
+    
+    # Add conversation history
+    for msg in request.conversation_history:
         messages.append({
-            "role": "user",
-            "content": request.new_message
+            "role": msg.get("role", "user"),
+            "content": msg.get("content", "")
         })
+    
+    # Add new message
+    messages.append({
+        "role": "user",
+        "content": request.new_message
+    })
+    
+    return messages, len(filtered_videos)
+
+
+@app.post("/api/topics/chat")
+async def chat_topics(request: TopicChatRequest):
+    """
+    Chat interface for topic analysis
+    """
+    try:
+        print(f"\n{'='*80}")
+        print(f"💬 TOPIC IDENTIFICATION CHAT")
+        print(f"Analysis Type: {request.analysis_type}")
+        print(f"Metadata Fields: {request.metadata_fields}")
+        print(f"{'='*80}\n")
+        
+        messages, videos_available = await build_topic_chat(request)
         
         print(f"🤖 Processing chat message...")
         
         # Call AI service
-        response = ai_service.client.chat.completions.create(
-            model="gpt-4-turbo-preview",
+        assistant_message = await ai_service.chat_completion(
             messages=messages,
             temperature=0.7,
-            max_tokens=2000
+            max_tokens=2000,
+            use_cache=request.use_cache
         )
         
-        assistant_message = response.choices[0].message.content
-        
         print(f"✅ Chat response generated!\n")
         
         return {
             "success": True,
             "response": assistant_message,
-            "videos_available": len(filtered_videos)
+            "videos_available": videos_available
         }
         
     except Exception as e:
@@ -1686,6 +2057,20 @@ Answer questions based on the available data and metadata. Provide specific, act
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/topics/chat/stream")
+async def chat_topics_stream(request: TopicChatRequest):
+    """Streaming variant of /api/topics/chat (server-sent events)"""
+    try:
+        messages, videos_available = await build_topic_chat(request)
+    except Exception as e:
+        print(f"❌ Error in topic chat: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return sse_response(stream_chat_events(
+        messages, request.use_cache, {"videos_available": videos_available}, "topic chat"
+    ))
+
+
 # ===============================================
 # TREND IDENTIFICATION ENDPOINTS
 # ===============================================
@@ -1700,6 +2085,7 @@ class TrendAnalyzeRequest(BaseModel):
     videos: List[Dict]
     niche_type: str  # 'indian' or 'global'
     days: int
+    use_cache: bool = True  # False forces a fresh completion
 
 
 @app.get("/api/trends/niche-channels")
@@ -1744,64 +2130,65 @@ async def fetch_trend_videos(request: TrendFetchRequest):
         print(f"📅 Cutoff date: {cutoff_date.isoformat()}")
         print(f"📅 Current time: {datetime.now(timezone.utc).isoformat()}")
         
-        for idx, channel_id in enumerate(request.channel_ids, 1):
-            try:
-                print(f"📹 Fetching from channel {idx}/{len(request.channel_ids)}...")
-                
-                # Fetch videos from channel
-                videos = await youtube_service.get_channel_videos(channel_id, max_results=50)
-                print(f"   Received {len(videos)} videos from API")
-                
-                # Filter by date
-                videos_added_for_this_channel = 0
-                for idx, video in enumerate(videos):
-                    # Parse published date
-                    pub_date_str = video.get('published_at', '')
-                    if pub_date_str:
-                        # Handle both ISO format and simple date format
-                        try:
-                            if 'T' in pub_date_str:
-                                pub_date = datetime.fromisoformat(pub_date_str.replace('Z', '+00:00'))
-                            else:
-                                pub_date = datetime.strptime(pub_date_str, '%Y-%m-%d').replace(tzinfo=timezone.utc)
-                            
-                            # Debug: Print first 3 video dates
-                            if idx < 3:
-                                print(f"      Video {idx+1}: '{video.get('title', '')[:40]}...'")
-                                print(f"               Published: {pub_date.isoformat()}")
-                                print(f"               Cutoff: {cutoff_date.isoformat()}")
-                                print(f"               Within range: {pub_date >= cutoff_date}")
-                            
-                            # Check if video is within date range
-                            if pub_date >= cutoff_date:
-                                # Filter by video type if specified
-                                if request.video_type != 'all':
-                                    duration = video.get('duration', '')
-                                    is_short = is_video_short(duration)
-                                    
-                                    if request.video_type == 'shorts' and not is_short:
-                                        print(f"      Skipping '{video.get('title', '')[:40]}...' - not a short")
-                                        continue
-                                    if request.video_type == 'videos' and is_short:
-                                        print(f"      Skipping '{video.get('title', '')[:40]}...' - is a short")
-                                        continue
+        # Fetch only uploads newer than the cutoff - the uploads playlist is read
+        # newest-first and paging stops at the cutoff (usually one page per channel)
+        # Bulk fetch runs in the background lane so it can't starve interactive lookups
+        import asyncio
+        with request_lane(BACKGROUND):
+            channel_results = await asyncio.gather(
+                *[
+                    youtube_service.get_channel_videos(
+                        channel_id,
+                        max_results=50,
+                        published_after=cutoff_date,
+                        include_shorts=request.video_type != 'videos'
+                    )
+                    for channel_id in request.channel_ids
+                ],
+                return_exceptions=True
+            )
+        
+        for idx, (channel_id, videos) in enumerate(zip(request.channel_ids, channel_results), 1):
+            if isinstance(videos, Exception):
+                print(f"⚠️  Warning: Failed to fetch videos for channel {channel_id}: {str(videos)}")
+                continue
+            
+            print(f"📹 Channel {idx}/{len(request.channel_ids)}: received {len(videos)} videos from API")
+            
+            # Filter by date
+            videos_added_for_this_channel = 0
+            for video in videos:
+                # Parse published date
+                pub_date_str = video.get('published_at', '')
+                if pub_date_str:
+                    # Handle both ISO format and simple date format
+                    try:
+                        if 'T' in pub_date_str:
+                            pub_date = datetime.fromisoformat(pub_date_str.replace('Z', '+00:00'))
+                        else:
+                            pub_date = datetime.strptime(pub_date_str, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+                        
+                        # Check if video is within date range
+                        if pub_date >= cutoff_date:
+                            # Filter by video type if specified
+                            if request.video_type != 'all':
+                                duration = video.get('duration', '')
+                                is_short = is_video_short(duration)
                                 
-                                all_videos.append(video)
-                                videos_added_for_this_channel += 1
-                            else:
-                                # Video is too old
-                                pass
-                        except Exception as e:
-                            print(f"⚠️  Warning: Could not parse date {pub_date_str}: {str(e)}")
-                            # Include video anyway if we can't parse date
+                                if request.video_type == 'shorts' and not is_short:
+                                    continue
+                                if request.video_type == 'videos' and is_short:
+                                    continue
+                            
                             all_videos.append(video)
                             videos_added_for_this_channel += 1
-                
-                print(f"   ✓ Added {videos_added_for_this_channel} videos from this channel")
-                
-            except Exception as e:
-                print(f"⚠️  Warning: Failed to fetch videos for channel {channel_id}: {str(e)}")
-                continue
+                    except Exception as e:
+                        print(f"⚠️  Warning: Could not parse date {pub_date_str}: {str(e)}")
+                        # Include video anyway if we can't parse date
+                        all_videos.append(video)
+                        videos_added_for_this_channel += 1
+            
+            print(f"   ✓ Added {videos_added_for_this_channel} videos from this channel")
         
         # Sort by published date (most recent first)
         all_videos.sort(key=lambda x: x.get('published_at', ''), reverse=True)
@@ -1893,18 +2280,18 @@ Make suggestions actionable and specific to Zero1's brand and audience."""
         
         # Call AI service
         import json
-        response = ai_service.client.chat.completions.create(
-            model="gpt-4-turbo-preview",
+        response = await ai_service.chat_completion(
             messages=[
                 {"role": "system", "content": "You are a YouTube content strategist specializing in finance and personal finance content."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,
             max_tokens=3000,
-            response_format={"type": "json_object"}
+            response_format={"type": "json_object"},
+            use_cache=request.use_cache
         )
         
-        result = json.loads(response.choices[0].message.content)
+        result = json.loads(response)
         
         print(f"✅ Trend analysis complete!\n")
         
@@ -1,51 +1,190 @@
-from typing import List, Dict, Optional
-from openai import OpenAI
+from typing import AsyncIterator, List, Dict, Optional
+from openai import AsyncOpenAI
+import os
 import json
 import base64
 import httpx
 
+from services.priority_lanes import build_scheduler
+from services.llm_cache import LLMCache
+from services.prompt_budget import PromptBuilder
+
+DEFAULT_MODEL = "gpt-4-turbo-preview"
+
+RESPONSE_MAX_TOKENS = 4000  # Increased for longer responses
+SERIES_SYSTEM_PROMPT = "You are a YouTube content strategist. Analyze selected videos' transcripts and comments to suggest specific, actionable content ideas directly related to them."
+FORMAT_SYSTEM_PROMPT = "You analyze YouTube content and adapt competitor ideas to match a channel's unique style and voice."
+SERIES_COMPLETION = {"temperature": 0.7, "max_tokens": 2500, "response_format": {"type": "json_object"}}
+
 
 class AIService:
-    def __init__(self, api_key: str):
+    """
+    All OpenAI traffic goes through one AsyncOpenAI client sharing a pooled
+    httpx.AsyncClient; a priority scheduler caps concurrent completions and
+    identical chat requests are answered from the persistent LLM cache.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        max_concurrency: Optional[int] = None,
+        timeout_seconds: Optional[float] = None,
+        max_retries: Optional[int] = None
+    ):
         self.api_key = api_key
-        self.client = OpenAI(api_key=api_key)
+        self.max_concurrency = max_concurrency or int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+        self.timeout_seconds = timeout_seconds or float(os.getenv("OPENAI_TIMEOUT", "120"))
+        max_retries = max_retries if max_retries is not None else int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+        self.http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout_seconds, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+                keepalive_expiry=60
+            )
+        )
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            http_client=self.http_client,
+            timeout=self.timeout_seconds,
+            max_retries=max_retries
+        )
+        self.scheduler = build_scheduler("openai", self.max_concurrency)
+        self.cache = LLMCache()
+
+    async def chat_completion(
+        self,
+        messages: List[Dict],
+        model: str = DEFAULT_MODEL,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        response_format: Optional[Dict] = None,
+        use_cache: bool = True
+    ) -> str:
+        """
+        Run a chat completion in the caller's lane and return the message content
+        use_cache=False skips the response cache for this call (neither read nor written)
+        """
+        cache_key = None
+        if self.cache.enabled and use_cache:
+            cache_key = LLMCache.make_key(model, messages, temperature, response_format, max_tokens)
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                print(f"💾 LLM cache hit ({model})")
+                return cached
+        elif self.cache.enabled:
+            self.cache.stats["bypassed"] += 1
+
+        params = {"model": model, "messages": messages, "temperature": temperature}
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        if response_format is not None:
+            params["response_format"] = response_format
+
+        async with self.scheduler.slot():
+            response = await self.client.chat.completions.create(**params)
+        content = response.choices[0].message.content
+
+        if cache_key and content and response.choices[0].finish_reason == "stop":
+            await self.cache.put(cache_key, model, content)
+        return content
+
+    async def stream_chat_completion(
+        self,
+        messages: List[Dict],
+        model: str = DEFAULT_MODEL,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        response_format: Optional[Dict] = None,
+        use_cache: bool = True
+    ) -> AsyncIterator[str]:
+        """
+        Yield a chat completion as text deltas while it is generated
+        Shares the response cache with chat_completion - a hit is yielded in one piece
+        """
+        cache_key = None
+        if self.cache.enabled and use_cache:
+            cache_key = LLMCache.make_key(model, messages, temperature, response_format, max_tokens)
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                print(f"💾 LLM cache hit ({model})")
+                yield cached
+                return
+        elif self.cache.enabled:
+            self.cache.stats["bypassed"] += 1
+
+        params = {"model": model, "messages": messages, "temperature": temperature, "stream": True}
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        if response_format is not None:
+            params["response_format"] = response_format
+
+        parts = []
+        finish_reason = None
+        async with self.scheduler.slot():
+            stream = await self.client.chat.completions.create(**params)
+            try:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    choice = chunk.choices[0]
+                    finish_reason = choice.finish_reason or finish_reason
+                    delta = choice.delta.content if choice.delta else None
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+            finally:
+                await stream.close()
+
+        if cache_key and parts and finish_reason == "stop":
+            await self.cache.put(cache_key, model, "".join(parts))
+
+    def stream_response(self, prompt: str, model: str = DEFAULT_MODEL, temperature: float = 0.7, use_cache: bool = True) -> AsyncIterator[str]:
+        """Streaming variant of generate_response"""
+        return self.stream_chat_completion(
+            self._response_messages(prompt),
+            model=model,
+            temperature=temperature,
+            max_tokens=RESPONSE_MAX_TOKENS,
+            use_cache=use_cache
+        )
+
+    def stream_suggest_series(self, channel_context: Dict, videos_data: List[Dict], additional_prompt: Optional[str] = None, use_cache: bool = True) -> AsyncIterator[str]:
+        """Streaming variant of suggest_series - yields the raw JSON text as it is generated"""
+        return self.stream_chat_completion(
+            self._series_messages(channel_context, videos_data, additional_prompt),
+            use_cache=use_cache,
+            **SERIES_COMPLETION
+        )
+
+    async def close(self):
+        await self.client.close()
     
-    async def suggest_series(self, channel_context: Dict, videos_data: List[Dict], additional_prompt: Optional[str] = None) -> Dict:
-        """Generate series suggestions based on channel and video analysis"""
+    def _series_messages(self, channel_context: Dict, videos_data: List[Dict], additional_prompt: Optional[str] = None) -> List[Dict]:
+        """Chat messages for a series suggestion request"""
         
-        # Prepare context for the prompt
-        channel_desc = f"""
-Channel: {channel_context['title']}
-Description: {channel_context['description']}
-Subscribers: {channel_context['subscriber_count']}
-"""
-        
-        videos_summary = []
-        for idx, video in enumerate(videos_data, 1):
-            # Optimize: Reduce transcript to 3000 chars (saves tokens)
-            transcript = video.get('transcript', 'N/A')
-            if transcript and transcript != 'N/A':
-                transcript = transcript[:3000]
-            
-            video_text = f"""
+        def render(videos: List[Dict]) -> str:
+            videos_summary = []
+            for idx, video in enumerate(videos, 1):
+                video_text = f"""
 ═══ VIDEO {idx}: {video['title']} ═══
 
-DESCRIPTION: {video.get('description', 'N/A')[:400]}
+DESCRIPTION: {video.get('description') or 'N/A'}
 
-TRANSCRIPT: {transcript}
+TRANSCRIPT: {video.get('transcript') or 'N/A'}
 
 TOP COMMENTS:
 """
-            # Optimize: Reduce to 15 comments at 200 chars each
-            if video.get('comments'):
-                for cidx, comment in enumerate(video['comments'][:15], 1):
-                    video_text += f"{cidx}. {comment['text'][:200]}\n"
-            else:
-                video_text += "No comments.\n"
+                if video.get('comments'):
+                    for cidx, comment in enumerate(video['comments'], 1):
+                        video_text += f"{cidx}. {comment['text']}\n"
+                else:
+                    video_text += "No comments.\n"
+                
+                videos_summary.append(video_text)
             
-            videos_summary.append(video_text)
-        
-        prompt = f"""You are a YouTube content strategist analyzing specific videos to suggest targeted content ideas.
+            prompt = f"""You are a YouTube content strategist analyzing specific videos to suggest targeted content ideas.
 
 CHANNEL: {channel_context['title']}
 
@@ -70,9 +209,9 @@ OUTPUT (3-5 series, 5-10 additional topics, 3-5 content gaps):
 3. **Content Gaps**: Unanswered questions from comments
 """
 
-        # Add additional prompt if provided
-        if additional_prompt:
-            prompt += f"""
+            # Add additional prompt if provided
+            if additional_prompt:
+                prompt += f"""
 
 **Additional Instructions from User:**
 {additional_prompt}
@@ -80,7 +219,7 @@ OUTPUT (3-5 series, 5-10 additional topics, 3-5 content gaps):
 Please incorporate these instructions into your analysis and suggestions.
 """
 
-        prompt += """
+            prompt += """
 
 Provide your response in JSON format:
 {{
@@ -96,20 +235,27 @@ Provide your response in JSON format:
   "content_gaps": ["Gap 1", "Gap 2", ...]
 }}
 """
+            return prompt
+        
+        # Fill the context window with transcripts/comments instead of fixed character cuts
+        builder = PromptBuilder(DEFAULT_MODEL, completion_tokens=SERIES_COMPLETION["max_tokens"])
+        prompt, _ = builder.build(videos_data, render, system_prompt=SERIES_SYSTEM_PROMPT)
+        return [
+            {"role": "system", "content": SERIES_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+    
+    async def suggest_series(self, channel_context: Dict, videos_data: List[Dict], additional_prompt: Optional[str] = None, use_cache: bool = True) -> Dict:
+        """Generate series suggestions based on channel and video analysis"""
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": "You are a YouTube content strategist. Analyze selected videos' transcripts and comments to suggest specific, actionable content ideas directly related to them."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=2500,
-                response_format={"type": "json_object"}
+            content = await self.chat_completion(
+                messages=self._series_messages(channel_context, videos_data, additional_prompt),
+                use_cache=use_cache,
+                **SERIES_COMPLETION
             )
             
-            result = json.loads(response.choices[0].message.content)
+            result = json.loads(content)
             return result
             
         except Exception as e:
@@ -121,43 +267,44 @@ Provide your response in JSON format:
                 "error": str(e)
             }
     
-    async def suggest_format(self, my_videos: List[Dict], competitor_videos: List[Dict], additional_prompt: Optional[str] = None) -> Dict:
+    async def suggest_format(self, my_videos: List[Dict], competitor_videos: List[Dict], additional_prompt: Optional[str] = None, use_cache: bool = True) -> Dict:
         """Analyze competitor videos and suggest how to adapt topics to your channel's format"""
-        
-        my_videos_summary = []
-        for idx, video in enumerate(my_videos, 1):
-            transcript = video.get('transcript', 'N/A')
-            if transcript and transcript != 'N/A':
-                transcript = transcript[:2500]  # Optimized
-            
-            video_text = f"""
+
+        # My videos only set the style reference, so they carry no comments
+        my_count = len(my_videos)
+        videos = [{**video, 'comments': []} for video in my_videos] + list(competitor_videos)
+
+        def render(fitted: List[Dict]) -> str:
+            my_videos_summary = []
+            for idx, video in enumerate(fitted[:my_count], 1):
+                transcript = video.get('transcript') or 'N/A'
+
+                video_text = f"""
 ═══ MY VIDEO {idx}: {video['title']} ═══
-DESC: {video.get('description', 'N/A')[:300]}
+DESC: {video.get('description') or 'N/A'}
 STYLE: {transcript}
 """
-            my_videos_summary.append(video_text)
-        
-        competitor_videos_summary = []
-        for idx, video in enumerate(competitor_videos, 1):
-            transcript = video.get('transcript', 'N/A')
-            if transcript and transcript != 'N/A':
-                transcript = transcript[:3000]  # Optimized
-            
-            video_text = f"""
+                my_videos_summary.append(video_text)
+
+            competitor_videos_summary = []
+            for idx, video in enumerate(fitted[my_count:], 1):
+                transcript = video.get('transcript') or 'N/A'
+
+                video_text = f"""
 ═══ COMPETITOR {idx}: {video['title']} ═══
-DESC: {video.get('description', 'N/A')[:300]}
+DESC: {video.get('description') or 'N/A'}
 TRANSCRIPT: {transcript}
 COMMENTS:
 """
-            if video.get('comments'):
-                for cidx, comment in enumerate(video['comments'][:12], 1):  # Reduced to 12
-                    video_text += f"{cidx}. {comment['text'][:180]}\n"  # Reduced to 180 chars
-            else:
-                video_text += "None\n"
-            
-            competitor_videos_summary.append(video_text)
-        
-        prompt = f"""Analyze competitor videos and adapt them to MY channel's style.
+                if video.get('comments'):
+                    for cidx, comment in enumerate(video['comments'], 1):
+                        video_text += f"{cidx}. {comment['text']}\n"
+                else:
+                    video_text += "None\n"
+
+                competitor_videos_summary.append(video_text)
+
+            prompt = f"""Analyze competitor videos and adapt them to MY channel's style.
 
 MY CHANNEL STYLE:
 {''.join(my_videos_summary)}
@@ -185,9 +332,9 @@ OUTPUT:
 3. **Bonus Ideas**: Related topics fitting MY style
 """
 
-        # Add additional prompt if provided
-        if additional_prompt:
-            prompt += f"""
+            # Add additional prompt if provided
+            if additional_prompt:
+                prompt += f"""
 
 **Additional Instructions from User:**
 {additional_prompt}
@@ -195,7 +342,7 @@ OUTPUT:
 Please incorporate these instructions into your format analysis and adaptations.
 """
 
-        prompt += """
+            prompt += """
 
 Provide your response in JSON format:
 {{
@@ -217,20 +364,25 @@ Provide your response in JSON format:
   "bonus_ideas": ["Additional video idea 1", "Additional video idea 2", ...]
 }}
 """
-        
+            return prompt
+
+        prompt, _ = PromptBuilder(DEFAULT_MODEL, completion_tokens=3000).build(
+            videos, render, system_prompt=FORMAT_SYSTEM_PROMPT
+        )
+
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4-turbo-preview",
+            content = await self.chat_completion(
                 messages=[
-                    {"role": "system", "content": "You analyze YouTube content and adapt competitor ideas to match a channel's unique style and voice."},
+                    {"role": "system", "content": FORMAT_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.7,
                 max_tokens=3000,
-                response_format={"type": "json_object"}
+                response_format={"type": "json_object"},
+                use_cache=use_cache
             )
             
-            result = json.loads(response.choices[0].message.content)
+            result = json.loads(content)
             return result
             
         except Exception as e:
@@ -242,20 +394,25 @@ Provide your response in JSON format:
                 "error": str(e)
             }
     
-    async def generate_response(self, prompt: str, model: str = "gpt-4-turbo-preview", temperature: float = 0.7) -> str:
+    @staticmethod
+    def _response_messages(prompt: str) -> List[Dict]:
+        return [
+            {"role": "system", "content": "You are a helpful assistant that provides analysis in the exact format requested."},
+            {"role": "user", "content": prompt}
+        ]
+    
+    async def generate_response(self, prompt: str, model: str = DEFAULT_MODEL, temperature: float = 0.7, use_cache: bool = True) -> str:
         """Generate a text response from OpenAI"""
         try:
-            response = self.client.chat.completions.create(
+            content = await self.chat_completion(
                 model=model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that provides analysis in the exact format requested."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=self._response_messages(prompt),
                 temperature=temperature,
-                max_tokens=4000  # Increased for longer responses
+                max_tokens=RESPONSE_MAX_TOKENS,
+                use_cache=use_cache
             )
             
-            return response.choices[0].message.content
+            return content
             
         except Exception as e:
             print(f"OpenAI API error: {str(e)}")
@@ -302,8 +459,7 @@ Examples:
   }}
 """
 
-            response = self.client.chat.completions.create(
-                model="gpt-4-turbo-preview",
+            content = await self.chat_completion(
                 messages=[
                     {"role": "system", "content": "You are an expert at understanding content topics and extracting search keywords."},
                     {"role": "user", "content": prompt}
@@ -313,7 +469,7 @@ Examples:
                 response_format={"type": "json_object"}
             )
             
-            result = json.loads(response.choices[0].message.content)
+            result = json.loads(content)
             return result
             
         except Exception as e:
@@ -348,13 +504,14 @@ Make it attention-grabbing and optimized for YouTube."""
             print(f"Prompt: {dalle_prompt[:200]}...")
             
             # Generate thumbnail using DALL-E
-            response = self.client.images.generate(
-                model="dall-e-3",
-                prompt=dalle_prompt,
-                size="1792x1024",  # Closest to 16:9 ratio
-                quality="standard",
-                n=1,
-            )
+            async with self.scheduler.slot():
+                response = await self.client.images.generate(
+                    model="dall-e-3",
+                    prompt=dalle_prompt,
+                    size="1792x1024",  # Closest to 16:9 ratio
+                    quality="standard",
+                    n=1,
+                )
             
             thumbnail_url = response.data[0].url
             revised_prompt = getattr(response.data[0], 'revised_prompt', dalle_prompt)
@@ -0,0 +1,82 @@
+"""
+DataLoader-style request coalescing
+Collects individual load(key) calls made in the same event-loop tick (or a short
+window) and resolves them with as few batch calls as possible
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+from services.priority_lanes import current_lane, request_lane
+
+
+class BatchLoader:
+    """
+    Coalesces concurrent single-key lookups into batched calls
+
+    batch_fn receives a list of unique keys (at most max_batch_size) and must return
+    a dict mapping key -> value. A value may be an Exception, which is raised only
+    for the callers waiting on that key. Keys missing from the dict raise KeyError.
+    Keys are batched per priority lane and each batch runs in its callers' lane.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        max_batch_size: int = 50,
+        window_seconds: float = 0.0
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.window_seconds = window_seconds
+        self._pending: Dict[str, Dict[Hashable, List[asyncio.Future]]] = {}
+        self._dispatch_scheduled = False
+        self.stats = {"loads": 0, "batches": 0}
+
+    def load(self, key: Hashable) -> Awaitable[Any]:
+        """Queue a key and return an awaitable resolving to its value"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(current_lane.get(), {}).setdefault(key, []).append(future)
+        self.stats["loads"] += 1
+
+        if not self._dispatch_scheduled:
+            self._dispatch_scheduled = True
+            if self.window_seconds > 0:
+                loop.call_later(self.window_seconds, self._dispatch)
+            else:
+                loop.call_soon(self._dispatch)
+        return future
+
+    def _dispatch(self):
+        """Split everything queued so far into batches and start them"""
+        pending, self._pending = self._pending, {}
+        self._dispatch_scheduled = False
+
+        for lane, lane_pending in pending.items():
+            keys = list(lane_pending.keys())
+            for i in range(0, len(keys), self.max_batch_size):
+                batch = {key: lane_pending[key] for key in keys[i:i + self.max_batch_size]}
+                asyncio.ensure_future(self._run_batch(lane, batch))
+
+    async def _run_batch(self, lane: str, batch: Dict[Hashable, List[asyncio.Future]]):
+        self.stats["batches"] += 1
+        try:
+            # The dispatch callback carries whichever caller scheduled it - run in this batch's lane
+            with request_lane(lane):
+                results = await self.batch_fn(list(batch.keys()))
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for key, futures in batch.items():
+            result = results.get(key, KeyError(key))
+            for future in futures:
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
@@ -0,0 +1,185 @@
+"""
+Bounded in-process cache with LRU eviction and TTL expiry,
+plus negative-cache markers and a Bloom filter for bulk membership checks
+"""
+import json
+import math
+import time
+import hashlib
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, Dict, Iterable, Optional
+
+
+class Unavailable:
+    """
+    Negative-cache entry: the resource is known not to exist for this video
+    (transcripts disabled, no captions, comments turned off, ...)
+    """
+    __slots__ = ("kind", "reason")
+
+    def __init__(self, kind: str, reason: str):
+        self.kind = kind
+        self.reason = reason
+
+    def __repr__(self) -> str:
+        return f"Unavailable({self.kind!r}, {self.reason!r})"
+
+
+class Cache:
+    """
+    LRU + TTL cache bounded by entry count and an approximate byte budget
+
+    TTLs use the monotonic clock. Expired entries are removed when read and by a
+    small amortized sweep of the least-recently-used end on every write, so memory
+    is reclaimed without a separate cleanup job.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 3600,
+        max_entries: int = 1000,
+        max_bytes: int = 64 * 1024 * 1024,
+        name: str = "cache",
+        sweep_batch: int = 8
+    ):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.name = name
+        self.sweep_batch = sweep_batch
+
+        # key -> (value, expires_at, size_bytes); ordered least- to most-recently used
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _estimate_size(value: Any) -> int:
+        """Approximate memory footprint of a cached value in bytes"""
+        if isinstance(value, Unavailable):
+            return 64
+        if isinstance(value, str):
+            return len(value.encode('utf-8'))
+        try:
+            return len(json.dumps(value, default=str))
+        except (TypeError, ValueError):
+            return 1024
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at, _ = entry
+        if time.monotonic() >= expires_at:
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        """Store a value; ttl_seconds overrides the cache-wide TTL for this entry"""
+        size = self._estimate_size(value)
+        if size > self.max_bytes:
+            return  # Larger than the whole budget - never cache
+
+        if key in self._data:
+            self._remove(key)
+
+        ttl = self.ttl if ttl_seconds is None else ttl_seconds
+        self._data[key] = (value, time.monotonic() + ttl, size)
+        self._bytes += size
+
+        self._sweep_expired()
+        while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._data))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def delete(self, key: str):
+        if key in self._data:
+            self._remove(key)
+
+    def _remove(self, key: str):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def _sweep_expired(self):
+        """Check a few least-recently-used entries and drop the expired ones"""
+        now = time.monotonic()
+        expired = [
+            key for key, (_, expires_at, _) in islice(self._data.items(), self.sweep_batch)
+            if now >= expires_at
+        ]
+        for key in expired:
+            self._remove(key)
+            self.expirations += 1
+
+    def clear_old(self):
+        """Clear all expired entries"""
+        now = time.monotonic()
+        expired = [key for key, (_, expires_at, _) in self._data.items() if now >= expires_at]
+        for key in expired:
+            self._remove(key)
+            self.expirations += 1
+
+    def __contains__(self, key: str) -> bool:
+        """Non-expired entry present (doesn't count as a lookup or touch LRU order)"""
+        entry = self._data.get(key)
+        return entry is not None and time.monotonic() < entry[1]
+    
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+class BloomFilter:
+    """
+    Compact set-membership filter: no false negatives, tunable false-positive rate
+    Used as a fast path to rule out keys before an exact (database) lookup
+    """
+
+    def __init__(self, expected_items: int = 50000, false_positive_rate: float = 0.01):
+        self.size = max(64, int(-expected_items * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / expected_items * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> Iterable[int]:
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self._bits[pos // 8] |= 1 << (pos % 8)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos // 8] & (1 << (pos % 8)) for pos in self._positions(key))
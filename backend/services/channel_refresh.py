@@ -0,0 +1,126 @@
+"""
+Channel cache refresh with stale-while-revalidate
+A stale channel_cache row inside the grace window is served immediately while a
+background task re-fetches it - at most one refresh per channel at a time, whether
+it runs in the background or inline for a request that can't be served from cache
+"""
+import os
+import asyncio
+from typing import Dict, Optional
+
+from fastapi import BackgroundTasks
+
+from database import session_scope
+from services.db_service import DatabaseService
+from services.priority_lanes import request_lane, BACKGROUND
+
+
+class ChannelRefresher:
+    """Re-fetches channel info + top videos into channel_cache"""
+
+    def __init__(self, youtube_service, grace_hours: float = None):
+        self.youtube_service = youtube_service
+        self.grace_seconds = (grace_hours or float(os.getenv("CHANNEL_STALE_GRACE_HOURS", "72"))) * 3600
+        # channel_id -> future resolved with the fresh data (None on failure) when the claim is released
+        self._refreshing: Dict[str, asyncio.Future] = {}
+        self.stats = {
+            "stale_served": 0, "background_refreshes": 0, "background_failures": 0,
+            "skipped_in_flight": 0, "inline_refreshes": 0, "inline_joined": 0
+        }
+
+    def is_refreshing(self, channel_id: str) -> bool:
+        return channel_id in self._refreshing
+
+    def within_grace(self, expires_in_seconds: float) -> bool:
+        """True if a stale entry is recent enough to serve while revalidating"""
+        return -expires_in_seconds <= self.grace_seconds
+
+    async def refresh(self, channel_id: str, max_videos: int = 100) -> Dict:
+        """Fetch channel info and top videos and save them to channel_cache"""
+        channel_info, recent_videos = await asyncio.gather(
+            self.youtube_service.get_channel_info(channel_id),
+            self.youtube_service.get_channel_videos(channel_id, max_results=max_videos)
+        )
+
+        with session_scope() as db:
+            DatabaseService(db).save_channel_cache(
+                channel_id=channel_id,
+                channel_title=channel_info.get('title', ''),
+                thumbnail_url=channel_info.get('thumbnail', ''),
+                subscriber_count=int(channel_info.get('subscriber_count', 0)),
+                video_count=int(channel_info.get('video_count', 0)),
+                videos=recent_videos
+            )
+        print(f"✅ Saved channel {channel_id} to database cache")
+
+        return {"channel": channel_info, "recent_videos": recent_videos}
+
+    def _claim(self, channel_id: str):
+        self._refreshing[channel_id] = asyncio.get_running_loop().create_future()
+
+    def _release(self, channel_id: str, fresh: Optional[Dict]):
+        future = self._refreshing.pop(channel_id, None)
+        if future and not future.done():
+            future.set_result(fresh)
+
+    async def refresh_inline(self, channel_id: str, max_videos: int = 100) -> Dict:
+        """
+        Refresh for a request that has nothing servable in the cache
+        Joins a refresh already running for this channel instead of fetching it twice,
+        and holds the claim itself otherwise so background refreshes don't start alongside
+        """
+        while channel_id in self._refreshing:
+            self.stats["inline_joined"] += 1
+            fresh = await asyncio.shield(self._refreshing[channel_id])
+            if fresh is not None:
+                return fresh
+            # That refresh failed - fetch it ourselves unless another one has started
+
+        self._claim(channel_id)
+        fresh = None
+        try:
+            fresh = await self.refresh(channel_id, max_videos)
+            self.stats["inline_refreshes"] += 1
+            return fresh
+        finally:
+            self._release(channel_id, fresh)
+
+    async def refresh_exclusive(self, channel_id: str, max_videos: int = 100) -> bool:
+        """Refresh unless a refresh for this channel is already running; True if it ran and succeeded"""
+        if channel_id in self._refreshing:
+            self.stats["skipped_in_flight"] += 1
+            return False
+        self._claim(channel_id)
+        return await self._run_claimed(channel_id, max_videos)
+
+    def schedule(self, background_tasks: BackgroundTasks, channel_id: str, max_videos: int = 100) -> bool:
+        """Queue a refresh to run after the response is sent; False if one is already in flight"""
+        if channel_id in self._refreshing:
+            self.stats["skipped_in_flight"] += 1
+            return False
+        # Claim now so concurrent stale hits don't queue duplicates before the task starts
+        self._claim(channel_id)
+        background_tasks.add_task(self._run_claimed, channel_id, max_videos)
+        return True
+
+    async def _run_claimed(self, channel_id: str, max_videos: int) -> bool:
+        fresh = None
+        try:
+            print(f"🔄 Revalidating channel cache for {channel_id} in the background")
+            with request_lane(BACKGROUND):
+                fresh = await self.refresh(channel_id, max_videos)
+            self.stats["background_refreshes"] += 1
+            return True
+        except Exception as e:
+            self.stats["background_failures"] += 1
+            print(f"⚠️ Background refresh failed for {channel_id}: {e}")
+            return False
+        finally:
+            self._release(channel_id, fresh)
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "grace_hours": self.grace_seconds / 3600,
+            "in_flight": sorted(self._refreshing)
+        }
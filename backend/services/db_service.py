@@ -6,14 +6,16 @@ from datetime import datetime, timedelta
 from typing import Optional, List, Dict
 import json
 
-from database import VideoMetadata, ChannelCache
+from database import VideoMetadata, ChannelCache, ChannelSyncState, ChannelHandle
+from services.ttl_policy import TTLPolicy, get_ttl_policy, estimate_velocity
 
 
 class DatabaseService:
     """Handles video metadata caching in database"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, ttl_policy: Optional[TTLPolicy] = None):
         self.db = db
+        self.ttl_policy = ttl_policy or get_ttl_policy()
     
     def get_video_metadata(self, video_id: str) -> Optional[VideoMetadata]:
         """
@@ -44,7 +46,10 @@ class DatabaseService:
         channel_id: str,
         channel_title: str,
         transcript: Optional[str] = None,
-        comments: Optional[List[Dict]] = None
+        comments: Optional[List[Dict]] = None,
+        like_count: Optional[int] = None,
+        comment_count: Optional[int] = None,
+        published_at: Optional[str] = None
     ) -> VideoMetadata:
         """
         Save or update video metadata in database
@@ -59,11 +64,15 @@ class DatabaseService:
             video.view_count = view_count
             video.channel_id = channel_id
             video.channel_title = channel_title
+            video.like_count = like_count if like_count is not None else video.like_count
+            video.comment_count = comment_count if comment_count is not None else video.comment_count
+            video.published_at = published_at or video.published_at
             
             if transcript is not None:
                 video.transcript = transcript
             if comments is not None:
                 video.comments = comments
+                video.comments_refreshed_at = datetime.utcnow()
             
             video.updated_at = datetime.utcnow()
         else:
@@ -75,8 +84,12 @@ class DatabaseService:
                 view_count=view_count,
                 channel_id=channel_id,
                 channel_title=channel_title,
+                like_count=like_count,
+                comment_count=comment_count,
+                published_at=published_at,
                 transcript=transcript,
-                comments=comments
+                comments=comments,
+                comments_refreshed_at=datetime.utcnow() if comments is not None else None
             )
             self.db.add(video)
         
@@ -84,37 +97,131 @@ class DatabaseService:
         self.db.refresh(video)
         return video
     
-    def update_transcript(self, video_id: str, transcript: str) -> bool:
-        """Update only the transcript for a video"""
+    def update_transcript(self, video_id: str, transcript: str, create_if_missing: bool = False) -> bool:
+        """Update only the transcript for a video (optionally creating a bare row)"""
         video = self.get_video_metadata(video_id)
+        if not video and create_if_missing:
+            video = VideoMetadata(video_id=video_id)
+            self.db.add(video)
         if video:
             video.transcript = transcript
+            self._clear_unavailable(video, 'transcript')
             video.updated_at = datetime.utcnow()
             self.db.commit()
             return True
         return False
     
-    def update_comments(self, video_id: str, comments: List[Dict]) -> bool:
-        """Update only the comments for a video"""
+    def update_comments(self, video_id: str, comments: List[Dict], create_if_missing: bool = False) -> bool:
+        """
+        Update only the comments for a video (optionally creating a bare row)
+        A shorter list never replaces a longer one that is already stored - the fresh
+        comments go first and the stored ones they don't repeat fill up the rest.
+        Either way the comments count as refreshed.
+        """
         video = self.get_video_metadata(video_id)
+        if not video and create_if_missing:
+            video = VideoMetadata(video_id=video_id)
+            self.db.add(video)
         if video:
+            if video.comments and len(video.comments) > len(comments):
+                comments = self.merge_comments(comments, video.comments)
+            now = datetime.utcnow()
             video.comments = comments
-            video.updated_at = datetime.utcnow()
+            self._clear_unavailable(video, 'comments')
+            video.comments_refreshed_at = now
+            video.updated_at = now
             self.db.commit()
             return True
         return False
     
-    def is_cache_fresh(self, video_id: str, max_age_hours: int = 24) -> bool:
+    @staticmethod
+    def merge_comments(fresh: List[Dict], stored: List[Dict]) -> List[Dict]:
+        """fresh, then the stored comments not among them, up to the stored list's length"""
+        seen = {(c.get('author'), c.get('text')) for c in fresh}
+        extra = [c for c in stored if (c.get('author'), c.get('text')) not in seen]
+        return list(fresh) + extra[:max(0, len(stored) - len(fresh))]
+    
+    # Negative cache methods (known-unavailable transcripts / comments)
+    def mark_unavailable(self, video_id: str, kind: str, reason: str):
+        """Record that a video's transcript or comments are unavailable"""
+        video = self.get_video_metadata(video_id)
+        if not video:
+            video = VideoMetadata(video_id=video_id)
+            self.db.add(video)
+        
+        # Reassign the dict so SQLAlchemy detects the JSON change
+        unavailable = dict(video.unavailable or {})
+        unavailable[kind] = {"reason": reason, "checked_at": datetime.utcnow().isoformat()}
+        video.unavailable = unavailable
+        self.db.commit()
+    
+    @staticmethod
+    def _clear_unavailable(video: VideoMetadata, kind: str):
+        if video.unavailable and kind in video.unavailable:
+            unavailable = dict(video.unavailable)
+            unavailable.pop(kind)
+            video.unavailable = unavailable or None
+    
+    @staticmethod
+    def fresh_unavailable_reason(video: VideoMetadata, kind: str, max_age_hours: float) -> Optional[str]:
+        """Reason a video's transcript/comments are unavailable, if recorded within max_age_hours"""
+        entry = (video.unavailable or {}).get(kind)
+        if not entry:
+            return None
+        try:
+            checked_at = datetime.fromisoformat(entry.get("checked_at", ""))
+        except ValueError:
+            return None
+        if datetime.utcnow() - checked_at >= timedelta(hours=max_age_hours):
+            return None
+        return entry.get("reason") or "unavailable"
+    
+    def get_unavailable(self, video_ids: List[str], kind: str, max_age_hours: float) -> Dict[str, str]:
+        """Map video_id -> reason for videos whose transcript/comments are known unavailable"""
+        result = {}
+        for video_id, video in self.get_multiple_videos(video_ids).items():
+            reason = self.fresh_unavailable_reason(video, kind, max_age_hours)
+            if reason:
+                result[video_id] = reason
+        return result
+    
+    def get_all_unavailable_ids(self, kind: str) -> List[str]:
+        """Every video ID with a negative-cache entry of this kind (fresh or not)"""
+        videos = self.db.query(VideoMetadata).filter(VideoMetadata.unavailable.isnot(None)).all()
+        return [video.video_id for video in videos if kind in (video.unavailable or {})]
+    
+    def is_cache_fresh(self, video_id: str, max_age_hours: Optional[float] = None, kind: str = 'stats') -> bool:
         """
         Check if cached data is still fresh
         Returns False if cache doesn't exist or is too old
+        Without max_age_hours the TTL comes from the policy (published age + view velocity)
         """
-        video = self.get_video_metadata(video_id)
+        return self.is_video_fresh(self.get_video_metadata(video_id), max_age_hours, kind)
+    
+    def video_ttl_seconds(self, video: VideoMetadata, kind: str = 'stats', default: Optional[float] = None) -> float:
+        """Policy TTL for a cached video row (default applies when its publish date is unknown)"""
+        velocity = video.view_velocity or estimate_velocity(video.view_count, video.published_at)
+        return self.ttl_policy.ttl_seconds(kind, video.published_at, velocity, default=default)
+    
+    def is_video_fresh(self, video: Optional[VideoMetadata], max_age_hours: Optional[float] = None, kind: str = 'stats') -> bool:
+        """Freshness check for an already-loaded row (see is_cache_fresh)"""
         if not video or not video.updated_at:
             return False
         
-        age = datetime.utcnow() - video.updated_at
-        return age < timedelta(hours=max_age_hours)
+        # Stats-only refreshes keep updated_at, so they count towards stats freshness
+        refreshed_at = video.updated_at
+        if kind == 'stats' and video.stats_refreshed_at and video.stats_refreshed_at > refreshed_at:
+            refreshed_at = video.stats_refreshed_at
+        # Comments track their own fetch time so transcript writes don't keep them "fresh"
+        # (rows cached before comments_refreshed_at existed fall back to updated_at)
+        if kind == 'comments' and video.comments_refreshed_at:
+            refreshed_at = video.comments_refreshed_at
+        
+        if max_age_hours is not None:
+            ttl = timedelta(hours=max_age_hours)
+        else:
+            ttl = timedelta(seconds=self.video_ttl_seconds(video, kind))
+        return datetime.utcnow() - refreshed_at < ttl
     
     def get_cache_stats(self) -> Dict:
         """Get statistics about cached videos"""
@@ -184,12 +291,179 @@ class DatabaseService:
             return True
         return False
     
-    def is_channel_cache_fresh(self, channel_id: str, max_age_hours: int = 24) -> bool:
-        """Check if channel cache is still fresh (default: 24 hours)"""
+    def is_channel_cache_fresh(self, channel_id: str, max_age_hours: Optional[float] = None) -> bool:
+        """
+        Check if channel cache is still fresh
+        Without max_age_hours the TTL comes from the policy, keyed on the channel's newest upload
+        """
         channel = self.get_channel_cache(channel_id)
         if not channel or not channel.updated_at:
             return False
+        return self.channel_cache_expires_in(channel, max_age_hours) > 0
+    
+    def channel_cache_expires_in(self, channel: ChannelCache, max_age_hours: Optional[float] = None) -> float:
+        """Seconds until a cached channel goes stale (negative once it has)"""
+        if not channel.updated_at:
+            return float('-inf')
+        if max_age_hours is not None:
+            ttl = max_age_hours * 3600
+        else:
+            ttl = self.channel_ttl_seconds(channel)
+        return ttl - (datetime.utcnow() - channel.updated_at).total_seconds()
+    
+    def channel_ttl_seconds(self, channel: ChannelCache) -> float:
+        """Policy TTL for a cached channel - a channel that just uploaded changes fastest"""
+        newest = max(channel.videos or [], key=lambda v: v.get('published_at') or '', default=None)
+        state = self.get_channel_sync_state(channel.channel_id)
         
-        age = datetime.utcnow() - channel.updated_at
-        return age < timedelta(hours=max_age_hours)
-
+        published_at = newest.get('published_at') if newest else None
+        if state and state.newest_published_at and (not published_at or state.newest_published_at > published_at):
+            published_at = state.newest_published_at
+        
+        velocity = None
+        if newest and newest.get('published_at') == published_at:
+            velocity = estimate_velocity(newest.get('view_count'), published_at)
+        return self.ttl_policy.ttl_seconds('channel', published_at, velocity)
+    
+    # Statistics-only refresh methods
+    def get_cached_video_ids(self, channel_id: Optional[str] = None) -> Dict[str, List[str]]:
+        """
+        Get IDs of cached videos to refresh: {'videos': video_metadata IDs,
+        'channels': {channel_id: IDs in that channel's cached list}}
+        """
+        video_query = self.db.query(VideoMetadata.video_id)
+        channel_query = self.db.query(ChannelCache)
+        if channel_id:
+            video_query = video_query.filter(VideoMetadata.channel_id == channel_id)
+            channel_query = channel_query.filter(ChannelCache.channel_id == channel_id)
+        
+        return {
+            "videos": [row.video_id for row in video_query.all()],
+            "channels": {
+                channel.channel_id: [v['video_id'] for v in channel.videos or [] if v.get('video_id')]
+                for channel in channel_query.all()
+            }
+        }
+    
+    @staticmethod
+    def _parse_count(statistics: Dict, key: str) -> Optional[int]:
+        value = statistics.get(key)
+        return int(value) if value is not None else None
+    
+    def apply_video_statistics(self, statistics: Dict[str, Dict]) -> int:
+        """
+        Patch view/like/comment counts on video_metadata rows in place
+        updated_at is left alone so content freshness (transcripts, comments) is unaffected
+        """
+        now = datetime.utcnow()
+        patched = 0
+        for video in self.get_multiple_videos(list(statistics)).values():
+            stats = statistics[video.video_id]
+            view_count = self._parse_count(stats, 'viewCount') or 0
+            
+            # Observed views/hour since the previous reading feeds the adaptive TTL
+            view_velocity = video.view_velocity
+            last_reading_at = video.stats_refreshed_at or video.updated_at
+            if video.view_count is not None and last_reading_at:
+                hours = (now - last_reading_at).total_seconds() / 3600
+                if hours >= 0.25:
+                    view_velocity = max(0.0, (view_count - video.view_count) / hours)
+            
+            patched += self.db.query(VideoMetadata).filter(VideoMetadata.video_id == video.video_id).update({
+                VideoMetadata.view_count: view_count,
+                VideoMetadata.like_count: self._parse_count(stats, 'likeCount'),
+                VideoMetadata.comment_count: self._parse_count(stats, 'commentCount'),
+                VideoMetadata.view_velocity: view_velocity,
+                VideoMetadata.stats_refreshed_at: now,
+                VideoMetadata.updated_at: VideoMetadata.updated_at
+            }, synchronize_session=False)
+        self.db.commit()
+        return patched
+    
+    def apply_channel_statistics(self, channel_id: str, statistics: Dict[str, Dict]) -> int:
+        """
+        Patch view counts in a channel's cached video list and re-rank it by views
+        Videos missing from the statistics response (deleted or private) are dropped
+        """
+        channel = self.get_channel_cache(channel_id)
+        if not channel or not channel.videos:
+            return 0
+        
+        videos = []
+        for video in channel.videos:
+            stats = statistics.get(video.get('video_id'))
+            if stats is None:
+                continue
+            videos.append({**video, "view_count": self._parse_count(stats, 'viewCount') or 0})
+        videos.sort(key=lambda v: v['view_count'], reverse=True)
+        
+        self.db.query(ChannelCache).filter(ChannelCache.channel_id == channel_id).update({
+            ChannelCache.videos: videos,
+            ChannelCache.stats_refreshed_at: datetime.utcnow(),
+            ChannelCache.updated_at: ChannelCache.updated_at
+        }, synchronize_session=False)
+        self.db.commit()
+        return len(videos)
+    
+    # Incremental channel sync methods
+    def get_channel_sync_state(self, channel_id: str) -> Optional[ChannelSyncState]:
+        """Get the uploads-playlist sync watermark for a channel"""
+        return self.db.query(ChannelSyncState).filter(
+            ChannelSyncState.channel_id == channel_id
+        ).first()
+    
+    def save_channel_sync_state(
+        self,
+        channel_id: str,
+        uploads_playlist_id: str,
+        newest_video_id: Optional[str],
+        newest_published_at: Optional[str],
+        known_video_ids: List[str],
+        videos: List[Dict]
+    ) -> ChannelSyncState:
+        """Save or update the sync watermark and known uploads for a channel"""
+        state = self.get_channel_sync_state(channel_id)
+        
+        if state:
+            state.uploads_playlist_id = uploads_playlist_id
+            state.newest_video_id = newest_video_id
+            state.newest_published_at = newest_published_at
+            state.known_video_ids = known_video_ids
+            state.videos = videos
+            state.last_synced_at = datetime.utcnow()
+        else:
+            state = ChannelSyncState(
+                channel_id=channel_id,
+                uploads_playlist_id=uploads_playlist_id,
+                newest_video_id=newest_video_id,
+                newest_published_at=newest_published_at,
+                known_video_ids=known_video_ids,
+                videos=videos
+            )
+            self.db.add(state)
+        
+        self.db.commit()
+        return state
+    
+    # Handle resolution methods
+    def get_channel_handles(self, handles: List[str]) -> Dict[str, Optional[str]]:
+        """Get stored handle -> channel_id mappings (None for handles known not to resolve)"""
+        if not handles:
+            return {}
+        rows = self.db.query(ChannelHandle).filter(ChannelHandle.handle.in_(handles)).all()
+        return {row.handle: row.channel_id for row in rows}
+    
+    def save_channel_handles(self, mappings: Dict[str, Optional[str]]):
+        """Save or update handle -> channel_id mappings"""
+        existing = {row.handle: row for row in self.db.query(ChannelHandle).filter(
+            ChannelHandle.handle.in_(list(mappings))
+        ).all()}
+        
+        for handle, channel_id in mappings.items():
+            if handle in existing:
+                existing[handle].channel_id = channel_id
+                existing[handle].resolved_at = datetime.utcnow()
+            else:
+                self.db.add(ChannelHandle(handle=handle, channel_id=channel_id))
+        
+        self.db.commit()
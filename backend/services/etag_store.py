@@ -0,0 +1,183 @@
+"""
+ETag store for YouTube API responses
+Keeps each list response with its ETag so it can be revalidated with If-None-Match
+instead of being re-downloaded and re-parsed when nothing has changed
+"""
+import os
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func
+
+from database import ApiResponseCache, session_scope
+
+
+class ETagStore:
+    """
+    Small in-memory LRU in front of the api_response_cache table
+    A 304 from the API serves the stored body and counts as a cache refresh
+
+    Only requests that actually recur are stored (see is_cacheable). Rows expire
+    ttl_days after they were last stored or revalidated, and the table is capped at
+    max_rows by a pruning pass every prune_every writes. Database reads and writes
+    run in a worker thread so they never block the event loop.
+    """
+
+    def __init__(
+        self,
+        max_memory_entries: int = 500,
+        ttl_days: Optional[float] = None,
+        max_rows: Optional[int] = None,
+        prune_every: int = 100
+    ):
+        self.max_memory_entries = max_memory_entries
+        self.ttl_days = ttl_days if ttl_days is not None else float(os.getenv("ETAG_STORE_TTL_DAYS", "7"))
+        self.max_rows = max_rows or int(os.getenv("ETAG_STORE_MAX_ROWS", "5000"))
+        self.prune_every = prune_every
+        # cache_key -> (etag, body, last stored/revalidated at); expires like the rows do
+        self._memory: "OrderedDict[str, Tuple[str, Dict, datetime]]" = OrderedDict()
+        self._writes_since_prune = prune_every - 1   # First write also prunes what earlier runs left behind
+        self.stats = {"conditional_requests": 0, "not_modified": 0, "stored": 0, "skipped": 0, "pruned": 0}
+
+    @staticmethod
+    def make_key(endpoint: str, params: Dict) -> str:
+        """Stable key for an endpoint + params (API key excluded)"""
+        relevant = {k: v for k, v in params.items() if k != 'key'}
+        raw = endpoint + "?" + json.dumps(relevant, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def is_cacheable(endpoint: str, params: Dict) -> bool:
+        """
+        Whether a request is likely to be repeated verbatim
+        Single-channel/single-video lookups and the first page of a playlist recur;
+        50-ID batches and deep pages almost never do, so storing them only costs space.
+        """
+        if endpoint == 'playlistItems':
+            return not params.get('pageToken')
+        if endpoint in ('channels', 'videos'):
+            return bool(params.get('forHandle')) or ',' not in str(params.get('id', ''))
+        return False
+
+    def _cutoff(self) -> Optional[datetime]:
+        return datetime.utcnow() - timedelta(days=self.ttl_days) if self.ttl_days > 0 else None
+
+    def _expired(self, last_used: datetime) -> bool:
+        cutoff = self._cutoff()
+        return cutoff is not None and last_used < cutoff
+
+    async def get(self, cache_key: str) -> Optional[Tuple[str, Dict]]:
+        """Return (etag, body) for a stored response"""
+        entry = self._memory.get(cache_key)
+        if entry:
+            if not self._expired(entry[2]):
+                self._memory.move_to_end(cache_key)
+                return entry[0], entry[1]
+            del self._memory[cache_key]
+        entry = await asyncio.to_thread(self._read, cache_key)
+        if not entry:
+            return None
+        self._remember(cache_key, entry)
+        return entry[0], entry[1]
+
+    def _read(self, cache_key: str) -> Optional[Tuple[str, Dict, datetime]]:
+        try:
+            with session_scope() as db:
+                row = db.query(ApiResponseCache).filter(ApiResponseCache.cache_key == cache_key).first()
+                if not row or not row.etag:
+                    return None
+                last_used = max(row.updated_at, row.revalidated_at or row.updated_at)
+                if self._expired(last_used):
+                    return None
+                return (row.etag, row.body, last_used)
+        except Exception as e:
+            print(f"⚠️ Could not read ETag store: {e}")
+        return None
+
+    async def put(self, cache_key: str, endpoint: str, etag: str, body: Dict):
+        """Store a fresh 200 response with its ETag"""
+        self._remember(cache_key, (etag, body, datetime.utcnow()))
+        self.stats["stored"] += 1
+        self._writes_since_prune += 1
+        prune = self._writes_since_prune >= self.prune_every
+        if prune:
+            self._writes_since_prune = 0
+        await asyncio.to_thread(self._write, cache_key, endpoint, etag, body, prune)
+
+    def _write(self, cache_key: str, endpoint: str, etag: str, body: Dict, prune: bool):
+        try:
+            with session_scope() as db:
+                row = db.query(ApiResponseCache).filter(ApiResponseCache.cache_key == cache_key).first()
+                if row:
+                    row.etag = etag
+                    row.body = body
+                    row.updated_at = datetime.utcnow()
+                else:
+                    db.add(ApiResponseCache(cache_key=cache_key, endpoint=endpoint, etag=etag, body=body))
+                db.commit()
+        except Exception as e:
+            print(f"⚠️ Could not write ETag store: {e}")
+        if prune:
+            self.prune()
+
+    async def mark_not_modified(self, cache_key: str):
+        """Record a 304 - the stored body is confirmed current"""
+        self.stats["not_modified"] += 1
+        entry = self._memory.get(cache_key)
+        if entry:
+            self._memory[cache_key] = (entry[0], entry[1], datetime.utcnow())
+        await asyncio.to_thread(self._touch, cache_key)
+
+    def _touch(self, cache_key: str):
+        try:
+            with session_scope() as db:
+                row = db.query(ApiResponseCache).filter(ApiResponseCache.cache_key == cache_key).first()
+                if row:
+                    row.revalidated_at = datetime.utcnow()
+                    db.commit()
+        except Exception as e:
+            print(f"⚠️ Could not update ETag store: {e}")
+
+    def prune(self) -> int:
+        """Delete expired rows, then the least recently used beyond max_rows"""
+        last_used = func.coalesce(ApiResponseCache.revalidated_at, ApiResponseCache.updated_at)
+        deleted = 0
+        try:
+            with session_scope() as db:
+                cutoff = self._cutoff()
+                if cutoff:
+                    deleted += db.query(ApiResponseCache).filter(
+                        ApiResponseCache.updated_at < cutoff, last_used < cutoff
+                    ).delete(synchronize_session=False)
+
+                excess = db.query(ApiResponseCache).count() - self.max_rows
+                if excess > 0:
+                    victims = [key for (key,) in db.query(ApiResponseCache.cache_key).order_by(last_used.asc()).limit(excess)]
+                    deleted += db.query(ApiResponseCache).filter(
+                        ApiResponseCache.cache_key.in_(victims)
+                    ).delete(synchronize_session=False)
+                db.commit()
+        except Exception as e:
+            print(f"⚠️ Could not prune ETag store: {e}")
+        if deleted:
+            self.stats["pruned"] += deleted
+            print(f"🧹 ETag store: pruned {deleted} stored responses")
+        return deleted
+
+    def _remember(self, cache_key: str, entry: Tuple[str, Dict, datetime]):
+        self._memory[cache_key] = entry
+        self._memory.move_to_end(cache_key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "memory_entries": len(self._memory),
+            "ttl_days": self.ttl_days,
+            "max_rows": self.max_rows
+        }
@@ -0,0 +1,151 @@
+"""
+Pool of YouTube Data API keys with per-key quota tracking
+Calls go to the least-used key; a key the API reports as out of quota is
+quarantined until the Pacific midnight reset
+"""
+import os
+import time
+import hashlib
+from typing import Dict, List, Optional, Set
+
+from database import ApiKeyUsage, session_scope
+from services.quota_service import QuotaExceededError, quota_day, seconds_until_quota_reset
+
+
+# Error reasons meaning the key's daily quota is spent
+QUOTA_ERROR_REASONS = {'quotaExceeded', 'dailyLimitExceeded'}
+
+
+def key_id(api_key: str) -> str:
+    """Stable, non-reversible identifier for a key (safe to log and report)"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:10]
+
+
+class APIKeyPool:
+    """
+    Per-key usage counters for the current quota day, flushed to the api_key_usage table
+
+    acquire() picks the non-quarantined key with the fewest units used today that can
+    still afford the call; charge() records units once the API has answered.
+    """
+
+    def __init__(
+        self,
+        api_keys: List[str],
+        daily_limit_per_key: Optional[int] = None,
+        flush_every_calls: int = 25,
+        flush_interval_seconds: float = 10.0
+    ):
+        self.keys = [k for k in dict.fromkeys(api_keys) if k]
+        self.ids = {k: key_id(k) for k in self.keys}
+        self.daily_limit_per_key = daily_limit_per_key or int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+        self.flush_every_calls = flush_every_calls
+        self.flush_interval_seconds = flush_interval_seconds
+
+        self._day: Optional[str] = None
+        self._usage: Dict[str, Dict[str, int]] = {}       # key_id -> {units, calls} for today
+        self._quarantined: Dict[str, str] = {}            # key_id -> reason, for today
+        self._unflushed: Set[str] = set()
+        self._pending_calls = 0
+        self._last_flush = time.monotonic()
+        self.failovers = 0
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _roll_day(self):
+        """Reset counters and quarantines at the Pacific midnight boundary"""
+        today = quota_day()
+        if today == self._day:
+            return
+        self.flush()
+        self._day = today
+        self._usage = {kid: {"units": 0, "calls": 0} for kid in self.ids.values()}
+        self._quarantined = {}
+        try:
+            with session_scope() as db:
+                for row in db.query(ApiKeyUsage).filter(ApiKeyUsage.day == today).all():
+                    if row.key_id not in self._usage:
+                        continue
+                    self._usage[row.key_id] = {"units": row.units or 0, "calls": row.calls or 0}
+                    if row.quarantine_reason:
+                        self._quarantined[row.key_id] = row.quarantine_reason
+        except Exception as e:
+            print(f"⚠️ Could not load API key usage: {e}")
+
+    def acquire(self, units: int, exclude: Optional[Set[str]] = None) -> str:
+        """Return the least-used key that can afford `units`, or raise QuotaExceededError"""
+        self._roll_day()
+        candidates = [
+            k for k in self.keys
+            if k not in (exclude or set())
+            and self.ids[k] not in self._quarantined
+            and self._usage[self.ids[k]]["units"] + units <= self.daily_limit_per_key
+        ]
+        if not candidates:
+            retry_after = seconds_until_quota_reset()
+            raise QuotaExceededError(
+                f"All {len(self.keys)} YouTube API keys are out of quota for today "
+                f"({len(self._quarantined)} quarantined). Resets in {retry_after // 3600}h {retry_after % 3600 // 60}m.",
+                retry_after_seconds=retry_after
+            )
+        return min(candidates, key=lambda k: self._usage[self.ids[k]]["units"])
+
+    def charge(self, api_key: str, units: int):
+        """Record the cost of a call made with this key"""
+        self._roll_day()
+        kid = self.ids[api_key]
+        self._usage[kid]["units"] += units
+        self._usage[kid]["calls"] += 1
+        self._unflushed.add(kid)
+        self._pending_calls += 1
+
+        if self._pending_calls >= self.flush_every_calls or time.monotonic() - self._last_flush >= self.flush_interval_seconds:
+            self.flush()
+
+    def quarantine(self, api_key: str, reason: str):
+        """Take a key out of rotation until the next quota reset"""
+        self._roll_day()
+        kid = self.ids[api_key]
+        if kid in self._quarantined:
+            return
+        self._quarantined[kid] = reason
+        self._unflushed.add(kid)
+        self.flush()
+        print(f"🚫 YouTube API key {kid} quarantined until quota reset ({reason})")
+
+    def flush(self):
+        """Persist today's counters for keys that changed since the last flush"""
+        self._last_flush = time.monotonic()
+        self._pending_calls = 0
+        if not self._unflushed or self._day is None:
+            return
+        unflushed, self._unflushed = self._unflushed, set()
+        try:
+            with session_scope() as db:
+                for kid in unflushed:
+                    row = db.query(ApiKeyUsage).filter(ApiKeyUsage.day == self._day, ApiKeyUsage.key_id == kid).first()
+                    if not row:
+                        row = ApiKeyUsage(day=self._day, key_id=kid)
+                        db.add(row)
+                    row.units = self._usage[kid]["units"]
+                    row.calls = self._usage[kid]["calls"]
+                    row.quarantine_reason = self._quarantined.get(kid)
+                db.commit()
+        except Exception as e:
+            print(f"⚠️ Could not persist API key usage: {e}")
+
+    def get_report(self) -> List[Dict]:
+        """Today's usage for every key in the pool"""
+        self._roll_day()
+        return [
+            {
+                "key_id": kid,
+                "units": self._usage[kid]["units"],
+                "calls": self._usage[kid]["calls"],
+                "remaining": max(0, self.daily_limit_per_key - self._usage[kid]["units"]),
+                "quarantined": kid in self._quarantined,
+                "quarantine_reason": self._quarantined.get(kid)
+            }
+            for kid in self.ids.values()
+        ]
@@ -0,0 +1,204 @@
+"""
+Persistent LLM response cache
+Completions are stored under a hash of the exact request, so re-running the same
+analysis over the same data is served from the database instead of paying for it again
+"""
+import os
+import asyncio
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+
+from database import LLMResponseCache, session_scope
+
+
+class LLMCache:
+    """
+    Content-addressed completion cache in the llm_response_cache table
+
+    Entries expire after ttl_hours (0 = never, e.g. when the table is used as a
+    benchmark fixture) and the least recently used are evicted once the stored
+    responses exceed max_bytes.
+
+    Database work runs in a worker thread so lookups never block the event loop.
+    A running byte counter (seeded from the table on the first write) decides when
+    to evict; expired rows are swept every expire_every writes rather than on each.
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        ttl_hours: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        expire_every: int = 100
+    ):
+        self.enabled = enabled if enabled is not None else os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+        self.ttl_hours = ttl_hours if ttl_hours is not None else float(os.getenv("LLM_CACHE_TTL_HOURS", "168"))
+        self.max_bytes = max_bytes or int(float(os.getenv("LLM_CACHE_MAX_MB", "50")) * 1024 * 1024)
+        self.expire_every = expire_every
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "stored": 0, "expired": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        self._stored_bytes: Optional[int] = None
+        self._writes_since_expiry = expire_every - 1   # First write also sweeps what earlier runs left behind
+
+    @staticmethod
+    def make_key(
+        model: str,
+        messages: List[Dict],
+        temperature: float,
+        response_format: Optional[Dict] = None,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """Stable key for a chat completion request"""
+        raw = json.dumps({
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "response_format": response_format,
+            "max_tokens": max_tokens
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _is_expired(self, row: LLMResponseCache) -> bool:
+        return self.ttl_hours > 0 and row.created_at < datetime.utcnow() - timedelta(hours=self.ttl_hours)
+
+    async def get(self, cache_key: str) -> Optional[str]:
+        """Return the stored completion, or None on a miss"""
+        return await asyncio.to_thread(self._read, cache_key)
+
+    def _read(self, cache_key: str) -> Optional[str]:
+        try:
+            with session_scope() as db:
+                row = db.query(LLMResponseCache).filter(LLMResponseCache.cache_key == cache_key).first()
+                if row and self._is_expired(row):
+                    self._adjust_bytes(-(row.size_bytes or 0))
+                    db.delete(row)
+                    db.commit()
+                    self.stats["expired"] += 1
+                    row = None
+                if row is None:
+                    self.stats["misses"] += 1
+                    return None
+                row.hit_count = (row.hit_count or 0) + 1
+                row.last_used_at = datetime.utcnow()
+                response = row.response
+                db.commit()
+                self.stats["hits"] += 1
+                return response
+        except Exception as e:
+            print(f"⚠️ Could not read LLM cache: {e}")
+            self.stats["misses"] += 1
+            return None
+
+    async def put(self, cache_key: str, model: str, response: str):
+        """Store a completion and evict old entries if the cache is over its size limit"""
+        size = len(response.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        await asyncio.to_thread(self._write, cache_key, model, response, size)
+
+    def _write(self, cache_key: str, model: str, response: str, size: int):
+        try:
+            with session_scope() as db:
+                if self._stored_bytes is None:
+                    self._stored_bytes = self._total_bytes(db)
+                row = db.query(LLMResponseCache).filter(LLMResponseCache.cache_key == cache_key).first()
+                now = datetime.utcnow()
+                if row:
+                    previous = row.size_bytes or 0
+                    row.response = response
+                    row.size_bytes = size
+                    row.created_at = now
+                    row.last_used_at = now
+                else:
+                    previous = 0
+                    db.add(LLMResponseCache(
+                        cache_key=cache_key, model=model, response=response,
+                        size_bytes=size, created_at=now, last_used_at=now
+                    ))
+                db.commit()
+                self.stats["stored"] += 1
+
+                with self._lock:
+                    self._stored_bytes += size - previous
+                    self._writes_since_expiry += 1
+                    expire = self._writes_since_expiry >= self.expire_every
+                    if expire:
+                        self._writes_since_expiry = 0
+                    over_budget = self._stored_bytes > self.max_bytes
+                if expire or over_budget:
+                    self._evict(db, expire)
+        except Exception as e:
+            print(f"⚠️ Could not write LLM cache: {e}")
+
+    @staticmethod
+    def _total_bytes(db) -> int:
+        return int(db.query(func.coalesce(func.sum(LLMResponseCache.size_bytes), 0)).scalar())
+
+    def _adjust_bytes(self, delta: int):
+        with self._lock:
+            if self._stored_bytes is not None:
+                self._stored_bytes = max(0, self._stored_bytes + delta)
+
+    def _evict(self, db, expire: bool):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        if expire and self.ttl_hours > 0:
+            cutoff = datetime.utcnow() - timedelta(hours=self.ttl_hours)
+            expired = db.query(LLMResponseCache).filter(LLMResponseCache.created_at < cutoff).delete()
+            self.stats["expired"] += expired
+
+        # Resync the running counter - it drifts with other processes and expiry
+        total = self._total_bytes(db)
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            victims = []
+            # Walk the least recently used end in small pages instead of loading the whole table
+            while excess > 0:
+                page = db.query(LLMResponseCache.cache_key, LLMResponseCache.size_bytes).order_by(
+                    LLMResponseCache.last_used_at.asc()
+                ).offset(len(victims)).limit(100).all()
+                if not page:
+                    break
+                for cache_key, size in page:
+                    if excess <= 0:
+                        break
+                    victims.append(cache_key)
+                    excess -= size or 0
+                    total -= size or 0
+            db.query(LLMResponseCache).filter(LLMResponseCache.cache_key.in_(victims)).delete(synchronize_session=False)
+            self.stats["evicted"] += len(victims)
+        db.commit()
+        with self._lock:
+            self._stored_bytes = total
+
+    def clear(self) -> int:
+        with session_scope() as db:
+            deleted = db.query(LLMResponseCache).delete()
+            db.commit()
+        with self._lock:
+            self._stored_bytes = 0
+        return deleted
+
+    def get_stats(self) -> Dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        stats = {
+            "enabled": self.enabled,
+            "ttl_hours": self.ttl_hours,
+            "max_bytes": self.max_bytes,
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0
+        }
+        try:
+            with session_scope() as db:
+                entries, size = db.query(
+                    func.count(LLMResponseCache.cache_key),
+                    func.coalesce(func.sum(LLMResponseCache.size_bytes), 0)
+                ).one()
+                stats.update({"entries": entries, "size_bytes": int(size)})
+        except Exception as e:
+            print(f"⚠️ Could not read LLM cache stats: {e}")
+        return stats
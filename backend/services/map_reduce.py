@@ -0,0 +1,165 @@
+"""
+Map-reduce analysis for corpora larger than one context window
+Videos are packed into token-bounded shards, each shard is analyzed by its own
+completion (a bounded number at a time) and the partial results are merged by
+reduce calls into a single result with the same JSON schema
+"""
+import os
+import json
+import asyncio
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services.prompt_budget import PromptBuilder, MESSAGE_OVERHEAD_TOKENS, pack_consecutive
+
+
+class MapReduceAnalyzer:
+    """
+    Shards are analyzed through AIService.chat_completion, so they share the LLM
+    cache and the OpenAI scheduler with every other completion - re-running an
+    analysis over the same files only pays for shards whose content changed.
+
+    render_map(videos) builds the prompt for one shard and render_reduce(partials)
+    the prompt that merges a list of partial results. Both must ask for the same
+    JSON schema: when the partials are too large for one reduce call, neighbouring
+    partials are merged first and the merged results reduced again.
+
+    A failed map or reduce call costs coverage, not the whole analysis: a failed
+    merge keeps the partial from its group that covers the most videos. plan() lets
+    callers refuse corpora that would need more than max_shards completions.
+    """
+
+    def __init__(
+        self,
+        ai_service,
+        builder: PromptBuilder,
+        shard_tokens: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        max_shards: Optional[int] = None,
+        temperature: float = 0.7
+    ):
+        self.ai_service = ai_service
+        self.builder = builder
+        self.shard_tokens = shard_tokens or int(os.getenv("MAP_REDUCE_SHARD_TOKENS", "30000"))
+        self.max_workers = max_workers or int(os.getenv("MAP_REDUCE_WORKERS", "4"))
+        self.max_shards = max_shards or int(os.getenv("MAP_REDUCE_MAX_SHARDS", "12"))
+        self.temperature = temperature
+
+    def _shard_budget(self, render_map: Callable[[List[Dict]], str], system_prompt: str) -> int:
+        return min(self.shard_tokens, self.builder.content_budget(render_map, system_prompt))
+
+    def plan(self, videos: List[Dict], render_map: Callable[[List[Dict]], str], system_prompt: str) -> List[List[Dict]]:
+        """The shards run() would analyze - one map completion each"""
+        return self.builder.shard(videos, self._shard_budget(render_map, system_prompt))
+
+    async def _complete(self, semaphore: asyncio.Semaphore, system_prompt: str, prompt: str, use_cache: bool) -> Dict:
+        async with semaphore:
+            content = await self.ai_service.chat_completion(
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                model=self.builder.model,
+                temperature=self.temperature,
+                max_tokens=self.builder.completion_tokens,
+                response_format={"type": "json_object"},
+                use_cache=use_cache
+            )
+        return json.loads(content)
+
+    async def run(
+        self,
+        videos: List[Dict],
+        render_map: Callable[[List[Dict]], str],
+        render_reduce: Callable[[List[Dict]], str],
+        system_prompt: str,
+        use_cache: bool = True
+    ) -> Tuple[Dict, Dict]:
+        """Analyze videos shard by shard and merge the results - returns (result, report)"""
+        semaphore = asyncio.Semaphore(self.max_workers)
+        shard_budget = self._shard_budget(render_map, system_prompt)
+        shards = self.builder.shard(videos, shard_budget)
+        if len(shards) > self.max_shards:
+            raise ValueError(f"{len(videos)} videos need {len(shards)} shards (limit {self.max_shards})")
+        print(f"🗺️ Map-reduce: {len(videos)} videos in {len(shards)} shards "
+              f"(≤{shard_budget:,} tokens each, {self.max_workers} workers)")
+
+        async def map_shard(shard: List[Dict]) -> Tuple[Dict, Dict]:
+            prompt, prompt_report = self.builder.build(shard, render_map, system_prompt)
+            return await self._complete(semaphore, system_prompt, prompt, use_cache), prompt_report
+
+        outcomes = await asyncio.gather(*[map_shard(shard) for shard in shards], return_exceptions=True)
+
+        partials = []
+        report = {
+            "mode": "map_reduce",
+            "shards": len(shards),
+            "shards_failed": 0,
+            "shard_tokens": shard_budget,
+            "workers": self.max_workers,
+            "videos_analyzed": 0,
+            "prompt_tokens": 0,
+            "reduce_calls": 0,
+            "reduce_failed": 0,
+            "reduce_rounds": 0,
+            "tokenizer": self.builder.counter.name
+        }
+        for idx, outcome in enumerate(outcomes, 1):
+            if isinstance(outcome, Exception):
+                # A failed shard costs coverage, not the whole analysis
+                report["shards_failed"] += 1
+                print(f"⚠️ Map shard {idx}/{len(shards)} failed: {outcome}")
+                continue
+            result, prompt_report = outcome
+            partials.append((result, prompt_report["videos_included"]))
+            report["prompt_tokens"] += prompt_report["prompt_tokens"]
+
+        if not partials:
+            raise RuntimeError(f"All {len(shards)} map shards failed")
+
+        result, report["videos_analyzed"] = await self._reduce(partials, render_reduce, system_prompt, semaphore, use_cache, report)
+        print(f"✅ Map-reduce: {len(partials)}/{len(shards)} shards merged in "
+              f"{report['reduce_calls']} reduce calls ({report['reduce_rounds']} rounds, "
+              f"{report['reduce_failed']} failed)")
+        return result, report
+
+    async def _reduce(
+        self,
+        partials: List[Tuple[Dict, int]],
+        render_reduce: Callable[[List[Dict]], str],
+        system_prompt: str,
+        semaphore: asyncio.Semaphore,
+        use_cache: bool,
+        report: Dict
+    ) -> Tuple[Dict, int]:
+        """
+        Merge (result, videos covered) partials, in rounds if they don't fit one
+        reduce prompt - returns the merged result and the videos it covers
+        """
+        budget = self.builder.content_budget(render_reduce, system_prompt)
+
+        async def merge(group: List[Tuple[Dict, int]]) -> Tuple[Dict, int]:
+            if len(group) == 1:
+                return group[0]
+            report["reduce_calls"] += 1
+            try:
+                merged = await self._complete(semaphore, system_prompt, render_reduce([result for result, _ in group]), use_cache)
+                return merged, sum(videos for _, videos in group)
+            except Exception as e:
+                # Keep the widest partial rather than losing every shard behind this merge
+                report["reduce_failed"] += 1
+                print(f"⚠️ Reduce over {len(group)} partials failed: {e}")
+                return max(group, key=lambda partial: partial[1])
+
+        while len(partials) > 1:
+            report["reduce_rounds"] += 1
+            costs = [
+                self.builder.counter.count(json.dumps(result, ensure_ascii=False)) + MESSAGE_OVERHEAD_TOKENS
+                for result, _ in partials
+            ]
+            ranges = pack_consecutive(costs, budget)
+            if len(ranges) == len(partials):
+                # Every partial fills the budget alone - merge pairs so the rounds still converge
+                ranges = [(start, min(start + 2, len(partials))) for start in range(0, len(partials), 2)]
+
+            partials = await asyncio.gather(*[merge(partials[start:end]) for start, end in ranges])
+        return partials[0]
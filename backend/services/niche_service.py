@@ -3,10 +3,17 @@ import os
 from typing import List, Dict, Optional
 import asyncio
 
+from services.priority_lanes import request_lane, BACKGROUND
+
 
 class NicheService:
-    def __init__(self, json_file_path: str = "niche_channels.json"):
+    def __init__(self, json_file_path: str = "niche_channels.json", include_sections: Optional[bool] = None):
         self.json_file_path = json_file_path
+        # Off by default: only the top-level 'channels' list is loaded, as before.
+        # Turn on to also load the per-niche lists (indian_niche, global_niche, ...)
+        if include_sections is None:
+            include_sections = os.getenv("NICHE_INCLUDE_SECTIONED_CHANNELS", "false").lower() == "true"
+        self.include_sections = include_sections
         self.channels = []
         self.load_channels()
     
@@ -17,6 +24,8 @@ class NicheService:
                 with open(self.json_file_path, 'r') as f:
                     data = json.load(f)
                     self.channels = data.get('channels', [])
+                    if not self.channels and self.include_sections:
+                        self.channels = self._flatten_sections(data)
                     print(f"✅ Loaded {len(self.channels)} niche channels from {self.json_file_path}")
             else:
                 print(f"⚠️  Niche channels file not found: {self.json_file_path}")
@@ -25,6 +34,15 @@ class NicheService:
             print(f"❌ Error loading niche channels: {e}")
             self.channels = []
     
+    @staticmethod
+    def _flatten_sections(data: Dict) -> List[Dict]:
+        """Combine per-niche lists (e.g. indian_niche, global_niche) into one channel list"""
+        channels = []
+        for section, entries in data.items():
+            if isinstance(entries, list):
+                channels.extend({**entry, 'category': entry.get('category', section)} for entry in entries)
+        return channels
+    
     def reload_channels(self):
         """Reload channels from file (useful after updates)"""
         self.load_channels()
@@ -33,6 +51,27 @@ class NicheService:
         """Get list of all channel IDs"""
         return [ch.get('channel_id') for ch in self.channels if ch.get('channel_id')]
     
+    def get_handles(self) -> Dict[str, Optional[str]]:
+        """Get handle -> channel_id (None if the file only has the handle) for every channel with a handle"""
+        handles = {}
+        for ch in self.channels:
+            channel_id = ch.get('channel_id') or ''
+            handle = ch.get('handle') or (channel_id if channel_id.startswith('@') else None)
+            if handle:
+                handles[handle] = None if channel_id.startswith('@') else (channel_id or None)
+        return handles
+    
+    async def resolve_handles(self, youtube_service) -> Dict[str, Optional[str]]:
+        """Bulk-resolve every handle in the niche file (IDs already in the file cost no quota)"""
+        handles = self.get_handles()
+        if not handles:
+            return {}
+        with request_lane(BACKGROUND):
+            resolved = await youtube_service.resolve_handles(list(handles), known=handles)
+        unresolved = [h for h, channel_id in resolved.items() if not channel_id]
+        print(f"✅ Resolved {len(resolved) - len(unresolved)}/{len(resolved)} niche channel handles")
+        return resolved
+    
     def get_channels_by_category(self, category: str) -> List[Dict]:
         """Get channels filtered by category"""
         return [ch for ch in self.channels if ch.get('category', '').lower() == category.lower()]
@@ -69,11 +108,11 @@ class NicheService:
         # Fetch videos from each channel in parallel
         tasks = []
         for channel in channels_to_fetch:
-            channel_id = channel.get('channel_id')
+            channel_id = channel.get('channel_id') or channel.get('handle')
             if channel_id:
                 # Handle @username format
                 if channel_id.startswith('@'):
-                    # Need to search for the channel first to get actual ID
+                    # Need to resolve the handle first to get actual ID
                     task = self._fetch_channel_videos_by_username(
                         youtube_service, 
                         channel_id, 
@@ -84,8 +123,9 @@ class NicheService:
                 
                 tasks.append(task)
         
-        # Execute all fetches in parallel
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        # Execute all fetches in parallel - a sweep yields to interactive requests
+        with request_lane(BACKGROUND):
+            results = await asyncio.gather(*tasks, return_exceptions=True)
         
         # Combine results - IMPORTANT: zip with channels_to_fetch, not self.channels
         # to match the correct channels with their results
@@ -122,11 +162,10 @@ class NicheService:
     ) -> List[Dict]:
         """Fetch videos for a channel using @username"""
         try:
-            # Search for the channel
-            channels = await youtube_service.search_channels(username, max_results=1)
+            # Memoized forHandle lookup (1 unit) instead of a channel search (100 units)
+            channel_id = await youtube_service.resolve_handle(username)
             
-            if channels:
-                channel_id = channels[0]['channel_id']
+            if channel_id:
                 videos = await youtube_service.get_channel_videos(channel_id, max_results)
                 return videos
             else:
@@ -0,0 +1,119 @@
+"""
+Speculative prefetch of transcripts and comments
+After a channel setup the user usually analyzes a few of the top videos, so their
+transcripts and comments are warmed in the background at low priority
+"""
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+
+from services.priority_lanes import request_lane, BACKGROUND
+
+
+class SpeculativePrefetcher:
+    """
+    Warms the transcript/comment caches for the top-K videos of a setup response
+
+    Runs with a small concurrency cap in the background lane, so interactive
+    fetches always get served ahead of it. Prefetched IDs are
+    remembered for a while to measure how many guesses were actually used.
+    """
+
+    # Enough comments for every analysis endpoint (suggest_series asks for 100)
+    COMMENTS_PER_VIDEO = 100
+
+    def __init__(
+        self,
+        youtube_service,
+        enabled: Optional[bool] = None,
+        top_k: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        remember_seconds: float = 6 * 3600,
+        max_remembered: int = 5000
+    ):
+        self.youtube_service = youtube_service
+        self.enabled = enabled if enabled is not None else os.getenv("PREFETCH_ENABLED", "false").lower() == "true"
+        self.top_k = top_k or int(os.getenv("PREFETCH_TOP_K", "5"))
+        self.max_concurrency = max_concurrency or int(os.getenv("PREFETCH_CONCURRENCY", "2"))
+        self.remember_seconds = remember_seconds
+        self.max_remembered = max_remembered
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+        self._prefetched: "OrderedDict[str, float]" = OrderedDict()   # video_id -> monotonic time
+        self.stats = {"scheduled": 0, "prefetched": 0, "already_cached": 0, "failed": 0, "used": 0, "expired_unused": 0}
+
+    async def start(self, video_ids: List[str]):
+        """Spawn a prefetch for the first top_k IDs and return immediately"""
+        video_ids = [vid for vid in video_ids if vid][:self.top_k]
+        if not video_ids:
+            return
+        self.stats["scheduled"] += len(video_ids)
+        task = asyncio.create_task(self._prefetch_all(video_ids))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _prefetch_all(self, video_ids: List[str]):
+        with request_lane(BACKGROUND):
+            await asyncio.gather(*[self._prefetch_one(vid) for vid in video_ids], return_exceptions=True)
+        print(f"🔮 Prefetched transcripts/comments for {len(video_ids)} videos")
+
+    async def _prefetch_one(self, video_id: str):
+        async with self._semaphore:
+            service = self.youtube_service
+            if (f"transcript_{video_id}" in service.transcript_cache and
+                    f"comments_{video_id}_{self.COMMENTS_PER_VIDEO}" in service.comments_cache):
+                self.stats["already_cached"] += 1
+                return
+            try:
+                # Both calls read through to the DB and write back into both cache tiers
+                await asyncio.gather(
+                    service.get_transcript(video_id),
+                    service.get_comments(video_id, max_results=self.COMMENTS_PER_VIDEO)
+                )
+                self.stats["prefetched"] += 1
+                self._remember(video_id)
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"⚠️ Prefetch failed for {video_id}: {e}")
+
+    async def stop(self):
+        """Cancel prefetches still running"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _remember(self, video_id: str):
+        self._prefetched[video_id] = time.monotonic()
+        self._prefetched.move_to_end(video_id)
+        self._expire()
+        while len(self._prefetched) > self.max_remembered:
+            self._prefetched.popitem(last=False)
+            self.stats["expired_unused"] += 1
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.remember_seconds
+        while self._prefetched and next(iter(self._prefetched.values())) < cutoff:
+            self._prefetched.popitem(last=False)
+            self.stats["expired_unused"] += 1
+
+    def record_use(self, video_ids: List[str]):
+        """Count analysis requests that hit prefetched videos (each prefetch counts once)"""
+        self._expire()
+        for video_id in video_ids:
+            if self._prefetched.pop(video_id, None) is not None:
+                self.stats["used"] += 1
+
+    def get_stats(self) -> Dict:
+        self._expire()
+        return {
+            "enabled": self.enabled,
+            "top_k": self.top_k,
+            "max_concurrency": self.max_concurrency,
+            **self.stats,
+            "hit_rate": round(self.stats["used"] / self.stats["prefetched"], 3) if self.stats["prefetched"] else 0.0,
+            "pending_guesses": len(self._prefetched),
+            "running_tasks": len(self._tasks)
+        }
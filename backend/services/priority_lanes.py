@@ -0,0 +1,174 @@
+"""
+Priority lanes for outbound calls
+Interactive (user-facing) and background (sweeps, refresh-ahead, prefetch) work share
+each upstream's concurrency through weighted fair queuing, so bulk jobs can't starve
+a single user request
+"""
+import os
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# Lane of the work running in the current task; asyncio tasks inherit it when created
+current_lane: ContextVar[str] = ContextVar("current_lane", default=INTERACTIVE)
+
+
+@contextmanager
+def request_lane(lane: str):
+    """Run the enclosed code (and tasks it spawns) in a lane"""
+    token = current_lane.set(lane)
+    try:
+        yield
+    finally:
+        current_lane.reset(token)
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 3)
+
+
+class _Lane:
+    def __init__(self, name: str, weight: float, max_concurrency: int):
+        self.name = name
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+        self.waiters: deque = deque()
+        self.in_flight = 0
+        self.virtual_finish = 0.0      # Stride-scheduling pass value
+        self.dispatched = 0
+        self.queue_waits = deque(maxlen=1000)
+
+
+class PriorityScheduler:
+    """
+    Concurrency limiter with weighted fair queuing between lanes
+
+    When a slot frees up it goes to the eligible lane (waiting work, under its own
+    cap) with the smallest virtual finish time; each dispatch advances that lane's
+    clock by 1/weight, so lanes share slots in proportion to their weights.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, lanes: Dict[str, Dict]):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self._lanes = {
+            lane: _Lane(lane, config.get("weight", 1.0), min(max_concurrency, config.get("max_concurrency", max_concurrency)))
+            for lane, config in lanes.items()
+        }
+        self._in_flight = 0
+        self._virtual_time = 0.0
+
+    def _lane(self, name: Optional[str]) -> _Lane:
+        return self._lanes.get(name or current_lane.get()) or self._lanes[INTERACTIVE]
+
+    def _dispatch(self):
+        while self._in_flight < self.max_concurrency:
+            eligible = [
+                lane for lane in self._lanes.values()
+                if lane.waiters and lane.in_flight < lane.max_concurrency
+            ]
+            if not eligible:
+                return
+            lane = min(eligible, key=lambda l: l.virtual_finish)
+            future = lane.waiters.popleft()
+            if future.done():
+                continue  # Cancelled while queued
+            self._virtual_time = lane.virtual_finish
+            lane.virtual_finish += 1.0 / lane.weight
+            lane.in_flight += 1
+            lane.dispatched += 1
+            self._in_flight += 1
+            future.set_result(None)
+
+    def release(self, lane: _Lane):
+        """Give back a slot taken with acquire()"""
+        lane.in_flight -= 1
+        self._in_flight -= 1
+        self._dispatch()
+
+    async def acquire(self, lane_name: Optional[str] = None) -> _Lane:
+        """
+        Wait for one concurrency slot in the given (or current) lane
+        Returns the lane to pass to release() - for work whose end isn't a block
+        exit, e.g. a worker thread released from its future's done-callback
+        """
+        lane = self._lane(lane_name)
+        queued_at = time.monotonic()
+
+        # A lane that was idle rejoins at the current virtual time instead of cashing in old credit
+        if not lane.waiters and not lane.in_flight:
+            lane.virtual_finish = max(lane.virtual_finish, self._virtual_time)
+
+        future = asyncio.get_running_loop().create_future()
+        lane.waiters.append(future)
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(lane)   # Slot was granted just as we were cancelled
+            else:
+                try:
+                    lane.waiters.remove(future)
+                except ValueError:
+                    pass
+            raise
+
+        lane.queue_waits.append(time.monotonic() - queued_at)
+        return lane
+
+    @asynccontextmanager
+    async def slot(self, lane_name: Optional[str] = None):
+        """Hold one concurrency slot in the given (or current) lane"""
+        lane = await self.acquire(lane_name)
+        try:
+            yield
+        finally:
+            self.release(lane)
+
+    def waiting(self, lane_name: Optional[str] = None) -> int:
+        """Queued (not yet running) calls, for one lane or all"""
+        lanes = [self._lanes[lane_name]] if lane_name else self._lanes.values()
+        return sum(len(lane.waiters) for lane in lanes)
+
+    def get_metrics(self) -> Dict:
+        lanes = {}
+        for lane in self._lanes.values():
+            waits = sorted(lane.queue_waits)
+            lanes[lane.name] = {
+                "weight": lane.weight,
+                "max_concurrency": lane.max_concurrency,
+                "waiting": len(lane.waiters),
+                "in_flight": lane.in_flight,
+                "dispatched": lane.dispatched,
+                "queue_wait_seconds": {
+                    "p50": percentile(waits, 50),
+                    "p90": percentile(waits, 90),
+                    "p99": percentile(waits, 99)
+                }
+            }
+        return {"name": self.name, "max_concurrency": self.max_concurrency, "in_flight": self._in_flight, "lanes": lanes}
+
+
+def build_scheduler(name: str, max_concurrency: int) -> PriorityScheduler:
+    """Interactive + background lanes configured from the environment"""
+    background_share = float(os.getenv("BACKGROUND_LANE_MAX_SHARE", "0.5"))
+    return PriorityScheduler(name, max_concurrency, {
+        INTERACTIVE: {
+            "weight": float(os.getenv("INTERACTIVE_LANE_WEIGHT", "4")),
+            "max_concurrency": max_concurrency
+        },
+        BACKGROUND: {
+            "weight": float(os.getenv("BACKGROUND_LANE_WEIGHT", "1")),
+            "max_concurrency": max(1, int(max_concurrency * background_share))
+        }
+    })
@@ -0,0 +1,297 @@
+"""
+Token-budgeted prompt assembly
+Counts tokens locally with the model's BPE encoding (tiktoken) and fits video
+transcripts and comments into the model's context window instead of slicing
+them at fixed character limits
+"""
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # Optional - falls back to a conservative character heuristic
+    tiktoken = None
+
+
+# Context window (prompt + completion) per model
+MODEL_CONTEXT_TOKENS = {
+    "gpt-4-turbo-preview": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+}
+
+# Per-message framing tokens added by the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class TokenCounter:
+    """Token counting/truncation for one model, with tiktoken or a heuristic fallback"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                try:
+                    self.encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    self.encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                # BPE files are fetched on first use - warm TIKTOKEN_CACHE_DIR at build time
+                print(f"⚠️ tiktoken encoding unavailable ({e}), estimating token counts")
+
+    @property
+    def name(self) -> str:
+        return f"tiktoken:{self.encoding.name}" if self.encoding else "heuristic"
+
+    # English averages ~4 characters per token, but romanized Hindi, numbers and URLs
+    # split finer - budget for 3 so the estimate errs high
+    HEURISTIC_CHARS_PER_TOKEN = 3
+
+    @classmethod
+    def _char_cost(cls, ch: str) -> float:
+        # Non-Latin scripts are close to one token per character
+        return 1.0 / cls.HEURISTIC_CHARS_PER_TOKEN if ord(ch) < 128 else 1.0
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        if text.isascii():
+            return len(text) // self.HEURISTIC_CHARS_PER_TOKEN + 1
+        return int(sum(self._char_cost(ch) for ch in text)) + 1
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of text within max_tokens"""
+        if not text or max_tokens <= 0:
+            return ""
+        if self.encoding:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            return self.encoding.decode(tokens[:max_tokens])
+        if text.isascii():
+            if self.count(text) <= max_tokens:
+                return text
+            return text[:(max_tokens - 1) * self.HEURISTIC_CHARS_PER_TOKEN]
+        cost = 1.0
+        for idx, ch in enumerate(text):
+            cost += self._char_cost(ch)
+            if cost > max_tokens:
+                return text[:idx]
+        return text
+
+
+_counters: Dict[str, TokenCounter] = {}
+
+
+def get_token_counter(model: str) -> TokenCounter:
+    if model not in _counters:
+        _counters[model] = TokenCounter(model)
+    return _counters[model]
+
+
+def fair_allocation(demands: List[int], budget: int) -> List[int]:
+    """
+    Max-min fair split of budget across demands (water-filling)
+    Everyone gets an equal share; whatever small demands leave unused is
+    redistributed among the larger ones.
+    """
+    allocation = [0] * len(demands)
+    pending = sorted(range(len(demands)), key=lambda i: demands[i])
+    remaining = max(0, budget)
+    while pending:
+        share = remaining // len(pending)
+        smallest = pending[0]
+        if demands[smallest] <= share:
+            allocation[smallest] = demands[smallest]
+            remaining -= demands[smallest]
+            pending.pop(0)
+        else:
+            for i in pending:
+                allocation[i] = share
+            break
+    return allocation
+
+
+def pack_consecutive(costs: List[int], budget: int) -> List[Tuple[int, int]]:
+    """
+    Greedily split a sequence into consecutive (start, end) ranges whose costs sum to
+    at most budget; an item larger than budget gets a range to itself
+    """
+    ranges = []
+    start, used = 0, 0
+    for idx, cost in enumerate(costs):
+        if idx > start and used + cost > budget:
+            ranges.append((start, idx))
+            start, used = idx, 0
+        used += cost
+    if start < len(costs):
+        ranges.append((start, len(costs)))
+    return ranges
+
+
+class PromptBuilder:
+    """
+    Fits a list of videos into a prompt's token budget
+
+    The budget is the model's context window (or PROMPT_CONTEXT_TOKENS) minus the
+    completion allowance and the fixed parts of the prompt. Titles are always kept
+    and descriptions get a small fixed slice; if even those don't fit, videos are
+    dropped from the end. The rest is split between transcripts and comments
+    (transcript_share, unused share flows to the other pool) and shared fairly
+    across videos, so short transcripts are kept whole and long ones trimmed evenly.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        completion_tokens: int,
+        context_tokens: Optional[int] = None,
+        transcript_share: float = 0.75,
+        description_tokens: int = 100,
+        max_comments: int = 15,
+        comment_tokens: int = 80,
+        safety_tokens: int = 256
+    ):
+        self.model = model
+        self.counter = get_token_counter(model)
+        self.context_tokens = context_tokens or int(
+            os.getenv("PROMPT_CONTEXT_TOKENS", str(MODEL_CONTEXT_TOKENS.get(model, 8192)))
+        )
+        self.completion_tokens = completion_tokens
+        self.transcript_share = transcript_share
+        self.description_tokens = description_tokens
+        self.max_comments = max_comments
+        self.comment_tokens = comment_tokens
+        self.safety_tokens = safety_tokens
+
+    @property
+    def input_budget(self) -> int:
+        """Tokens available for all prompt messages"""
+        return self.context_tokens - self.completion_tokens - self.safety_tokens
+
+    @staticmethod
+    def _comment_text(comment) -> str:
+        return comment.get('text', '') if isinstance(comment, dict) else str(comment)
+
+    def _trim_comment(self, comment, max_tokens: int):
+        text = self.counter.truncate(self._comment_text(comment), max_tokens)
+        return {**comment, 'text': text} if isinstance(comment, dict) else text
+
+    def _comment_cost(self, comment) -> int:
+        return min(self.counter.count(self._comment_text(comment)), self.comment_tokens) + 4
+
+    def content_budget(self, render: Callable[[List[Dict]], str], system_prompt: str = "") -> int:
+        """Tokens left for video content once the system prompt and the prompt's fixed text are counted"""
+        overhead = self.counter.count(system_prompt) + 2 * MESSAGE_OVERHEAD_TOKENS
+        return self.input_budget - overhead - self.counter.count(render([]))
+
+    def video_tokens(self, video: Dict) -> int:
+        """Tokens a video takes with its whole transcript (description and comments at their usual caps)"""
+        count = self.counter.count
+        description = self.counter.truncate(video.get('description') or '', self.description_tokens)
+        comments = (video.get('comments') or [])[:self.max_comments]
+        return (
+            count(video.get('title', '')) + count(description) + 30
+            + count(video.get('transcript') or '')
+            + sum(self._comment_cost(c) for c in comments)
+        )
+
+    def shard(self, videos: List[Dict], budget: int) -> List[List[Dict]]:
+        """
+        Split videos, in order, into shards whose untrimmed content fits budget tokens
+        A single video over budget gets a shard of its own and is trimmed by build()
+        """
+        costs = [self.video_tokens(video) for video in videos]
+        return [videos[start:end] for start, end in pack_consecutive(costs, budget)]
+
+    def fit_videos(self, videos: List[Dict], budget: int) -> List[Dict]:
+        """Copies of videos with description/transcript/comments trimmed to fit budget tokens"""
+        count = self.counter.count
+        skeletons = []
+        for video in videos:
+            trimmed = dict(video)
+            if video.get('description'):
+                trimmed['description'] = self.counter.truncate(video['description'], self.description_tokens)
+            skeletons.append(trimmed)
+
+        # Title, description and per-video framing are the first claim on the budget
+        fixed = [count(v.get('title', '')) + count(v.get('description', '')) + 30 for v in skeletons]
+        kept = len(skeletons)
+        while kept and sum(fixed[:kept]) > budget:
+            kept -= 1
+        skeletons, fixed = skeletons[:kept], fixed[:kept]
+        remaining = budget - sum(fixed)
+
+        transcript_demand = [count(v.get('transcript') or '') for v in skeletons]
+        comment_demand = [
+            sum(self._comment_cost(c) for c in (v.get('comments') or [])[:self.max_comments])
+            for v in skeletons
+        ]
+
+        transcript_pool = int(remaining * self.transcript_share)
+        comment_pool = remaining - transcript_pool
+        # Whichever pool is over-provisioned hands its surplus to the other
+        transcript_surplus = max(0, transcript_pool - sum(transcript_demand))
+        comment_surplus = max(0, comment_pool - sum(comment_demand))
+        transcript_pool += comment_surplus
+        comment_pool += transcript_surplus
+
+        transcript_alloc = fair_allocation(transcript_demand, transcript_pool)
+        comment_alloc = fair_allocation(comment_demand, comment_pool)
+
+        for video, transcript_tokens, comment_budget in zip(skeletons, transcript_alloc, comment_alloc):
+            if video.get('transcript'):
+                video['transcript'] = self.counter.truncate(video['transcript'], transcript_tokens)
+            if 'comments' in video:
+                comments = []
+                for comment in (video.get('comments') or [])[:self.max_comments]:
+                    cost = self._comment_cost(comment)
+                    if cost > comment_budget:
+                        break
+                    comments.append(self._trim_comment(comment, self.comment_tokens))
+                    comment_budget -= cost
+                video['comments'] = comments
+        return skeletons
+
+    def build(self, videos: List[Dict], render: Callable[[List[Dict]], str], system_prompt: str = "") -> Tuple[str, Dict]:
+        """
+        Render the user prompt with as much video content as fits
+        render(videos) must return the full user prompt for the given (trimmed) videos.
+        Returns (prompt, report) where report has the final token count; raises
+        ValueError if even the prompt without videos is over the budget.
+        """
+        overhead = self.counter.count(system_prompt) + 2 * MESSAGE_OVERHEAD_TOKENS
+        budget = self.content_budget(render, system_prompt)
+
+        # Framing estimates can be off by a little - re-fit until the rendered prompt fits
+        while True:
+            fitted = self.fit_videos(videos, budget)
+            prompt = render(fitted)
+            prompt_tokens = self.counter.count(prompt) + overhead
+            if prompt_tokens <= self.input_budget:
+                break
+            if not fitted:
+                raise ValueError(
+                    f"Prompt needs {prompt_tokens:,} tokens without any videos, "
+                    f"but only {self.input_budget:,} fit beside the completion"
+                )
+            budget -= prompt_tokens - self.input_budget + 64
+
+        report = {
+            "prompt_tokens": prompt_tokens,
+            "input_budget": self.input_budget,
+            "context_tokens": self.context_tokens,
+            "completion_tokens": self.completion_tokens,
+            "videos_included": len(fitted),
+            "videos_dropped": len(videos) - len(fitted),
+            "tokenizer": self.counter.name
+        }
+        print(f"🧮 Prompt: {prompt_tokens:,}/{self.input_budget:,} tokens, "
+              f"{len(fitted)}/{len(videos)} videos ({self.counter.name})")
+        return prompt, report
@@ -0,0 +1,292 @@
+"""
+YouTube Data API quota ledger and admission control
+Charges every API call its documented unit cost and keeps expensive calls from
+draining the daily budget that cheap cached paths depend on
+"""
+import os
+import time
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Set, Tuple
+
+from database import ApiQuotaUsage, session_scope
+
+try:
+    from zoneinfo import ZoneInfo
+    PACIFIC_TZ = ZoneInfo("America/Los_Angeles")
+except Exception:
+    # No tz database available - approximate with PST
+    PACIFIC_TZ = timezone(timedelta(hours=-8))
+
+
+# Documented unit cost per list endpoint
+QUOTA_COSTS = {
+    'search': 100,
+    'videos': 1,
+    'playlistItems': 1,
+    'channels': 1,
+    'commentThreads': 1,
+}
+
+# Calls costing at least this many units are "expensive" and must leave the reserve untouched
+EXPENSIVE_CALL_UNITS = 100
+
+
+def quota_day(now: Optional[datetime] = None) -> str:
+    """Current quota day - YouTube resets quotas at midnight Pacific time"""
+    now = now or datetime.now(timezone.utc)
+    return now.astimezone(PACIFIC_TZ).strftime('%Y-%m-%d')
+
+
+def seconds_until_quota_reset(now: Optional[datetime] = None) -> int:
+    """Seconds until the next Pacific midnight"""
+    now = (now or datetime.now(timezone.utc)).astimezone(PACIFIC_TZ)
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return int((tomorrow - now).total_seconds())
+
+
+class QuotaExceededError(Exception):
+    """Raised when a call is refused by the admission controller"""
+
+    def __init__(self, message: str, retry_after_seconds: int):
+        self.retry_after_seconds = retry_after_seconds
+        super().__init__(message)
+
+
+class QuotaLedger:
+    """
+    In-memory quota counters for the current day, flushed to the api_quota_usage table
+
+    admit() is called before a request and rejects it if it would exceed the daily limit,
+    or - for expensive calls like search.list - if it would dip into the reserve kept
+    for cheap calls. charge() records units once the API has answered.
+
+    Admission reserves the call's units under a lock, so concurrent callers can't
+    all pass the same check against a budget that only has room for one of them.
+    charge(settles=...) turns the reservation into usage; release() hands it back
+    for calls that never reached the API.
+
+    Only the in-memory counters are touched under the lock. Usage persisted earlier
+    today is loaded by sync_day() in a worker thread, and buffered charges are written
+    by a background flush, so admission never waits on the database.
+    """
+
+    def __init__(
+        self,
+        daily_limit: Optional[int] = None,
+        reserve_units: Optional[int] = None,
+        flush_every_calls: int = 25,
+        flush_interval_seconds: float = 10.0
+    ):
+        self.daily_limit = daily_limit or int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+        if reserve_units is None:
+            # Default reserve: 15% of the daily budget
+            reserve_units = int(os.getenv("YOUTUBE_QUOTA_RESERVE", str(self.daily_limit * 15 // 100)))
+        self.reserve_units = reserve_units
+        self.flush_every_calls = flush_every_calls
+        self.flush_interval_seconds = flush_interval_seconds
+
+        self._day: Optional[str] = None
+        self._loaded = False                                  # _baseline read from the database for _day
+        self._baseline: Dict[str, Dict[str, int]] = {}       # endpoint -> {units, calls} persisted before this process counted
+        self._usage: Dict[str, Dict[str, int]] = {}          # endpoint -> {units, calls} charged by this process today
+        self._unflushed: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._flush_tasks: Set[asyncio.Task] = set()
+        self._reserved = 0
+        self.rejected_calls = 0
+
+    def _roll_day(self):
+        """Reset counters at the Pacific midnight boundary (caller holds the lock)"""
+        today = quota_day()
+        if today != self._day:
+            self._day = today
+            self._loaded = False
+            self._baseline = {}
+            self._usage = {}
+
+    async def sync_day(self):
+        """Load usage persisted earlier today, once per quota day, without blocking the loop"""
+        with self._lock:
+            self._roll_day()
+            if self._loaded:
+                return
+        await asyncio.to_thread(self._load_day)
+
+    def _load_day(self):
+        with self._lock:
+            self._roll_day()
+            if self._loaded:
+                return
+            day = self._day
+        baseline = {}
+        try:
+            with session_scope() as db:
+                for row in db.query(ApiQuotaUsage).filter(ApiQuotaUsage.day == day).all():
+                    baseline[row.endpoint] = {"units": row.units or 0, "calls": row.calls or 0}
+        except Exception as e:
+            print(f"⚠️ Could not load quota usage: {e}")
+        with self._lock:
+            if self._day == day and not self._loaded:
+                self._baseline = baseline
+                self._loaded = True
+
+    def _used(self) -> int:
+        return sum(entry["units"] for entry in self._baseline.values()) + sum(entry["units"] for entry in self._usage.values())
+
+    def used_today(self) -> int:
+        with self._lock:
+            self._roll_day()
+            return self._used()
+
+    def remaining_today(self) -> int:
+        with self._lock:
+            self._roll_day()
+            return max(0, self.daily_limit - self._used() - self._reserved)
+
+    def admit(self, endpoint: str, units: Optional[int] = None) -> int:
+        """
+        Reserve the units for this call, or raise QuotaExceededError if it should not be sent
+        Returns the reserved units - pass them to charge(settles=...) or release()
+        """
+        units = QUOTA_COSTS.get(endpoint, 1) if units is None else units
+        with self._lock:
+            self._roll_day()
+            used = self._used() + self._reserved
+
+            limit = self.daily_limit
+            if units >= EXPENSIVE_CALL_UNITS:
+                limit -= self.reserve_units
+
+            if used + units > limit:
+                self.rejected_calls += 1
+                retry_after = seconds_until_quota_reset()
+                raise QuotaExceededError(
+                    f"YouTube API quota budget exhausted for {endpoint} ({used}/{self.daily_limit} units used or in flight today, "
+                    f"{self.reserve_units} reserved for cheap calls). Resets in {retry_after // 3600}h {retry_after % 3600 // 60}m.",
+                    retry_after_seconds=retry_after
+                )
+            self._reserved += units
+        return units
+
+    def release(self, units: int):
+        """Return reserved units for a call that never reached the API"""
+        with self._lock:
+            self._reserved = max(0, self._reserved - units)
+
+    def charge(self, endpoint: str, units: Optional[int] = None, settles: int = 0):
+        """Record the cost of a call that reached the API, settling `settles` reserved units"""
+        units = QUOTA_COSTS.get(endpoint, 1) if units is None else units
+        with self._lock:
+            self._reserved = max(0, self._reserved - settles)
+            self._roll_day()
+
+            entry = self._usage.setdefault(endpoint, {"units": 0, "calls": 0})
+            entry["units"] += units
+            entry["calls"] += 1
+
+            pending = self._unflushed.setdefault((self._day, endpoint), {"units": 0, "calls": 0})
+            pending["units"] += units
+            pending["calls"] += 1
+
+            pending_calls = sum(p["calls"] for p in self._unflushed.values())
+            due = pending_calls >= self.flush_every_calls or time.monotonic() - self._last_flush >= self.flush_interval_seconds
+            batch = self._take_unflushed() if due else None
+
+        if batch:
+            self._persist_in_background(batch)
+
+    def _take_unflushed(self) -> Dict[Tuple[str, str], Dict[str, int]]:
+        """Detach the charges that are safe to write (caller holds the lock)"""
+        self._last_flush = time.monotonic()
+        # Today's charges wait until today's baseline is loaded, or the load would count them twice
+        batch = {key: delta for key, delta in self._unflushed.items() if self._loaded or key[0] != self._day}
+        for key in batch:
+            del self._unflushed[key]
+        return batch
+
+    def _persist_in_background(self, batch: Dict[Tuple[str, str], Dict[str, int]]):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Called from a worker thread - it is fine to write here
+            self._persist(batch)
+            return
+        task = loop.create_task(asyncio.to_thread(self._persist, batch))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    def flush(self):
+        """Persist buffered charges to the database (blocking - call from a worker thread or at shutdown)"""
+        with self._lock:
+            batch = self._take_unflushed()
+        if batch:
+            self._persist(batch)
+
+    async def close(self):
+        """Wait for background flushes, then write whatever is still buffered"""
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        await asyncio.to_thread(self.flush)
+
+    def _persist(self, unflushed: Dict[Tuple[str, str], Dict[str, int]]):
+        try:
+            with session_scope() as db:
+                for (day, endpoint), delta in unflushed.items():
+                    row = db.query(ApiQuotaUsage).filter(
+                        ApiQuotaUsage.day == day,
+                        ApiQuotaUsage.endpoint == endpoint
+                    ).first()
+                    if row:
+                        row.units = (row.units or 0) + delta["units"]
+                        row.calls = (row.calls or 0) + delta["calls"]
+                    else:
+                        db.add(ApiQuotaUsage(day=day, endpoint=endpoint, units=delta["units"], calls=delta["calls"]))
+                db.commit()
+        except Exception as e:
+            print(f"⚠️ Could not persist quota usage: {e}")
+
+    def get_report(self, days: int = 7) -> Dict:
+        """Usage with per-endpoint (today) and per-day breakdowns (blocking - run it in a worker thread)"""
+        self._load_day()
+        self.flush()
+
+        by_day: Dict[str, Dict] = {}
+        try:
+            with session_scope() as db:
+                rows = db.query(ApiQuotaUsage).order_by(ApiQuotaUsage.day.desc()).all()
+                for row in rows:
+                    if row.day not in by_day:
+                        if len(by_day) >= days:
+                            break
+                        by_day[row.day] = {"day": row.day, "units": 0, "calls": 0, "endpoints": {}}
+                    day_entry = by_day[row.day]
+                    day_entry["units"] += row.units or 0
+                    day_entry["calls"] += row.calls or 0
+                    day_entry["endpoints"][row.endpoint] = {"units": row.units or 0, "calls": row.calls or 0}
+        except Exception as e:
+            print(f"⚠️ Could not read quota history: {e}")
+
+        with self._lock:
+            used = self._used()
+            reserved = self._reserved
+            endpoints_today = {endpoint: dict(entry) for endpoint, entry in self._baseline.items()}
+            for endpoint, entry in self._usage.items():
+                total = endpoints_today.setdefault(endpoint, {"units": 0, "calls": 0})
+                total["units"] += entry["units"]
+                total["calls"] += entry["calls"]
+        return {
+            "quota_day": self._day,
+            "daily_limit": self.daily_limit,
+            "reserve_units": self.reserve_units,
+            "used_today": used,
+            "reserved_units": reserved,
+            "remaining_today": max(0, self.daily_limit - used - reserved),
+            "resets_in_seconds": seconds_until_quota_reset(),
+            "rejected_calls": self.rejected_calls,
+            "endpoints_today": endpoints_today,
+            "days": list(by_day.values()),
+            "unit_costs": QUOTA_COSTS
+        }
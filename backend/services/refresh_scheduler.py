@@ -0,0 +1,205 @@
+"""
+Refresh-ahead scheduler for channel_cache
+Tracks how often each cached channel is requested and re-fetches the hottest ones
+shortly before they expire, so users rarely hit a cold or stale cache
+"""
+import os
+import time
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from database import ChannelCache, session_scope
+from services.db_service import DatabaseService
+from services.channel_refresh import ChannelRefresher
+from services.quota_service import QuotaLedger, quota_day
+
+
+class RefreshAheadScheduler:
+    """
+    Periodic in-process job
+
+    Every interval it ranks accessed channels by a decayed access score, picks those
+    expiring within the lead window, and refreshes them under a concurrency cap and a
+    daily quota budget (units spent are read back from the quota ledger, so calls made
+    concurrently by users are counted too - the budget errs on the safe side).
+
+    A single access decays below forget_score within a few half-lives (12h with the
+    defaults) and never reaches min_score, so only channels requested more than once
+    recently are refreshed ahead.
+    """
+
+    def __init__(
+        self,
+        refresher: ChannelRefresher,
+        quota: QuotaLedger,
+        interval_seconds: Optional[float] = None,
+        lead_seconds: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        max_refreshes_per_run: Optional[int] = None,
+        daily_unit_budget: Optional[int] = None,
+        half_life_hours: Optional[float] = None,
+        min_score: Optional[float] = None,
+        forget_score: Optional[float] = None
+    ):
+        self.refresher = refresher
+        self.quota = quota
+        self.interval_seconds = interval_seconds or float(os.getenv("REFRESH_AHEAD_INTERVAL_SECONDS", "300"))
+        self.lead_seconds = lead_seconds or float(os.getenv("REFRESH_AHEAD_LEAD_MINUTES", "30")) * 60
+        self.max_concurrency = max_concurrency or int(os.getenv("REFRESH_AHEAD_CONCURRENCY", "2"))
+        self.max_refreshes_per_run = max_refreshes_per_run or int(os.getenv("REFRESH_AHEAD_MAX_PER_RUN", "10"))
+        # Default budget: 10% of the daily quota
+        self.daily_unit_budget = daily_unit_budget or int(
+            os.getenv("REFRESH_AHEAD_DAILY_UNITS", str(quota.daily_limit // 10))
+        )
+        self.half_life_seconds = (half_life_hours or float(os.getenv("REFRESH_AHEAD_HALF_LIFE_HOURS", "6"))) * 3600
+        self.min_score = min_score if min_score is not None else float(os.getenv("REFRESH_AHEAD_MIN_SCORE", "1.5"))
+        self.forget_score = forget_score if forget_score is not None else float(os.getenv("REFRESH_AHEAD_FORGET_SCORE", "0.25"))
+
+        # channel_id -> {score, last_access, max_videos}
+        self._access: Dict[str, Dict] = {}
+        self._queue: List[str] = []
+        self._task: Optional[asyncio.Task] = None
+        self._budget_day: Optional[str] = None
+        self._units_spent_today = 0
+        self.last_run: Optional[Dict] = None
+        self.totals = {"runs": 0, "refreshed": 0, "failed": 0, "units_spent": 0}
+
+    def record_access(self, channel_id: str, max_videos: int = 100):
+        """Count a request for a channel (exponentially decayed, half-life 6h by default)"""
+        now = time.monotonic()
+        entry = self._access.get(channel_id)
+        if entry:
+            decay = 0.5 ** ((now - entry["last_access"]) / self.half_life_seconds)
+            entry["score"] = entry["score"] * decay + 1
+            entry["last_access"] = now
+            entry["max_videos"] = max(entry["max_videos"], max_videos)
+        else:
+            self._access[channel_id] = {"score": 1.0, "last_access": now, "max_videos": max_videos}
+
+    def _current_score(self, channel_id: str) -> float:
+        entry = self._access[channel_id]
+        return entry["score"] * 0.5 ** ((time.monotonic() - entry["last_access"]) / self.half_life_seconds)
+
+    def _forget_cold(self) -> int:
+        """Drop channels nobody has asked for in a while"""
+        cold = [cid for cid in self._access if self._current_score(cid) < self.forget_score]
+        for channel_id in cold:
+            del self._access[channel_id]
+        return len(cold)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+            print(f"⏰ Refresh-ahead scheduler started (every {self.interval_seconds:.0f}s, "
+                  f"{self.daily_unit_budget} units/day)")
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"⚠️ Refresh-ahead run failed: {e}")
+
+    def _units_left_today(self) -> int:
+        today = quota_day()
+        if today != self._budget_day:
+            self._budget_day = today
+            self._units_spent_today = 0
+        own_budget = self.daily_unit_budget - self._units_spent_today
+        # Never dip into the reserve kept for interactive cheap calls
+        shared_budget = self.quota.remaining_today() - self.quota.reserve_units
+        return min(own_budget, shared_budget)
+
+    def _pick_candidates(self) -> List[str]:
+        """Repeatedly accessed channels expiring within the lead window, hottest first"""
+        hot = [cid for cid in self._access if self._current_score(cid) >= self.min_score]
+        if not hot:
+            return []
+        candidates = []
+        with session_scope() as db:
+            db_service = DatabaseService(db)
+            channels = db.query(ChannelCache).filter(ChannelCache.channel_id.in_(hot)).all()
+            for channel in channels:
+                expires_in = db_service.channel_cache_expires_in(channel)
+                if expires_in <= self.lead_seconds and self.refresher.within_grace(expires_in):
+                    candidates.append(channel.channel_id)
+        candidates.sort(key=self._current_score, reverse=True)
+        return candidates
+
+    async def run_once(self) -> Dict:
+        """Refresh the hottest soon-to-expire channels within the concurrency and quota budgets"""
+        started = time.monotonic()
+        await self.quota.sync_day()
+        self._forget_cold()
+        self._queue = self._pick_candidates()
+        run = {
+            "started_at": datetime.utcnow().isoformat(),
+            "candidates": len(self._queue),
+            "refreshed": 0,
+            "failed": 0,
+            "skipped_budget": 0,
+            "skipped_in_flight": 0,
+            "units_spent": 0
+        }
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        selected = self._queue[:self.max_refreshes_per_run]
+        run["skipped_budget"] = len(self._queue) - len(selected)
+
+        async def refresh(channel_id: str):
+            async with semaphore:
+                if self._units_left_today() <= 0:
+                    run["skipped_budget"] += 1
+                    return
+                if self.refresher.is_refreshing(channel_id):
+                    run["skipped_in_flight"] += 1
+                    return
+                used_before = self.quota.used_today()
+                ok = await self.refresher.refresh_exclusive(channel_id, self._access[channel_id]["max_videos"])
+                spent = max(0, self.quota.used_today() - used_before)
+                self._units_spent_today += spent
+                run["units_spent"] += spent
+                run["refreshed" if ok else "failed"] += 1
+                if channel_id in self._queue:
+                    self._queue.remove(channel_id)
+
+        await asyncio.gather(*[refresh(channel_id) for channel_id in selected])
+
+        run["duration_seconds"] = round(time.monotonic() - started, 2)
+        self.last_run = run
+        self.totals["runs"] += 1
+        self.totals["refreshed"] += run["refreshed"]
+        self.totals["failed"] += run["failed"]
+        self.totals["units_spent"] += run["units_spent"]
+        if run["candidates"]:
+            print(f"⏰ Refresh-ahead: {run['refreshed']} refreshed, {run['failed']} failed, "
+                  f"{run['skipped_budget']} deferred ({run['units_spent']} units)")
+        return run
+
+    def get_stats(self) -> Dict:
+        hottest = sorted(self._access, key=self._current_score, reverse=True)[:20]
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval_seconds": self.interval_seconds,
+            "lead_seconds": self.lead_seconds,
+            "max_concurrency": self.max_concurrency,
+            "daily_unit_budget": self.daily_unit_budget,
+            "half_life_hours": self.half_life_seconds / 3600,
+            "min_score": self.min_score,
+            "units_left_today": self._units_left_today(),
+            "tracked_channels": len(self._access),
+            "hottest": [{"channel_id": cid, "score": round(self._current_score(cid), 2)} for cid in hottest],
+            "queue": list(self._queue),
+            "last_run": self.last_run,
+            "totals": self.totals
+        }
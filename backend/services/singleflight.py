@@ -0,0 +1,69 @@
+"""
+Singleflight de-duplication of concurrent identical calls
+While a call is in flight, identical calls await the same result instead of
+repeating the work (and burning quota) before the first one has been cached
+"""
+import asyncio
+import copy
+import functools
+import inspect
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from services.priority_lanes import current_lane
+
+
+class SingleFlight:
+    """
+    Registry of in-flight calls keyed by operation and arguments
+    Calls only share work within a priority lane: the shared task runs in the
+    first caller's lane, so an interactive caller must never wait on a background flight.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.stats = {"calls": 0, "shared": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() unless an identical call is already running, in which case share its result"""
+        self.stats["calls"] += 1
+        key = (current_lane.get(), key)
+
+        existing = self._in_flight.get(key)
+        if existing is not None:
+            self.stats["shared"] += 1
+            # Shield so a cancelled follower doesn't cancel the shared call; copy so
+            # callers that annotate results in place don't affect each other
+            result = await asyncio.shield(existing)
+            return copy.deepcopy(result)
+
+        task = asyncio.ensure_future(fn())
+        self._in_flight[key] = task
+
+        def _forget(done_task):
+            if self._in_flight.get(key) is done_task:
+                del self._in_flight[key]
+
+        task.add_done_callback(_forget)
+        return await asyncio.shield(task)
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "in_flight": len(self._in_flight)}
+
+
+def singleflight(operation: str):
+    """
+    Decorator for async methods of objects with a `singleflight` attribute
+    Arguments are normalized (defaults applied) so positional and keyword calls share a key
+    """
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            key = (operation,) + tuple((name, value) for name, value in bound.arguments.items() if name != 'self')
+            return await self.singleflight.do(key, lambda: method(self, *args, **kwargs))
+
+        return wrapper
+    return decorator
@@ -0,0 +1,142 @@
+"""
+Server-sent event helpers
+Streams LLM output to the browser as it is generated, and picks complete JSON
+items out of a partial response so structured results can render early
+"""
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi.responses import StreamingResponse
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one SSE frame (data is JSON-encoded)"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"   # Stop proxies (nginx, Railway) from buffering the stream
+        }
+    )
+
+
+class IncrementalJSONParser:
+    """
+    Emits values from a JSON document while it is still streaming in
+
+    feed() returns (path, value) for every value at most max_depth levels deep that
+    has just completed - e.g. (["series_suggestions", 0], {...}) as soon as the first
+    suggestion closes, then (["series_suggestions"], [...]) once the whole list has.
+    Text before the first '{' or '[' (markdown fences, preamble) is skipped.
+    """
+
+    def __init__(self, max_depth: int = 2):
+        self.max_depth = max_depth
+        self._buf = ""
+        self._pos = 0
+        self._stack: List[Dict] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._root_start: Optional[int] = None
+        self._root_end: Optional[int] = None
+
+    @property
+    def done(self) -> bool:
+        return self._root_end is not None
+
+    def result(self) -> Any:
+        """The complete document, once done"""
+        if not self.done:
+            raise ValueError("JSON document is not complete yet")
+        return json.loads(self._buf[self._root_start:self._root_end])
+
+    def _push(self, kind: str, start: int, path: List):
+        self._stack.append({
+            "kind": kind,
+            "path": path,
+            "key": None,
+            "index": 0,
+            "expect_key": kind == "{",
+            "value_start": None
+        })
+        if self._root_start is None:
+            self._root_start = start
+
+    def _child_path(self, frame: Dict) -> List:
+        return frame["path"] + [frame["key"] if frame["kind"] == "{" else frame["index"]]
+
+    def _close_value(self, frame: Dict, end: int, events: List[Tuple[List, Any]]):
+        if frame["value_start"] is None:
+            return
+        path = self._child_path(frame)
+        raw = self._buf[frame["value_start"]:end]
+        frame["value_start"] = None
+        if len(path) > self.max_depth:
+            return
+        try:
+            events.append((path, json.loads(raw)))
+        except ValueError:
+            pass
+
+    def feed(self, chunk: str) -> List[Tuple[List, Any]]:
+        self._buf += chunk
+        buf = self._buf
+        events: List[Tuple[List, Any]] = []
+
+        while self._pos < len(buf) and not self.done:
+            i = self._pos
+            ch = buf[i]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    frame = self._stack[-1]
+                    if frame["kind"] == "{" and frame["expect_key"]:
+                        frame["key"] = json.loads(buf[self._string_start:i + 1])
+                continue
+
+            if not self._stack:
+                if ch in "{[":
+                    self._push(ch, i, [])
+                continue
+
+            frame = self._stack[-1]
+            if ch.isspace():
+                continue
+            if ch in ",}]":
+                self._close_value(frame, i, events)
+                if ch == ",":
+                    if frame["kind"] == "{":
+                        frame["expect_key"] = True
+                    else:
+                        frame["index"] += 1
+                else:
+                    self._stack.pop()
+                    if not self._stack:
+                        self._root_end = i + 1
+                continue
+            if ch == ":":
+                frame["expect_key"] = False
+                continue
+
+            # Start of a key or a value
+            if (frame["kind"] == "[" or not frame["expect_key"]) and frame["value_start"] is None:
+                frame["value_start"] = i
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                self._push(ch, i, self._child_path(frame))
+
+        return events
@@ -0,0 +1,136 @@
+"""
+Transcript fetching off the event loop
+YouTubeTranscriptApi is synchronous, so fetches run in a dedicated thread pool with a
+concurrency cap, per-call timeout and jittered exponential backoff for transient errors
+"""
+import os
+import time
+import random
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+from youtube_transcript_api import (
+    YouTubeTranscriptApi, TooManyRequests, YouTubeRequestFailed,
+    TranscriptsDisabled, NoTranscriptFound, NoTranscriptAvailable, VideoUnavailable, InvalidVideoId
+)
+
+from services.priority_lanes import build_scheduler, percentile
+
+
+# Errors worth retrying - anything else (disabled, no captions, unavailable) fails immediately
+TRANSIENT_ERRORS = (TooManyRequests, YouTubeRequestFailed, requests.exceptions.RequestException, asyncio.TimeoutError)
+
+# Errors that mean the video has no usable transcript - safe to negative-cache
+PERMANENT_ERRORS = (TranscriptsDisabled, NoTranscriptFound, NoTranscriptAvailable, VideoUnavailable, InvalidVideoId)
+
+
+class TranscriptFetcher:
+    """
+    Runs YouTubeTranscriptApi.get_transcript in a sized executor
+
+    All transcript requests go to the same host, so a priority scheduler caps how many
+    run at once; callers beyond the cap wait in their lane (reported as queue depth),
+    and interactive fetches are served ahead of background ones.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        timeout_seconds: Optional[float] = None,
+        max_retries: int = 3,
+        base_backoff_seconds: float = 0.5
+    ):
+        self.max_workers = max_workers or int(os.getenv("TRANSCRIPT_WORKERS", "16"))
+        self.max_concurrency = max_concurrency or int(os.getenv("TRANSCRIPT_MAX_CONCURRENCY", "8"))
+        self.timeout_seconds = timeout_seconds or float(os.getenv("TRANSCRIPT_TIMEOUT", "20"))
+        self.max_retries = max_retries
+        self.base_backoff_seconds = base_backoff_seconds
+
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="transcript")
+        self.scheduler = build_scheduler("transcripts", self.max_concurrency)
+
+        self._in_flight = 0
+        self._latencies = deque(maxlen=1000)    # seconds per successful fetch
+        self._queue_waits = deque(maxlen=1000)  # seconds spent waiting for a slot
+        self.counters = {"fetched": 0, "failed": 0, "retries": 0, "timeouts": 0}
+
+    async def fetch(self, video_id: str) -> List[Dict]:
+        """Fetch a transcript (list of {text, start, duration}) or raise the final error"""
+        attempt = 0
+        while True:
+            try:
+                return await self._attempt(video_id)
+            except TRANSIENT_ERRORS as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.counters["timeouts"] += 1
+                if attempt >= self.max_retries:
+                    self.counters["failed"] += 1
+                    raise
+                attempt += 1
+                self.counters["retries"] += 1
+                delay = random.uniform(0, self.base_backoff_seconds * 2 ** attempt)
+                print(f"🔁 Transcript fetch for {video_id} failed ({type(e).__name__}), retry {attempt} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            except Exception:
+                self.counters["failed"] += 1
+                raise
+
+    async def _attempt(self, video_id: str) -> List[Dict]:
+        """
+        One fetch in a worker thread
+        The timeout only stops us waiting - the thread can't be interrupted, so its
+        slot is released when the thread actually finishes, keeping the cap honest
+        """
+        queued_at = time.monotonic()
+        lane = await self.scheduler.acquire()
+        self._queue_waits.append(time.monotonic() - queued_at)
+        self._in_flight += 1
+
+        started_at = time.monotonic()
+        work = asyncio.get_running_loop().run_in_executor(
+            self.executor, YouTubeTranscriptApi.get_transcript, video_id
+        )
+
+        def _finished(done):
+            self._in_flight -= 1
+            self.scheduler.release(lane)
+            if not done.cancelled():
+                done.exception()   # Mark retrieved - an abandoned fetch's error is not news
+
+        work.add_done_callback(_finished)
+
+        result = await asyncio.wait_for(asyncio.shield(work), timeout=self.timeout_seconds)
+        self._latencies.append(time.monotonic() - started_at)
+        self.counters["fetched"] += 1
+        return result
+
+    def get_metrics(self) -> Dict:
+        latencies = sorted(self._latencies)
+        queue_waits = sorted(self._queue_waits)
+        return {
+            "max_workers": self.max_workers,
+            "max_concurrency": self.max_concurrency,
+            "timeout_seconds": self.timeout_seconds,
+            "queue_depth": self.scheduler.waiting(),
+            "in_flight": self._in_flight,
+            **self.counters,
+            "latency_seconds": {
+                "p50": percentile(latencies, 50),
+                "p90": percentile(latencies, 90),
+                "p99": percentile(latencies, 99),
+                "samples": len(latencies)
+            },
+            "queue_wait_seconds": {
+                "p50": percentile(queue_waits, 50),
+                "p90": percentile(queue_waits, 90),
+                "p99": percentile(queue_waits, 99)
+            },
+            "lanes": self.scheduler.get_metrics()["lanes"]
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
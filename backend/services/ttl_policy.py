@@ -0,0 +1,141 @@
+"""
+Cache TTL policies
+Decide how long cached video/channel data stays fresh, shared by the in-memory
+caches and the database freshness checks
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Union
+
+
+def parse_published_at(published_at: Union[str, datetime, None]) -> Optional[datetime]:
+    """Parse an ISO 8601 publishedAt value into an aware UTC datetime"""
+    if not published_at:
+        return None
+    if isinstance(published_at, datetime):
+        return published_at if published_at.tzinfo else published_at.replace(tzinfo=timezone.utc)
+    try:
+        return datetime.fromisoformat(published_at.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+def published_age(published_at: Union[str, datetime, None]) -> Optional[timedelta]:
+    published = parse_published_at(published_at)
+    if published is None:
+        return None
+    return max(timedelta(0), datetime.now(timezone.utc) - published)
+
+
+def estimate_velocity(view_count: Optional[int], published_at: Union[str, datetime, None]) -> Optional[float]:
+    """Lifetime average views per hour - used when no observed velocity is recorded"""
+    age = published_age(published_at)
+    if age is None or not view_count:
+        return None
+    return view_count / max(1.0, age.total_seconds() / 3600)
+
+
+class TTLPolicy:
+    """Flat TTL regardless of content (the behaviour before adaptive TTLs)"""
+
+    def __init__(self, default_seconds: float = 24 * 3600):
+        self.default_seconds = default_seconds
+
+    def ttl_seconds(
+        self,
+        kind: str,
+        published_at: Union[str, datetime, None] = None,
+        view_velocity: Optional[float] = None,
+        default: Optional[float] = None
+    ) -> float:
+        """
+        TTL for cached data of a kind ('stats', 'channel', 'comments', 'transcript')
+        default is returned when the policy has nothing to go on (unknown publish date)
+        """
+        return self.default_seconds if default is None else default
+
+    def describe(self, kind: str) -> Dict:
+        """The TTLs this policy applies to a kind, for stats endpoints"""
+        return {"policy": "fixed", "ttl_seconds": self.default_seconds}
+
+
+class AdaptiveTTLPolicy(TTLPolicy):
+    """
+    TTL keyed on published age and view velocity
+
+    A video posted yesterday changes every hour; a two-year-old video barely moves.
+    The age tier sets a base TTL, the kind scales it (transcripts change least), and
+    a high view velocity (views/hour) shortens it.
+    """
+
+    # (max published age, base TTL) - first matching tier wins
+    AGE_TIERS = [
+        (timedelta(days=1), timedelta(hours=1)),
+        (timedelta(days=7), timedelta(hours=6)),
+        (timedelta(days=30), timedelta(hours=24)),
+        (timedelta(days=365), timedelta(days=3)),
+        (None, timedelta(days=7)),
+    ]
+
+    KIND_FACTORS = {'stats': 1.0, 'channel': 1.0, 'comments': 2.0, 'transcript': 8.0}
+
+    # (views/hour at or above, TTL divisor)
+    VELOCITY_TIERS = [(1000, 4), (100, 2)]
+
+    def __init__(
+        self,
+        default_seconds: float = 24 * 3600,
+        min_seconds: float = 15 * 60,
+        max_seconds: float = 30 * 24 * 3600
+    ):
+        super().__init__(default_seconds)
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+
+    def ttl_seconds(
+        self,
+        kind: str,
+        published_at: Union[str, datetime, None] = None,
+        view_velocity: Optional[float] = None,
+        default: Optional[float] = None
+    ) -> float:
+        age = published_age(published_at)
+        if age is None:
+            return super().ttl_seconds(kind, default=default)
+
+        base = next(ttl for max_age, ttl in self.AGE_TIERS if max_age is None or age < max_age)
+        seconds = base.total_seconds() * self.KIND_FACTORS.get(kind, 1.0)
+
+        if view_velocity:
+            for threshold, divisor in self.VELOCITY_TIERS:
+                if view_velocity >= threshold:
+                    seconds /= divisor
+                    break
+
+        return min(self.max_seconds, max(self.min_seconds, seconds))
+
+    def describe(self, kind: str) -> Dict:
+        factor = self.KIND_FACTORS.get(kind, 1.0)
+        tiers = []
+        for max_age, ttl in self.AGE_TIERS:
+            seconds = min(self.max_seconds, max(self.min_seconds, ttl.total_seconds() * factor))
+            tiers.append({
+                "published_within_days": max_age.days if max_age else None,
+                "ttl_seconds": seconds
+            })
+        return {
+            "policy": "adaptive",
+            "age_tiers": tiers,
+            "velocity_divisors": [{"views_per_hour": threshold, "divisor": divisor} for threshold, divisor in self.VELOCITY_TIERS],
+            "unknown_age_ttl_seconds": self.default_seconds,
+            "min_seconds": self.min_seconds,
+            "max_seconds": self.max_seconds
+        }
+
+
+def get_ttl_policy() -> TTLPolicy:
+    """Policy selected by CACHE_TTL_POLICY ('adaptive' by default, or 'fixed')"""
+    default_seconds = float(os.getenv("CACHE_TTL_HOURS", "24")) * 3600
+    if os.getenv("CACHE_TTL_POLICY", "adaptive").lower() == "fixed":
+        return TTLPolicy(default_seconds)
+    return AdaptiveTTLPolicy(default_seconds)
@@ -0,0 +1,188 @@
+"""
+Async client for the YouTube Data API v3
+Uses one pooled, keep-alive HTTP client so concurrent requests never block the event loop
+"""
+import os
+import asyncio
+from typing import Dict, List, Optional, Union
+import httpx
+
+from services.quota_service import QuotaLedger, QUOTA_COSTS
+from services.etag_store import ETagStore
+from services.key_pool import APIKeyPool, QUOTA_ERROR_REASONS
+from services.priority_lanes import build_scheduler
+
+
+YOUTUBE_API_BASE_URL = "https://www.googleapis.com/youtube/v3"
+
+# Status codes worth retrying - everything else is returned to the caller immediately
+RETRYABLE_STATUS_CODES = {500, 502, 503, 504}
+
+# Endpoints whose responses are stored with their ETag and revalidated with If-None-Match
+ETAG_ENDPOINTS = {'channels', 'videos', 'playlistItems'}
+
+
+class YouTubeAPIError(Exception):
+    """Error response returned by the YouTube Data API"""
+
+    def __init__(self, status_code: int, message: str, reason: Optional[str] = None):
+        self.status_code = status_code
+        self.message = message
+        self.reason = reason
+        super().__init__(f"HTTP {status_code}: {message}" + (f" ({reason})" if reason else ""))
+
+
+class YouTubeAPIClient:
+    """
+    Non-blocking YouTube Data API client
+
+    All requests share a single httpx.AsyncClient (connection pooling + keep-alive)
+    and take a slot from a priority scheduler that caps in-flight requests and lets
+    interactive calls overtake queued background ones.
+    Each request is sent with the least-used key from the key pool; a key that
+    runs out of quota is quarantined and the request retried on another key.
+    """
+
+    def __init__(
+        self,
+        api_key: Union[str, List[str], None],
+        max_concurrency: Optional[int] = None,
+        timeout_seconds: Optional[float] = None,
+        max_retries: int = 2,
+        ledger: Optional[QuotaLedger] = None,
+        etag_store: Optional[ETagStore] = None
+    ):
+        api_keys = api_key if isinstance(api_key, list) else [api_key]
+        self.key_pool = APIKeyPool(api_keys)
+        self.ledger = ledger
+        self.etag_store = etag_store
+        self.max_concurrency = max_concurrency or int(os.getenv("YOUTUBE_MAX_CONCURRENCY", "20"))
+        self.timeout_seconds = timeout_seconds or float(os.getenv("YOUTUBE_HTTP_TIMEOUT", "15"))
+        self.max_retries = max_retries
+        self.scheduler = build_scheduler("youtube", self.max_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Lazily create the shared HTTP client"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=YOUTUBE_API_BASE_URL,
+                timeout=httpx.Timeout(self.timeout_seconds, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                    keepalive_expiry=60
+                ),
+                headers={"Accept-Encoding": "gzip"}
+            )
+        return self._client
+
+    async def get(self, resource: str, **params) -> Dict:
+        """
+        Call a list endpoint, e.g. get('videos', part='snippet', id='abc')
+        Returns the parsed JSON response or raises YouTubeAPIError
+        (QuotaExceededError if the quota ledger refuses the call)
+        Pass fields= (a partial-response mask) to download only the fields the caller reads.
+
+        Recurring channels/videos/playlistItems requests are revalidated against their
+        stored ETag - a 304 Not Modified returns the stored body without re-downloading it.
+        """
+        query = {k: v for k, v in params.items() if v is not None}
+        units = QUOTA_COSTS.get(resource, 1)
+
+        if not self.key_pool:
+            raise YouTubeAPIError(400, "No YouTube API key configured", "keyMissing")
+        # Units are reserved on admission so concurrent calls can't all pass the same check
+        reserved = 0
+        if self.ledger:
+            await self.ledger.sync_day()
+            reserved = self.ledger.admit(resource)
+
+        try:
+            cache_key = None
+            stored = None
+            headers = {}
+            if self.etag_store and resource in ETAG_ENDPOINTS:
+                if not ETagStore.is_cacheable(resource, query):
+                    self.etag_store.stats["skipped"] += 1
+                else:
+                    cache_key = ETagStore.make_key(resource, query)
+                    stored = await self.etag_store.get(cache_key)
+                    if stored:
+                        headers['If-None-Match'] = stored[0]
+                        self.etag_store.stats["conditional_requests"] += 1
+
+            exhausted_keys = set()
+            attempt = 0
+            while True:
+                # Retries and failovers are charged again, so each attempt needs its own admission
+                if self.ledger and not reserved:
+                    reserved = self.ledger.admit(resource)
+                api_key = self.key_pool.acquire(units, exclude=exhausted_keys)
+                try:
+                    async with self.scheduler.slot():
+                        response = await self._get_client().get(
+                            f"/{resource}", params={**query, 'key': api_key}, headers=headers
+                        )
+                except httpx.TransportError as e:
+                    if attempt < self.max_retries:
+                        attempt += 1
+                        await asyncio.sleep(0.5 * 2 ** attempt)
+                        continue
+                    raise YouTubeAPIError(0, f"{type(e).__name__}: {e}")
+
+                # The API charges every request that reaches it, including errors
+                if self.ledger:
+                    self.ledger.charge(resource, settles=reserved)
+                    reserved = 0
+                self.key_pool.charge(api_key, units)
+
+                if response.status_code in RETRYABLE_STATUS_CODES and attempt < self.max_retries:
+                    attempt += 1
+                    await asyncio.sleep(0.5 * 2 ** attempt)
+                    continue
+
+                if response.status_code == 304 and stored:
+                    await self.etag_store.mark_not_modified(cache_key)
+                    return stored[1]
+
+                if response.status_code >= 400:
+                    error = self._to_error(response)
+                    if error.status_code == 403 and error.reason in QUOTA_ERROR_REASONS:
+                        # Key is out of quota - park it until the reset and fail over
+                        self.key_pool.quarantine(api_key, error.reason)
+                        exhausted_keys.add(api_key)
+                        self.key_pool.failovers += 1
+                        continue
+                    raise error
+
+                body = response.json()
+                if cache_key:
+                    etag = body.get('etag') or response.headers.get('ETag')
+                    if etag:
+                        await self.etag_store.put(cache_key, resource, etag, body)
+                return body
+        finally:
+            # Calls that never reached the API give their reservation back
+            if reserved:
+                self.ledger.release(reserved)
+
+    @staticmethod
+    def _to_error(response: httpx.Response) -> YouTubeAPIError:
+        """Build a YouTubeAPIError from an error response body"""
+        message = response.reason_phrase
+        reason = None
+        try:
+            error = response.json().get('error', {})
+            message = error.get('message', message)
+            errors = error.get('errors') or []
+            if errors:
+                reason = errors[0].get('reason')
+        except ValueError:
+            pass
+        return YouTubeAPIError(response.status_code, message, reason)
+
+    async def aclose(self):
+        """Close the pooled HTTP client"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
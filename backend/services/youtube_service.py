@@ -7,47 +7,90 @@ from functools import lru_cache
 from datetime import datetime, timedelta
 import hashlib
 import json
-from youtube_transcript_api import YouTubeTranscriptApi
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 
+from services.youtube_client import YouTubeAPIClient, YouTubeAPIError
+from services.batch_loader import BatchLoader
+from services.quota_service import QuotaLedger
+from services.etag_store import ETagStore
+from services.cache import Cache, Unavailable, BloomFilter
+from services.transcript_fetcher import TranscriptFetcher, PERMANENT_ERRORS
+from services.singleflight import SingleFlight, singleflight
+from services.ttl_policy import get_ttl_policy
+from services.db_service import DatabaseService
+from database import session_scope
 
-# Simple in-memory cache with TTL
-class Cache:
-    def __init__(self, ttl_seconds=3600):
-        self.cache = {}
-        self.ttl = ttl_seconds
-    
-    def get(self, key):
-        if key in self.cache:
-            value, timestamp = self.cache[key]
-            if datetime.now() - timestamp < timedelta(seconds=self.ttl):
-                print(f"✅ Cache HIT: {key[:50]}...")
-                return value
-            else:
-                del self.cache[key]
-        return None
-    
-    def set(self, key, value):
-        self.cache[key] = (value, datetime.now())
-        print(f"💾 Cache SET: {key[:50]}...")
-    
-    def clear_old(self):
-        """Clear expired entries"""
-        now = datetime.now()
-        expired = [k for k, (v, t) in self.cache.items() 
-                  if now - t >= timedelta(seconds=self.ttl)]
-        for k in expired:
-            del self.cache[k]
+
+# Partial-response masks (fields=) - each call site declares only the fields it reads,
+# so the API skips unused thumbnails, localizations, tags and descriptions
+CHANNEL_INFO_FIELDS = 'etag,items(snippet(title,description,thumbnails/high/url),statistics(subscriberCount,videoCount))'
+UPLOADS_PLAYLIST_FIELDS = 'etag,items/contentDetails/relatedPlaylists/uploads'
+PLAYLIST_PAGE_FIELDS = 'etag,nextPageToken,items/snippet(publishedAt,resourceId/videoId)'
+VIDEO_DETAILS_FIELDS = (
+    'etag,items(id,snippet(title,channelTitle,publishedAt,thumbnails/medium/url),'
+    'contentDetails/duration,statistics/viewCount)'
+)
+VIDEO_STATISTICS_FIELDS = 'etag,items(id,statistics)'
+VIDEO_INFO_FIELDS = (
+    'etag,items(id,snippet(title,description,channelTitle,channelId,publishedAt,thumbnails/high/url),'
+    'contentDetails/duration,statistics(viewCount,likeCount,commentCount))'
+)
+COMMENT_FIELDS = 'items/snippet/topLevelComment/snippet(authorDisplayName,textDisplay,likeCount,publishedAt)'
+SEARCH_VIDEO_FIELDS = 'items(id/videoId,snippet(title,channelTitle,channelId,publishedAt,description,thumbnails/medium/url))'
+SEARCH_CHANNEL_FIELDS = 'items(id/channelId,snippet(title,description,thumbnails/medium/url))'
+HANDLE_FIELDS = 'etag,items/id'
 
 
 class YouTubeService:
-    def __init__(self, api_key: str):
-        self.api_key = api_key
-        self.youtube = build('youtube', 'v3', developerKey=api_key)
-        self.transcript_cache = Cache(ttl_seconds=7200)  # 2 hour cache for transcripts
-        self.comments_cache = Cache(ttl_seconds=3600)   # 1 hour cache for comments
-    
+    def __init__(self, api_key: Optional[str] = None, api_keys: Optional[List[str]] = None):
+        # Spread calls over a pool of keys; the shared ledger's budget covers all of them
+        api_keys = [k for k in (api_keys or [api_key]) if k]
+        self.api_key = api_keys[0] if api_keys else None
+        self.etag_store = ETagStore()
+        daily_limit_per_key = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+        self.quota = QuotaLedger(daily_limit=daily_limit_per_key * max(1, len(api_keys)))
+        self.client = YouTubeAPIClient(api_keys, ledger=self.quota, etag_store=self.etag_store)
+        self.key_pool = self.client.key_pool
+        self.transcript_cache = Cache(
+            ttl_seconds=7200,  # 2 hour cache for transcripts
+            max_entries=int(os.getenv("TRANSCRIPT_CACHE_MAX_ENTRIES", "500")),
+            max_bytes=int(os.getenv("TRANSCRIPT_CACHE_MAX_MB", "64")) * 1024 * 1024,
+            name="transcripts"
+        )
+        self.comments_cache = Cache(
+            ttl_seconds=3600,  # 1 hour cache for comments
+            max_entries=int(os.getenv("COMMENTS_CACHE_MAX_ENTRIES", "1000")),
+            max_bytes=int(os.getenv("COMMENTS_CACHE_MAX_MB", "32")) * 1024 * 1024,
+            name="comments"
+        )
+        self.transcript_fetcher = TranscriptFetcher()
+        
+        # Per-entry TTLs scale with published age and view velocity when known
+        self.ttl_policy = get_ttl_policy()
+        
+        # Negative cache for videos without transcripts / with comments disabled
+        self.negative_ttl_seconds = float(os.getenv("NEGATIVE_CACHE_TTL_HOURS", "24")) * 3600
+        self._unavailable_filters: Optional[Dict[str, BloomFilter]] = None
+        
+        # Coalesce concurrent get_video_info calls into 50-ID videos.list requests
+        self.video_info_loader = BatchLoader(
+            self._fetch_video_info_batch,
+            max_batch_size=50,
+            window_seconds=float(os.getenv("YOUTUBE_BATCH_WINDOW_MS", "5")) / 1000
+        )
+        
+        # Share one in-flight call between concurrent identical requests
+        self.singleflight = SingleFlight()
+        
+        # Memoized @handle -> channel_id lookups (backed by the channel_handles table)
+        self._handle_ids: Dict[str, Optional[str]] = {}
+
+    async def close(self):
+        """Release pooled HTTP connections and persist quota usage"""
+        await self.client.aclose()
+        await self.quota.close()
+        self.key_pool.flush()
+        self.transcript_fetcher.shutdown()
+
     def parse_duration_to_minutes(self, duration: str) -> float:
         """Convert ISO 8601 duration to minutes"""
         # Duration format: PT#H#M#S or PT#M#S or PT#S
@@ -62,19 +105,19 @@ class YouTubeService:
         total_minutes = hours * 60 + minutes + seconds / 60
         return total_minutes
     
+    @singleflight('channel_info')
     async def get_channel_info(self, channel_id: str) -> Dict:
         """Get channel information"""
         try:
-            request = self.youtube.channels().list(
+            response = await self.client.get(
+                'channels',
                 part='snippet,statistics,contentDetails',
-                id=channel_id
+                id=channel_id,
+                fields=CHANNEL_INFO_FIELDS
             )
-            response = request.execute()
             
-            if 'items' not in response:
-                raise ValueError(f"Invalid API response. Please check your YouTube API key and ensure the YouTube Data API v3 is enabled.")
-            
-            if not response['items']:
+            # With the fields mask the API omits 'items' entirely when nothing matches
+            if not response.get('items'):
                 raise ValueError(f"Channel not found: {channel_id}")
             
             channel = response['items'][0]
@@ -83,43 +126,75 @@ class YouTubeService:
                 "channel_id": channel_id,
                 "title": channel['snippet']['title'],
                 "description": channel['snippet']['description'],
-                "subscriber_count": channel['statistics'].get('subscriberCount', 'N/A'),
-                "video_count": channel['statistics'].get('videoCount', 'N/A'),
+                "subscriber_count": channel.get('statistics', {}).get('subscriberCount', 'N/A'),
+                "video_count": channel.get('statistics', {}).get('videoCount', 'N/A'),
                 "thumbnail": channel['snippet']['thumbnails']['high']['url']
             }
-        except HttpError as e:
+        except YouTubeAPIError as e:
             raise Exception(f"YouTube API error: {str(e)}")
     
-    async def get_channel_videos(self, channel_id: str, max_results: int = 30) -> List[Dict]:
-        """Get long-form videos (>3 minutes) from a channel, sorted by view count"""
+    @singleflight('channel_videos')
+    async def get_channel_videos(
+        self,
+        channel_id: str,
+        max_results: int = 30,
+        incremental: bool = True,
+        published_after: Optional[datetime] = None,
+        include_shorts: bool = False
+    ) -> List[Dict]:
+        """
+        Get long-form videos (>3 minutes) from a channel, sorted by view count
+        
+        With incremental=True, a stored per-channel watermark lets later calls page the
+        uploads playlist only until already-known videos, then refresh statistics for the
+        known set in cheap part=statistics batches instead of re-walking ~500 uploads.
+        
+        With published_after set, only uploads newer than that (timezone-aware) datetime
+        are returned - the playlist is read newest-first and paging stops at the cutoff.
+        """
         try:
+            if published_after is not None:
+                videos = await self._fetch_recent_channel_videos(channel_id, published_after, include_shorts)
+                return self._top_by_views(videos, max_results)
+            
+            if incremental:
+                state = self._load_sync_state(channel_id)
+                if state and state.get('newest_video_id') and state.get('videos') is not None:
+                    videos = await self._sync_channel_videos_incremental(channel_id, state)
+                    return self._top_by_views(videos, max_results)
+            
             # Get uploads playlist ID
-            request = self.youtube.channels().list(
+            response = await self.client.get(
+                'channels',
                 part='contentDetails',
-                id=channel_id
+                id=channel_id,
+                fields=UPLOADS_PLAYLIST_FIELDS
             )
-            response = request.execute()
             
-            if 'items' not in response or not response['items']:
+            if not response.get('items'):
                 return []
             
             uploads_playlist_id = response['items'][0]['contentDetails']['relatedPlaylists']['uploads']
             
             # Fetch more videos to ensure we get enough after filtering
             all_video_ids = []
+            newest_published_at = None
             next_page_token = None
             
             # Fetch multiple pages to get more videos (up to 10 pages = ~500 videos)
             for _ in range(10):
-                request = self.youtube.playlistItems().list(
+                response = await self.client.get(
+                    'playlistItems',
                     part='snippet',
                     playlistId=uploads_playlist_id,
                     maxResults=50,
-                    pageToken=next_page_token
+                    pageToken=next_page_token,
+                    fields=PLAYLIST_PAGE_FIELDS
                 )
-                response = request.execute()
                 
-                for item in response['items']:
+                for item in response.get('items', []):
+                    if not all_video_ids:
+                        newest_published_at = item['snippet'].get('publishedAt')
                     all_video_ids.append(item['snippet']['resourceId']['videoId'])
                 
                 next_page_token = response.get('nextPageToken')
@@ -130,112 +205,375 @@ class YouTubeService:
                 return []
             
             # Get detailed video info including duration and view count
-            # Process in batches of 50 (API limit)
-            all_videos = []
-            for i in range(0, len(all_video_ids), 50):
-                batch_ids = all_video_ids[i:i+50]
-                request = self.youtube.videos().list(
-                    part='snippet,contentDetails,statistics',
-                    id=','.join(batch_ids)
-                )
-                batch_response = request.execute()
-                
-                for video in batch_response.get('items', []):
-                    duration_minutes = self.parse_duration_to_minutes(video['contentDetails']['duration'])
-                    
-                    # Only include videos longer than 3 minutes
-                    if duration_minutes > 3:
-                        all_videos.append({
-                            "video_id": video['id'],
-                            "title": video['snippet']['title'],
-                            "channel_name": video['snippet']['channelTitle'],
-                            "thumbnail": video['snippet']['thumbnails']['medium']['url'],
-                            "published_at": video['snippet']['publishedAt'],
-                            "view_count": int(video['statistics'].get('viewCount', 0)),
-                            "duration": video['contentDetails']['duration'],
-                            "duration_minutes": round(duration_minutes, 1)
-                        })
+            all_videos = await self._fetch_video_details(all_video_ids)
             
-            # Sort by view count (descending) and return top videos
-            all_videos.sort(key=lambda x: x['view_count'], reverse=True)
+            self._save_sync_state(
+                channel_id=channel_id,
+                uploads_playlist_id=uploads_playlist_id,
+                newest_video_id=all_video_ids[0],
+                newest_published_at=newest_published_at,
+                known_video_ids=all_video_ids,
+                videos=all_videos
+            )
             
-            return all_videos[:max_results]
+            return self._top_by_views(all_videos, max_results)
             
-        except HttpError as e:
+        except YouTubeAPIError as e:
             raise Exception(f"YouTube API error: {str(e)}")
     
-    async def get_video_info(self, video_id: str) -> Dict:
-        """Get detailed information about a video"""
-        try:
-            request = self.youtube.videos().list(
-                part='snippet,statistics,contentDetails',
-                id=video_id
+    async def _fetch_recent_channel_videos(self, channel_id: str, published_after: datetime, include_shorts: bool) -> List[Dict]:
+        """Read the uploads playlist newest-first and stop paging once items are older than the cutoff"""
+        state = self._load_sync_state(channel_id)
+        uploads_playlist_id = state.get('uploads_playlist_id') if state else None
+        
+        if not uploads_playlist_id:
+            response = await self.client.get(
+                'channels',
+                part='contentDetails',
+                id=channel_id,
+                fields=UPLOADS_PLAYLIST_FIELDS
+            )
+            if not response.get('items'):
+                return []
+            uploads_playlist_id = response['items'][0]['contentDetails']['relatedPlaylists']['uploads']
+        
+        recent_video_ids = []
+        next_page_token = None
+        
+        for _ in range(10):
+            response = await self.client.get(
+                'playlistItems',
+                part='snippet',
+                playlistId=uploads_playlist_id,
+                maxResults=50,
+                pageToken=next_page_token,
+                fields=PLAYLIST_PAGE_FIELDS
             )
-            response = request.execute()
             
-            if 'items' not in response or not response['items']:
-                raise ValueError(f"Video not found: {video_id}")
+            reached_cutoff = False
+            for item in response.get('items', []):
+                published_at = item['snippet'].get('publishedAt', '')
+                if published_at and datetime.fromisoformat(published_at.replace('Z', '+00:00')) < published_after:
+                    reached_cutoff = True
+                    break
+                recent_video_ids.append(item['snippet']['resourceId']['videoId'])
             
-            video = response['items'][0]
+            next_page_token = response.get('nextPageToken')
+            if reached_cutoff or not next_page_token:
+                break
+        
+        if not recent_video_ids:
+            return []
+        
+        return await self._fetch_video_details(recent_video_ids, include_shorts=include_shorts)
+    
+    async def _sync_channel_videos_incremental(self, channel_id: str, state: Dict) -> List[Dict]:
+        """
+        Page the uploads playlist only until the watermark, fetch details for new uploads
+        and refresh statistics for already-known videos
+        """
+        known_ids = set(state['known_video_ids'] or [])
+        watermark_published_at = state.get('newest_published_at')
+        
+        new_video_ids = []
+        newest_published_at = None
+        next_page_token = None
+        pages = 0
+        
+        for _ in range(10):
+            response = await self.client.get(
+                'playlistItems',
+                part='snippet',
+                playlistId=state['uploads_playlist_id'],
+                maxResults=50,
+                pageToken=next_page_token,
+                fields=PLAYLIST_PAGE_FIELDS
+            )
+            pages += 1
             
-            return {
-                "video_id": video_id,
+            reached_watermark = False
+            for item in response.get('items', []):
+                video_id = item['snippet']['resourceId']['videoId']
+                published_at = item['snippet'].get('publishedAt')
+                if video_id in known_ids or (
+                    watermark_published_at and published_at and published_at <= watermark_published_at
+                ):
+                    reached_watermark = True
+                    break
+                if not new_video_ids:
+                    newest_published_at = published_at
+                new_video_ids.append(video_id)
+            
+            next_page_token = response.get('nextPageToken')
+            if reached_watermark or not next_page_token:
+                break
+        
+        new_videos = await self._fetch_video_details(new_video_ids) if new_video_ids else []
+        
+        # Refresh view counts for the known long-form set (1 unit per 50 videos)
+        known_videos = state['videos']
+        statistics = await self._fetch_statistics([v['video_id'] for v in known_videos])
+        refreshed_videos = []
+        for video in known_videos:
+            stats = statistics.get(video['video_id'])
+            if stats is None:
+                continue  # Deleted or made private since the last sync
+            refreshed_videos.append({**video, "view_count": int(stats.get('viewCount', 0))})
+        
+        all_video_ids = (new_video_ids + list(state['known_video_ids'] or []))[:500]
+        all_videos = new_videos + refreshed_videos
+        
+        print(f"🔄 Incremental sync for {channel_id}: {len(new_video_ids)} new uploads, "
+              f"{len(refreshed_videos)} videos refreshed ({pages} playlist page(s))")
+        
+        self._save_sync_state(
+            channel_id=channel_id,
+            uploads_playlist_id=state['uploads_playlist_id'],
+            newest_video_id=new_video_ids[0] if new_video_ids else state['newest_video_id'],
+            newest_published_at=newest_published_at or watermark_published_at,
+            known_video_ids=all_video_ids,
+            videos=all_videos
+        )
+        
+        return all_videos
+    
+    async def _fetch_video_details(self, video_ids: List[str], include_shorts: bool = False) -> List[Dict]:
+        """Fetch details for video IDs in batches of 50 (keeping only videos longer than 3 minutes unless include_shorts)"""
+        all_videos = []
+        for i in range(0, len(video_ids), 50):
+            batch_ids = video_ids[i:i+50]
+            batch_response = await self.client.get(
+                'videos',
+                part='snippet,contentDetails,statistics',
+                id=','.join(batch_ids),
+                fields=VIDEO_DETAILS_FIELDS
+            )
+            
+            for video in batch_response.get('items', []):
+                duration_minutes = self.parse_duration_to_minutes(video['contentDetails']['duration'])
+                
+                # Only include videos longer than 3 minutes
+                if include_shorts or duration_minutes > 3:
+                    all_videos.append({
+                        "video_id": video['id'],
+                        "title": video['snippet']['title'],
+                        "channel_name": video['snippet']['channelTitle'],
+                        "thumbnail": video['snippet']['thumbnails']['medium']['url'],
+                        "published_at": video['snippet']['publishedAt'],
+                        "view_count": int(video.get('statistics', {}).get('viewCount', 0)),
+                        "duration": video['contentDetails']['duration'],
+                        "duration_minutes": round(duration_minutes, 1)
+                    })
+        return all_videos
+    
+    async def _fetch_statistics(self, video_ids: List[str]) -> Dict[str, Dict]:
+        """Fetch only part=statistics for video IDs in batches of 50"""
+        statistics = {}
+        for i in range(0, len(video_ids), 50):
+            batch_response = await self.client.get(
+                'videos',
+                part='statistics',
+                id=','.join(video_ids[i:i+50]),
+                fields=VIDEO_STATISTICS_FIELDS
+            )
+            for video in batch_response.get('items', []):
+                statistics[video['id']] = video.get('statistics', {})
+        return statistics
+    
+    async def refresh_statistics(self, channel_id: Optional[str] = None) -> Dict:
+        """
+        Statistics-only delta refresh of cached videos (one channel, or everything cached)
+        Re-reads part=statistics in 50-ID batches (1 unit each) and patches counts in
+        video_metadata and channel_cache in place instead of rebuilding the snapshots
+        """
+        with session_scope() as db:
+            cached = DatabaseService(db).get_cached_video_ids(channel_id)
+        
+        video_ids = list(dict.fromkeys(
+            cached['videos'] + [vid for ids in cached['channels'].values() for vid in ids]
+        ))
+        if not video_ids:
+            return {"videos_requested": 0, "videos_patched": 0, "channels_patched": 0, "api_calls": 0}
+        
+        statistics = await self._fetch_statistics(video_ids)
+        
+        with session_scope() as db:
+            db_service = DatabaseService(db)
+            videos_patched = db_service.apply_video_statistics(statistics)
+            channels_patched = 0
+            for cached_channel_id in cached['channels']:
+                if db_service.apply_channel_statistics(cached_channel_id, statistics):
+                    channels_patched += 1
+        
+        api_calls = (len(video_ids) + 49) // 50
+        print(f"📊 Refreshed statistics for {len(statistics)}/{len(video_ids)} videos "
+              f"({channels_patched} channel lists) in {api_calls} API call(s)")
+        return {
+            "videos_requested": len(video_ids),
+            "videos_patched": videos_patched,
+            "videos_missing": len(video_ids) - len(statistics),
+            "channels_patched": channels_patched,
+            "api_calls": api_calls
+        }
+    
+    @staticmethod
+    def _top_by_views(videos: List[Dict], max_results: int) -> List[Dict]:
+        """Sort by view count (descending) and return top videos"""
+        return sorted(videos, key=lambda x: x['view_count'], reverse=True)[:max_results]
+    
+    def _load_sync_state(self, channel_id: str) -> Optional[Dict]:
+        """Read the channel's sync watermark from the database (None if unavailable)"""
+        try:
+            with session_scope() as db:
+                state = DatabaseService(db).get_channel_sync_state(channel_id)
+                if not state:
+                    return None
+                return {
+                    "uploads_playlist_id": state.uploads_playlist_id,
+                    "newest_video_id": state.newest_video_id,
+                    "newest_published_at": state.newest_published_at,
+                    "known_video_ids": state.known_video_ids,
+                    "videos": state.videos
+                }
+        except Exception as e:
+            print(f"⚠️ Could not load sync state for {channel_id}: {e}")
+            return None
+    
+    def _save_sync_state(self, channel_id: str, **fields):
+        """Persist the channel's sync watermark (failures only disable incremental sync)"""
+        try:
+            with session_scope() as db:
+                DatabaseService(db).save_channel_sync_state(channel_id=channel_id, **fields)
+        except Exception as e:
+            print(f"⚠️ Could not save sync state for {channel_id}: {e}")
+    
+    async def get_video_info(self, video_id: str) -> Dict:
+        """
+        Get detailed information about a video
+        Concurrent calls are coalesced into videos.list requests of up to 50 IDs
+        """
+        return await self.video_info_loader.load(video_id)
+    
+    async def _fetch_video_info_batch(self, video_ids: List[str]) -> Dict[str, Dict]:
+        """Batch function behind video_info_loader - one videos.list call for up to 50 IDs"""
+        try:
+            response = await self.client.get(
+                'videos',
+                part='snippet,statistics,contentDetails',
+                id=','.join(video_ids),
+                fields=VIDEO_INFO_FIELDS
+            )
+        except YouTubeAPIError as e:
+            raise Exception(f"YouTube API error: {str(e)}")
+        
+        print(f"📦 Batched videos.list: {len(video_ids)} IDs in 1 request")
+        
+        results = {}
+        for video in response.get('items', []):
+            results[video['id']] = {
+                "video_id": video['id'],
                 "title": video['snippet']['title'],
                 "description": video['snippet']['description'],
                 "channel_name": video['snippet']['channelTitle'],
                 "channel_id": video['snippet']['channelId'],
                 "published_at": video['snippet']['publishedAt'],
-                "view_count": video['statistics'].get('viewCount', '0'),
-                "like_count": video['statistics'].get('likeCount', '0'),
-                "comment_count": video['statistics'].get('commentCount', '0'),
+                "view_count": video.get('statistics', {}).get('viewCount', '0'),
+                "like_count": video.get('statistics', {}).get('likeCount', '0'),
+                "comment_count": video.get('statistics', {}).get('commentCount', '0'),
                 "duration": video['contentDetails']['duration'],
                 "thumbnail": video['snippet']['thumbnails']['high']['url']
             }
-        except HttpError as e:
-            raise Exception(f"YouTube API error: {str(e)}")
+        
+        for video_id in video_ids:
+            if video_id not in results:
+                results[video_id] = ValueError(f"Video not found: {video_id}")
+        
+        return results
     
+    @singleflight('transcript')
     async def get_transcript(self, video_id: str) -> Optional[str]:
-        """Get video transcript with caching"""
-        # Check cache first
+        """
+        Get video transcript through a read-through cache:
+        memory -> video_metadata table -> network, writing back into both tiers
+        """
+        # Check memory first
         cache_key = f"transcript_{video_id}"
         cached = self.transcript_cache.get(cache_key)
+        if isinstance(cached, Unavailable):
+            return None
         if cached is not None:
             return cached
         
+        # Then the database - transcripts never change once published
+        stored = self._read_stored_video(video_id)
+        if stored and stored.get('transcript'):
+            self.transcript_cache.set(cache_key, stored['transcript'], ttl_seconds=stored['transcript_ttl'])
+            return stored['transcript']
+        if stored and stored.get('transcript_unavailable'):
+            self.transcript_cache.set(cache_key, Unavailable('transcript', stored['transcript_unavailable']),
+                                      ttl_seconds=self.negative_ttl_seconds)
+            return None
+        
         try:
-            # Fetch transcript using static method
-            transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
+            # Fetch in the transcript thread pool (retries transient failures)
+            transcript_list = await self.transcript_fetcher.fetch(video_id)
             
             if transcript_list:
                 # Extract text from each transcript entry
                 transcript_text = " ".join([entry['text'] for entry in transcript_list])
-                # Cache the result
-                self.transcript_cache.set(cache_key, transcript_text)
+                # Write back into both tiers
+                self.transcript_cache.set(cache_key, transcript_text, ttl_seconds=stored and stored['transcript_ttl'])
+                self._store_video_field(video_id, transcript=transcript_text)
                 return transcript_text
+            self._remember_unavailable(video_id, 'transcript', 'EmptyTranscript', cache_key)
+            return None
+        except PERMANENT_ERRORS as e:
+            print(f"Transcript unavailable for {video_id}: {type(e).__name__}")
+            self._remember_unavailable(video_id, 'transcript', type(e).__name__, cache_key)
             return None
         except Exception as e:
             print(f"Could not fetch transcript for {video_id}: {str(e)}")
             return None
     
+    @singleflight('comments')
     async def get_comments(self, video_id: str, max_results: int = 50) -> List[Dict]:
-        """Get comments from a video with caching"""
-        # Check cache first
+        """
+        Get comments from a video through a read-through cache:
+        memory -> video_metadata table -> network, writing back into both tiers
+        """
+        # Check memory first
         cache_key = f"comments_{video_id}_{max_results}"
         cached = self.comments_cache.get(cache_key)
+        if isinstance(cached, Unavailable):
+            return []
         if cached is not None:
             return cached
         
+        # Then the database, if the stored list is still fresh for the video's age and
+        # long enough - a shorter list stored by an earlier, smaller request doesn't count
+        stored = self._read_stored_video(video_id)
+        if stored and stored.get('comments') is not None and stored['comments_fresh'] \
+                and self._stored_comments_cover(stored, max_results):
+            comments = stored['comments'][:max_results]
+            self.comments_cache.set(cache_key, comments, ttl_seconds=stored['comments_ttl'])
+            return comments
+        if stored and stored.get('comments_unavailable'):
+            self.comments_cache.set(cache_key, Unavailable('comments', stored['comments_unavailable']),
+                                    ttl_seconds=self.negative_ttl_seconds)
+            return []
+        
         try:
             comments = []
-            request = self.youtube.commentThreads().list(
+            response = await self.client.get(
+                'commentThreads',
                 part='snippet',
                 videoId=video_id,
                 maxResults=min(max_results, 100),
-                order='relevance'
+                order='relevance',
+                fields=COMMENT_FIELDS
             )
-            response = request.execute()
             
-            for item in response['items']:
+            for item in response.get('items', []):
                 comment = item['snippet']['topLevelComment']['snippet']
                 comments.append({
                     "author": comment['authorDisplayName'],
@@ -244,28 +582,119 @@ class YouTubeService:
                     "published_at": comment['publishedAt']
                 })
             
-            # Cache the result
-            self.comments_cache.set(cache_key, comments)
+            # Write back into both tiers
+            self.comments_cache.set(cache_key, comments, ttl_seconds=stored and stored['comments_ttl'])
+            self._store_video_field(video_id, comments=comments)
             return comments
-        except HttpError as e:
+        except YouTubeAPIError as e:
             print(f"Could not fetch comments for {video_id}: {str(e)}")
-            return []
+            if e.reason in ('commentsDisabled', 'videoNotFound') or e.status_code == 404:
+                self._remember_unavailable(video_id, 'comments', e.reason or 'notFound', cache_key)
+                return []
+            # Serve the stale stored list rather than nothing
+            return (stored.get('comments') or [])[:max_results] if stored else []
+    
+    @staticmethod
+    def _stored_comments_cover(stored: Dict, max_results: int) -> bool:
+        """True if the stored list has max_results comments, or every comment the video has"""
+        wanted = min(max_results, 100)   # commentThreads.list never returns more than 100
+        if len(stored['comments']) >= wanted:
+            return True
+        return stored.get('comment_count') is not None and len(stored['comments']) >= stored['comment_count']
+    
+    def _read_stored_video(self, video_id: str) -> Optional[Dict]:
+        """Read the cached transcript/comments for a video from the database"""
+        try:
+            with session_scope() as db:
+                db_service = DatabaseService(db, self.ttl_policy)
+                video = db_service.get_video_metadata(video_id)
+                if not video:
+                    return None
+                negative_ttl_hours = self.negative_ttl_seconds / 3600
+                return {
+                    "transcript": video.transcript,
+                    "comments": video.comments,
+                    "comment_count": video.comment_count,
+                    "comments_fresh": db_service.is_video_fresh(video, kind='comments'),
+                    "transcript_ttl": db_service.video_ttl_seconds(video, 'transcript', default=self.transcript_cache.ttl),
+                    "comments_ttl": db_service.video_ttl_seconds(video, 'comments', default=self.comments_cache.ttl),
+                    "transcript_unavailable": DatabaseService.fresh_unavailable_reason(video, 'transcript', negative_ttl_hours),
+                    "comments_unavailable": DatabaseService.fresh_unavailable_reason(video, 'comments', negative_ttl_hours)
+                }
+        except Exception as e:
+            print(f"⚠️ Could not read cached video {video_id}: {e}")
+            return None
+    
+    def _store_video_field(self, video_id: str, transcript: Optional[str] = None, comments: Optional[List[Dict]] = None):
+        """Write a fetched transcript or comment list back into video_metadata"""
+        try:
+            with session_scope() as db:
+                db_service = DatabaseService(db)
+                if transcript is not None:
+                    db_service.update_transcript(video_id, transcript, create_if_missing=True)
+                if comments is not None:
+                    db_service.update_comments(video_id, comments, create_if_missing=True)
+        except Exception as e:
+            print(f"⚠️ Could not store cached video {video_id}: {e}")
+    
+    def _remember_unavailable(self, video_id: str, kind: str, reason: str, cache_key: str):
+        """Negative-cache a missing transcript / disabled comments in memory, the database and the Bloom filter"""
+        cache = self.transcript_cache if kind == 'transcript' else self.comments_cache
+        cache.set(cache_key, Unavailable(kind, reason), ttl_seconds=self.negative_ttl_seconds)
+        self._get_unavailable_filters()[kind].add(video_id)
+        try:
+            with session_scope() as db:
+                DatabaseService(db).mark_unavailable(video_id, kind, reason)
+        except Exception as e:
+            print(f"⚠️ Could not store negative cache entry for {video_id}: {e}")
+    
+    def _get_unavailable_filters(self) -> Dict[str, BloomFilter]:
+        """Bloom filters of known-unavailable video IDs, seeded from the database on first use"""
+        if self._unavailable_filters is None:
+            self._unavailable_filters = {'transcript': BloomFilter(), 'comments': BloomFilter()}
+            try:
+                with session_scope() as db:
+                    db_service = DatabaseService(db)
+                    for kind, bloom in self._unavailable_filters.items():
+                        for video_id in db_service.get_all_unavailable_ids(kind):
+                            bloom.add(video_id)
+            except Exception as e:
+                print(f"⚠️ Could not seed negative cache filters: {e}")
+        return self._unavailable_filters
+    
+    def known_unavailable(self, video_ids: List[str], kind: str) -> Dict[str, str]:
+        """
+        Bulk check which videos have a fresh negative-cache entry ('transcript' or 'comments')
+        The Bloom filter rules out most IDs without touching the database; the few
+        candidates are confirmed with a single query.
+        """
+        bloom = self._get_unavailable_filters()[kind]
+        candidates = [vid for vid in video_ids if vid in bloom]
+        if not candidates:
+            return {}
+        try:
+            with session_scope() as db:
+                return DatabaseService(db).get_unavailable(candidates, kind, self.negative_ttl_seconds / 3600)
+        except Exception as e:
+            print(f"⚠️ Could not check negative cache: {e}")
+            return {}
     
     async def search_videos(self, query: str, max_results: int = 10) -> List[Dict]:
         """Search for videos by keyword"""
         try:
-            request = self.youtube.search().list(
+            response = await self.client.get(
+                'search',
                 part='snippet',
                 q=query,
                 type='video',
                 maxResults=max_results,
                 order='relevance',
-                videoDuration='long'  # Filter for long videos
+                videoDuration='long',  # Filter for long videos
+                fields=SEARCH_VIDEO_FIELDS
             )
-            response = request.execute()
             
             videos = []
-            for item in response['items']:
+            for item in response.get('items', []):
                 try:
                     # Skip if not a proper video result
                     if 'id' not in item or 'videoId' not in item['id']:
@@ -285,22 +714,23 @@ class YouTubeService:
                     continue
             
             return videos
-        except HttpError as e:
+        except YouTubeAPIError as e:
             raise Exception(f"YouTube API error: {str(e)}")
     
     async def search_channels(self, query: str, max_results: int = 5) -> List[Dict]:
         """Search for channels"""
         try:
-            request = self.youtube.search().list(
+            response = await self.client.get(
+                'search',
                 part='snippet',
                 q=query,
                 type='channel',
-                maxResults=max_results
+                maxResults=max_results,
+                fields=SEARCH_CHANNEL_FIELDS
             )
-            response = request.execute()
             
             channels = []
-            for item in response['items']:
+            for item in response.get('items', []):
                 channels.append({
                     "channel_id": item['id']['channelId'],
                     "title": item['snippet']['title'],
@@ -309,8 +739,80 @@ class YouTubeService:
                 })
             
             return channels
-        except HttpError as e:
+        except YouTubeAPIError as e:
+            raise Exception(f"YouTube API error: {str(e)}")
+    
+    @staticmethod
+    def normalize_handle(handle: str) -> str:
+        """Lowercase a handle and make sure it has its leading '@'"""
+        handle = handle.strip().lower()
+        return handle if handle.startswith('@') else f"@{handle}"
+    
+    async def resolve_handle(self, handle: str) -> Optional[str]:
+        """Resolve an @handle to a channel ID (None if no channel has that handle)"""
+        resolved = await self.resolve_handles([handle])
+        return resolved[self.normalize_handle(handle)]
+    
+    async def resolve_handles(
+        self,
+        handles: List[str],
+        known: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Optional[str]]:
+        """
+        Resolve @handles to channel IDs: memory, then the channel_handles table, then
+        channels.list?forHandle= (1 quota unit each, vs 100 for a channel search)
+        
+        known: handle -> channel_id pairs already on hand (e.g. from niche_channels.json);
+        they are stored without an API call.
+        """
+        normalized = list(dict.fromkeys(self.normalize_handle(h) for h in handles))
+        missing = [h for h in normalized if h not in self._handle_ids]
+        if not missing:
+            return {h: self._handle_ids[h] for h in normalized}
+        
+        try:
+            with session_scope() as db:
+                stored = DatabaseService(db).get_channel_handles(missing)
+        except Exception as e:
+            print(f"⚠️ Could not load stored handles: {e}")
+            stored = {}
+        
+        seeds = {
+            self.normalize_handle(h): channel_id for h, channel_id in (known or {}).items()
+            if channel_id and self.normalize_handle(h) in missing
+        }
+        new_mappings = {h: channel_id for h, channel_id in seeds.items() if stored.get(h) != channel_id}
+        
+        to_fetch = [h for h in missing if h not in seeds and h not in stored]
+        if to_fetch:
+            print(f"🔎 Resolving {len(to_fetch)} channel handles via channels.list")
+            results = await asyncio.gather(*[self._lookup_handle(h) for h in to_fetch], return_exceptions=True)
+            for handle, result in zip(to_fetch, results):
+                if isinstance(result, Exception):
+                    print(f"⚠️ Could not resolve {handle}: {result}")
+                    continue
+                new_mappings[handle] = result
+        
+        if new_mappings:
+            try:
+                with session_scope() as db:
+                    DatabaseService(db).save_channel_handles(new_mappings)
+            except Exception as e:
+                print(f"⚠️ Could not save resolved handles: {e}")
+        
+        self._handle_ids.update(stored)
+        self._handle_ids.update(new_mappings)
+        return {h: self._handle_ids.get(h) for h in normalized}
+    
+    @singleflight('handle')
+    async def _lookup_handle(self, handle: str) -> Optional[str]:
+        """Look up one handle with channels.list?forHandle="""
+        try:
+            response = await self.client.get('channels', part='id', forHandle=handle, fields=HANDLE_FIELDS)
+        except YouTubeAPIError as e:
             raise Exception(f"YouTube API error: {str(e)}")
+        items = response.get('items') or []
+        return items[0]['id'] if items else None
     
     async def get_video_data_parallel(self, video_ids: List[str], max_comments: int = 20) -> Dict[str, Dict]:
         """
@@ -320,10 +822,21 @@ class YouTubeService:
         print(f"🚀 Starting parallel fetch for {len(video_ids)} videos...")
         start_time = datetime.now()
         
+        # Skip fetches already known to fail (no transcript / comments disabled)
+        no_transcript = self.known_unavailable(video_ids, 'transcript')
+        no_comments = self.known_unavailable(video_ids, 'comments')
+        if no_transcript or no_comments:
+            print(f"⏭️  Skipping {len(no_transcript)} known-missing transcripts and {len(no_comments)} disabled comment sections")
+        
         # Create tasks for all videos
         tasks = []
         for video_id in video_ids:
-            task = self._fetch_single_video_data(video_id, max_comments)
+            task = self._fetch_single_video_data(
+                video_id,
+                max_comments,
+                skip_transcript=video_id in no_transcript,
+                skip_comments=video_id in no_comments
+            )
             tasks.append(task)
         
         # Execute all tasks concurrently
@@ -347,12 +860,18 @@ class YouTubeService:
         
         return video_data
     
-    async def _fetch_single_video_data(self, video_id: str, max_comments: int) -> Dict:
+    async def _fetch_single_video_data(
+        self,
+        video_id: str,
+        max_comments: int,
+        skip_transcript: bool = False,
+        skip_comments: bool = False
+    ) -> Dict:
         """Helper method to fetch data for a single video"""
         try:
             # Fetch transcript and comments in parallel for this video
-            transcript_task = self.get_transcript(video_id)
-            comments_task = self.get_comments(video_id, max_comments)
+            transcript_task = self.get_transcript(video_id) if not skip_transcript else asyncio.sleep(0, result=None)
+            comments_task = self.get_comments(video_id, max_comments) if not skip_comments else asyncio.sleep(0, result=[])
             
             transcript, comments = await asyncio.gather(
                 transcript_task, 
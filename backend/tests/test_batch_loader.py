@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from services.batch_loader import BatchLoader
+from services.priority_lanes import BACKGROUND, INTERACTIVE, current_lane, request_lane
+
+
+class Recorder:
+    def __init__(self, missing=(), failing=()):
+        self.batches = []
+        self.lanes = []
+        self.missing = set(missing)
+        self.failing = set(failing)
+
+    async def __call__(self, keys):
+        self.batches.append(list(keys))
+        self.lanes.append(current_lane.get())
+        results = {}
+        for key in keys:
+            if key in self.failing:
+                results[key] = ValueError(key)
+            elif key not in self.missing:
+                results[key] = key.upper()
+        return results
+
+
+def test_same_tick_loads_are_coalesced_and_deduplicated():
+    async def run():
+        batch_fn = Recorder()
+        loader = BatchLoader(batch_fn)
+        results = await asyncio.gather(*[loader.load(key) for key in ["a", "b", "a", "c"]])
+        return batch_fn, loader, results
+
+    batch_fn, loader, results = asyncio.run(run())
+    assert results == ["A", "B", "A", "C"]
+    assert batch_fn.batches == [["a", "b", "c"]]
+    assert loader.stats == {"loads": 4, "batches": 1}
+
+
+def test_batches_are_split_at_max_batch_size():
+    async def run():
+        batch_fn = Recorder()
+        loader = BatchLoader(batch_fn, max_batch_size=2)
+        await asyncio.gather(*[loader.load(key) for key in "abcde"])
+        return batch_fn
+
+    assert asyncio.run(run()).batches == [["a", "b"], ["c", "d"], ["e"]]
+
+
+def test_errors_only_reach_their_own_callers():
+    async def run():
+        loader = BatchLoader(Recorder(missing={"m"}, failing={"f"}))
+        return await asyncio.gather(loader.load("a"), loader.load("m"), loader.load("f"), return_exceptions=True)
+
+    ok, missing, failed = asyncio.run(run())
+    assert ok == "A"
+    assert isinstance(missing, KeyError)
+    assert isinstance(failed, ValueError)
+
+
+def test_batch_fn_failure_fails_every_caller():
+    async def broken(keys):
+        raise RuntimeError("upstream down")
+
+    async def run():
+        loader = BatchLoader(broken)
+        return await asyncio.gather(loader.load("a"), loader.load("b"), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(run()))
+
+
+def test_lanes_are_batched_separately():
+    async def background_load(loader, key):
+        with request_lane(BACKGROUND):
+            return await loader.load(key)
+
+    async def run():
+        batch_fn = Recorder()
+        loader = BatchLoader(batch_fn)
+        # The background caller schedules the dispatch; the interactive key must not ride along
+        await asyncio.gather(background_load(loader, "a"), loader.load("b"))
+        return batch_fn
+
+    batch_fn = asyncio.run(run())
+    assert sorted(zip(batch_fn.lanes, map(tuple, batch_fn.batches))) == [(BACKGROUND, ("a",)), (INTERACTIVE, ("b",))]
+
+
+@pytest.mark.parametrize("window", [0.0, 0.01])
+def test_window_collects_later_loads(window):
+    async def run():
+        batch_fn = Recorder()
+        loader = BatchLoader(batch_fn, window_seconds=window)
+        first = loader.load("a")
+        await asyncio.sleep(0)
+        second = loader.load("b")
+        await asyncio.gather(first, second)
+        return batch_fn
+
+    batches = asyncio.run(run()).batches
+    assert batches == ([["a", "b"]] if window else [["a"], ["b"]])
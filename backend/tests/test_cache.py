@@ -0,0 +1,89 @@
+import pytest
+
+import services.cache as cache_module
+from services.cache import BloomFilter, Cache, Unavailable
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, 'monotonic', lambda: now[0])
+    return now
+
+
+class TestCache:
+    def test_entries_expire_after_their_ttl(self, clock):
+        cache = Cache(ttl_seconds=10)
+        cache.set('a', 1)
+        cache.set('b', 2, ttl_seconds=100)
+
+        clock[0] += 11
+        assert 'a' not in cache
+        assert cache.get('a') is None
+        assert cache.get('b') == 2
+        assert cache.expirations == 1
+
+    def test_least_recently_used_entry_is_evicted(self, clock):
+        cache = Cache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert 'b' not in cache
+        assert cache.get('a') == 1 and cache.get('c') == 3
+        assert cache.evictions == 1
+
+    def test_byte_budget_evicts_and_oversized_values_are_skipped(self, clock):
+        cache = Cache(max_bytes=10)
+        cache.set('a', 'x' * 6)
+        cache.set('b', 'y' * 6)
+        assert 'a' not in cache and 'b' in cache
+
+        cache.set('big', 'z' * 11)
+        assert 'big' not in cache
+        assert cache.stats()["bytes"] == 6
+
+    def test_writes_sweep_expired_entries(self, clock):
+        cache = Cache(ttl_seconds=5, sweep_batch=8)
+        for idx in range(4):
+            cache.set(f'old{idx}', idx)
+        clock[0] += 6
+        cache.set('new', 1)
+
+        assert len(cache) == 1
+        assert cache.expirations == 4
+
+    def test_negative_entries_are_returned_as_is(self, clock):
+        cache = Cache()
+        cache.set('v1', Unavailable('transcript', 'disabled'))
+        value = cache.get('v1')
+        assert isinstance(value, Unavailable) and value.reason == 'disabled'
+
+    def test_stats_count_hits_and_misses(self, clock):
+        cache = Cache()
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('missing')
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+class TestBloomFilter:
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(expected_items=1000)
+        keys = [f'video-{idx}' for idx in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        assert all(key in bloom for key in keys)
+        assert bloom.count == 1000
+
+    def test_false_positive_rate_stays_near_target(self):
+        bloom = BloomFilter(expected_items=1000, false_positive_rate=0.01)
+        for idx in range(1000):
+            bloom.add(f'video-{idx}')
+        false_positives = sum(f'other-{idx}' in bloom for idx in range(10000))
+        assert false_positives / 10000 < 0.03
+
+    def test_empty_filter_contains_nothing(self):
+        assert 'anything' not in BloomFilter(expected_items=10)
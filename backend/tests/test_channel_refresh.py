@@ -0,0 +1,73 @@
+import asyncio
+
+from fastapi import BackgroundTasks
+
+from services.channel_refresh import ChannelRefresher
+
+
+class FakeYouTube:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def get_channel_info(self, channel_id):
+        self.calls += 1
+        await self.release.wait()
+        if self.fail:
+            raise RuntimeError("quota")
+        return {'title': 'Channel', 'subscriber_count': 10, 'video_count': 2}
+
+    async def get_channel_videos(self, channel_id, max_results=100):
+        return [{'video_id': 'v1'}]
+
+
+def test_inline_refresh_holds_the_claim(db):
+    async def run():
+        youtube = FakeYouTube()
+        refresher = ChannelRefresher(youtube)
+        inline = asyncio.create_task(refresher.refresh_inline('UC1'))
+        await asyncio.sleep(0)
+
+        assert refresher.is_refreshing('UC1')
+        assert not refresher.schedule(BackgroundTasks(), 'UC1')
+        assert not await refresher.refresh_exclusive('UC1')
+
+        youtube.release.set()
+        fresh = await inline
+        return refresher, youtube, fresh
+
+    refresher, youtube, fresh = asyncio.run(run())
+    assert fresh["channel"]["title"] == 'Channel'
+    assert youtube.calls == 1
+    assert not refresher.is_refreshing('UC1')
+
+
+def test_concurrent_inline_refreshes_share_one_fetch(db):
+    async def run():
+        youtube = FakeYouTube()
+        refresher = ChannelRefresher(youtube)
+        tasks = [asyncio.create_task(refresher.refresh_inline('UC1')) for _ in range(3)]
+        await asyncio.sleep(0)
+        youtube.release.set()
+        return youtube, refresher, await asyncio.gather(*tasks)
+
+    youtube, refresher, results = asyncio.run(run())
+    assert youtube.calls == 1
+    assert refresher.stats["inline_joined"] == 2
+    assert all(result["recent_videos"] == [{'video_id': 'v1'}] for result in results)
+
+
+def test_failed_inline_refresh_releases_the_claim(db):
+    async def run():
+        youtube = FakeYouTube(fail=True)
+        youtube.release.set()
+        refresher = ChannelRefresher(youtube)
+        try:
+            await refresher.refresh_inline('UC1')
+        except RuntimeError:
+            pass
+        return refresher
+
+    refresher = asyncio.run(run())
+    assert not refresher.is_refreshing('UC1')
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+from services.db_service import DatabaseService
+from services.ttl_policy import TTLPolicy
+
+
+def make_comments(prefix, count):
+    return [{"author": f"{prefix}{i}", "text": f"{prefix} comment {i}"} for i in range(count)]
+
+
+def expire_comments(db, video_id, hours=24 * 365):
+    video = DatabaseService(db).get_video_metadata(video_id)
+    video.comments_refreshed_at = datetime.utcnow() - timedelta(hours=hours)
+    video.updated_at = video.comments_refreshed_at
+    db.commit()
+    return video
+
+
+def test_update_comments_creates_row(db):
+    service = DatabaseService(db)
+    assert service.update_comments("v1", make_comments("a", 5), create_if_missing=True)
+    video = service.get_video_metadata("v1")
+    assert len(video.comments) == 5
+    assert video.comments_refreshed_at is not None
+
+
+def test_shorter_list_is_merged_and_refreshes_freshness(db):
+    service = DatabaseService(db, TTLPolicy())
+    service.update_comments("v1", make_comments("old", 100), create_if_missing=True)
+    video = expire_comments(db, "v1")
+    assert not service.is_video_fresh(video, kind='comments')
+
+    fresh = make_comments("new", 10)
+    assert service.update_comments("v1", fresh)
+
+    video = service.get_video_metadata("v1")
+    assert len(video.comments) == 100
+    assert video.comments[:10] == fresh
+    assert service.is_video_fresh(video, kind='comments')
+
+
+def test_merge_skips_repeated_comments():
+    stored = make_comments("a", 5)
+    merged = DatabaseService.merge_comments(stored[3:4], stored)
+    assert merged[0] == stored[3]
+    assert len(merged) == 5
+    assert merged.count(stored[3]) == 1
+
+
+def test_transcript_write_does_not_refresh_comments(db):
+    service = DatabaseService(db, TTLPolicy())
+    service.update_comments("v1", make_comments("a", 5), create_if_missing=True)
+    expire_comments(db, "v1")
+
+    service.update_transcript("v1", "a transcript")
+    video = service.get_video_metadata("v1")
+    assert service.is_video_fresh(video, kind='transcript')
+    assert not service.is_video_fresh(video, kind='comments')
@@ -0,0 +1,83 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from database import ApiResponseCache
+from services.etag_store import ETagStore
+
+
+def test_only_recurring_requests_are_cacheable():
+    assert ETagStore.is_cacheable('channels', {'id': 'UC1', 'part': 'snippet'})
+    assert ETagStore.is_cacheable('channels', {'forHandle': '@someone'})
+    assert ETagStore.is_cacheable('playlistItems', {'playlistId': 'UU1'})
+    assert not ETagStore.is_cacheable('playlistItems', {'playlistId': 'UU1', 'pageToken': 'CAUQAA'})
+    assert not ETagStore.is_cacheable('videos', {'id': 'a,b,c'})
+    assert not ETagStore.is_cacheable('search', {'q': 'x'})
+
+
+def test_put_then_get_round_trips_through_the_database(db):
+    async def run():
+        await ETagStore().put('k1', 'channels', 'etag-1', {'items': [1]})
+        # A new store has an empty memory tier, so this read hits the table
+        return await ETagStore().get('k1')
+
+    assert asyncio.run(run()) == ('etag-1', {'items': [1]})
+
+
+def test_prune_drops_expired_then_least_recently_used(db):
+    now = datetime.utcnow()
+    for idx in range(5):
+        db.add(ApiResponseCache(
+            cache_key=f'k{idx}', endpoint='channels', etag='e', body={},
+            updated_at=now - timedelta(days=idx * 3), revalidated_at=None
+        ))
+    # Old but recently revalidated - still in use
+    db.add(ApiResponseCache(
+        cache_key='revalidated', endpoint='channels', etag='e', body={},
+        updated_at=now - timedelta(days=30), revalidated_at=now
+    ))
+    db.commit()
+
+    store = ETagStore(ttl_days=7, max_rows=2)
+    # k3 (9 days) and k4 (12 days) expire; k2 and k1 are the least recently used beyond the cap
+    assert store.prune() == 4
+    remaining = {row.cache_key for row in db.query(ApiResponseCache).all()}
+    assert remaining == {'k0', 'revalidated'}
+
+
+def test_expired_rows_are_not_served(db):
+    db.add(ApiResponseCache(
+        cache_key='old', endpoint='channels', etag='e', body={},
+        updated_at=datetime.utcnow() - timedelta(days=10)
+    ))
+    db.commit()
+    assert asyncio.run(ETagStore(ttl_days=7).get('old')) is None
+
+
+def test_memory_entries_expire_with_the_ttl(db):
+    async def run():
+        store = ETagStore(ttl_days=1)
+        await store.put('k1', 'channels', 'etag-1', {'items': [1]})
+        fresh = await store.get('k1')
+        # Age both tiers past the TTL
+        etag, body, _ = store._memory['k1']
+        store._memory['k1'] = (etag, body, datetime.utcnow() - timedelta(days=2))
+        db.query(ApiResponseCache).update({ApiResponseCache.updated_at: datetime.utcnow() - timedelta(days=2)})
+        db.commit()
+        return fresh, await store.get('k1'), store
+
+    fresh, stale, store = asyncio.run(run())
+    assert fresh == ('etag-1', {'items': [1]})
+    assert stale is None
+    assert 'k1' not in store._memory
+
+
+def test_not_modified_renews_the_memory_entry(db):
+    async def run():
+        store = ETagStore(ttl_days=1)
+        await store.put('k1', 'channels', 'etag-1', {'items': [1]})
+        etag, body, _ = store._memory['k1']
+        store._memory['k1'] = (etag, body, datetime.utcnow() - timedelta(hours=23))
+        await store.mark_not_modified('k1')
+        return store._memory['k1'][2]
+
+    assert datetime.utcnow() - asyncio.run(run()) < timedelta(minutes=1)
@@ -0,0 +1,43 @@
+import asyncio
+
+from services.llm_cache import LLMCache
+
+
+def test_round_trip_and_miss(db):
+    async def run():
+        cache = LLMCache(enabled=True, ttl_hours=0, max_bytes=10_000)
+        await cache.put('k1', 'model', 'hello')
+        return cache, await cache.get('k1'), await cache.get('missing')
+
+    cache, hit, miss = asyncio.run(run())
+    assert (hit, miss) == ('hello', None)
+    assert (cache.stats["hits"], cache.stats["misses"]) == (1, 1)
+
+
+def test_least_recently_used_are_evicted_when_over_budget(db):
+    async def run():
+        cache = LLMCache(enabled=True, ttl_hours=0, max_bytes=100)
+        for idx in range(5):
+            await cache.put(f'k{idx}', 'model', 'x' * 30)
+        return cache, [await cache.get(f'k{idx}') for idx in range(5)]
+
+    cache, values = asyncio.run(run())
+    assert values[:2] == [None, None]
+    assert values[2:] == ['x' * 30] * 3
+    assert cache.stats["evicted"] == 2
+    assert cache.get_stats()["size_bytes"] == 90
+
+
+def test_writes_under_budget_skip_eviction(db, monkeypatch):
+    evictions = []
+
+    async def run():
+        cache = LLMCache(enabled=True, ttl_hours=1, max_bytes=10_000, expire_every=3)
+        original = cache._evict
+        monkeypatch.setattr(cache, '_evict', lambda db, expire: (evictions.append(expire), original(db, expire)))
+        for idx in range(7):
+            await cache.put(f'k{idx}', 'model', 'x')
+
+    asyncio.run(run())
+    # First write sweeps leftovers, then every third write
+    assert evictions == [True, True, True]
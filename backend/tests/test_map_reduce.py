@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import pytest
+
+from services.map_reduce import MapReduceAnalyzer
+from services.prompt_budget import PromptBuilder
+
+
+def render_map(videos):
+    return "ANALYZE\n" + "".join(f"{v['title']}\n{v['transcript']}\n" for v in videos)
+
+
+def render_reduce(partials):
+    return "MERGE\n" + "".join(json.dumps(p) for p in partials)
+
+
+class FakeAI:
+    """chat_completion stand-in that records concurrency and can fail chosen prompts"""
+
+    def __init__(self, fail_map=None, fail_reduce=False):
+        self.fail_map = fail_map
+        self.fail_reduce = fail_reduce
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = {"map": 0, "reduce": 0}
+
+    async def chat_completion(self, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        kind = "reduce" if prompt.startswith("MERGE") else "map"
+        self.calls[kind] += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if kind == "map" and self.fail_map and self.fail_map in prompt:
+            raise RuntimeError("map failed")
+        if kind == "reduce" and self.fail_reduce:
+            raise RuntimeError("reduce failed")
+        return json.dumps({"analysis_summary": kind, "key_findings": ["x" * 400]})
+
+
+def make_videos(count, words=400):
+    return [{"title": f"Video {i}", "description": "", "transcript": f"v{i}: " + "word " * words, "comments": []}
+            for i in range(count)]
+
+
+def make_analyzer(ai, context_tokens=4000, **kwargs):
+    builder = PromptBuilder("gpt-4-turbo-preview", completion_tokens=500, context_tokens=context_tokens)
+    return MapReduceAnalyzer(ai, builder, **kwargs)
+
+
+def test_shards_run_with_bounded_concurrency_and_merge():
+    ai = FakeAI()
+    analyzer = make_analyzer(ai, shard_tokens=600, max_workers=2)
+    result, report = asyncio.run(analyzer.run(make_videos(8), render_map, render_reduce, "sys"))
+
+    assert result["analysis_summary"] == "reduce"
+    assert report["shards"] == 8
+    assert report["videos_analyzed"] == 8
+    assert ai.peak <= 2
+    assert ai.calls["map"] == 8
+
+
+def test_failed_shard_costs_coverage_only():
+    ai = FakeAI(fail_map="v3:")
+    analyzer = make_analyzer(ai, shard_tokens=600)
+    result, report = asyncio.run(analyzer.run(make_videos(5), render_map, render_reduce, "sys"))
+
+    assert result["analysis_summary"] == "reduce"
+    assert report["shards_failed"] == 1
+    assert report["videos_analyzed"] == 4
+
+
+def test_failed_reduce_keeps_a_partial():
+    ai = FakeAI(fail_reduce=True)
+    analyzer = make_analyzer(ai, shard_tokens=600)
+    result, report = asyncio.run(analyzer.run(make_videos(4), render_map, render_reduce, "sys"))
+
+    assert result["analysis_summary"] == "map"
+    assert report["reduce_failed"] >= 1
+    assert 0 < report["videos_analyzed"] < 4
+
+
+def test_small_reduce_budget_merges_in_rounds():
+    ai = FakeAI()
+    analyzer = make_analyzer(ai, context_tokens=1200, shard_tokens=300, max_shards=20)
+    result, report = asyncio.run(analyzer.run(make_videos(12, words=100), render_map, render_reduce, "sys"))
+
+    assert result["analysis_summary"] == "reduce"
+    assert report["reduce_rounds"] >= 2
+    assert report["videos_analyzed"] == 12
+
+
+def test_shard_ceiling():
+    analyzer = make_analyzer(FakeAI(), shard_tokens=600, max_shards=3)
+    videos = make_videos(8)
+    assert len(analyzer.plan(videos, render_map, "sys")) == 8
+    with pytest.raises(ValueError):
+        asyncio.run(analyzer.run(videos, render_map, render_reduce, "sys"))
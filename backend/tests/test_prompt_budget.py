@@ -0,0 +1,132 @@
+import pytest
+
+from services.prompt_budget import PromptBuilder, TokenCounter, fair_allocation, pack_consecutive
+
+
+def heuristic_counter():
+    counter = TokenCounter("gpt-4-turbo-preview")
+    counter.encoding = None
+    return counter
+
+
+def render(videos):
+    parts = ["HEADER\n"]
+    for video in videos:
+        parts.append(f"{video['title']}\n{video.get('description', '')}\n{video.get('transcript', '')}\n")
+        parts.extend(f"- {comment['text']}\n" for comment in video.get('comments', []))
+    return "".join(parts)
+
+
+def make_builder(context_tokens, **kwargs):
+    builder = PromptBuilder("gpt-4-turbo-preview", completion_tokens=500, context_tokens=context_tokens, safety_tokens=0, **kwargs)
+    builder.counter = heuristic_counter()
+    return builder
+
+
+def make_video(idx, transcript_words, comments=0):
+    return {
+        "title": f"Video {idx}",
+        "description": "about " * 50,
+        "transcript": f"v{idx} " + "word " * transcript_words,
+        "comments": [{"text": f"comment {c} " + "nice " * 10} for c in range(comments)]
+    }
+
+
+class TestFairAllocation:
+    def test_small_demands_are_met_and_surplus_is_shared(self):
+        assert fair_allocation([10, 100, 1000], 300) == [10, 100, 190]
+
+    def test_everything_fits(self):
+        assert fair_allocation([5, 5], 100) == [5, 5]
+
+    def test_equal_split_when_all_demands_exceed_share(self):
+        assert fair_allocation([100, 200, 300], 90) == [30, 30, 30]
+
+    def test_empty_and_negative_budget(self):
+        assert fair_allocation([], 100) == []
+        assert fair_allocation([10, 20], -5) == [0, 0]
+
+
+class TestPackConsecutive:
+    def test_greedy_ranges(self):
+        assert pack_consecutive([3, 3, 3, 10, 1], 6) == [(0, 2), (2, 3), (3, 4), (4, 5)]
+
+    def test_single_range_when_everything_fits(self):
+        assert pack_consecutive([1, 2, 3], 100) == [(0, 3)]
+
+    def test_empty(self):
+        assert pack_consecutive([], 5) == []
+
+
+class TestTokenCounter:
+    def test_heuristic_errs_high_for_ascii(self):
+        counter = heuristic_counter()
+        assert counter.count("a" * 300) >= 100
+
+    def test_truncate_stays_within_budget(self):
+        counter = heuristic_counter()
+        for text in ["word " * 1000, "héllo wörld 日本語 " * 300]:
+            truncated = counter.truncate(text, 100)
+            assert counter.count(truncated) <= 100
+            assert text.startswith(truncated)
+
+
+class TestFitVideos:
+    def test_short_transcripts_kept_whole_long_ones_trimmed(self):
+        builder = make_builder(4000)
+        videos = [make_video(0, 20), make_video(1, 5000)]
+        fitted = builder.fit_videos(videos, 2000)
+
+        assert fitted[0]["transcript"] == videos[0]["transcript"]
+        assert len(fitted[1]["transcript"]) < len(videos[1]["transcript"])
+        assert videos[1]["transcript"].startswith(fitted[1]["transcript"])
+
+    def test_inputs_are_not_mutated(self):
+        builder = make_builder(4000)
+        videos = [make_video(0, 5000, comments=20)]
+        original = dict(videos[0])
+        builder.fit_videos(videos, 500)
+        assert videos[0] == original
+
+    def test_comments_capped_at_max_comments(self):
+        builder = make_builder(100000, max_comments=5)
+        fitted = builder.fit_videos([make_video(0, 10, comments=20)], 50000)
+        assert len(fitted[0]["comments"]) == 5
+
+    def test_videos_dropped_from_the_end_when_titles_do_not_fit(self):
+        builder = make_builder(4000)
+        fitted = builder.fit_videos([make_video(i, 10) for i in range(10)], 200)
+        assert 0 < len(fitted) < 10
+        assert [v["title"] for v in fitted] == [f"Video {i}" for i in range(len(fitted))]
+
+
+class TestBuild:
+    @pytest.mark.parametrize("context_tokens", [2000, 8000, 50000])
+    def test_prompt_never_exceeds_input_budget(self, context_tokens):
+        builder = make_builder(context_tokens)
+        videos = [make_video(i, 2000 * (i + 1), comments=30) for i in range(20)]
+        prompt, report = builder.build(videos, render, system_prompt="system")
+
+        assert report["prompt_tokens"] <= builder.input_budget
+        assert report["videos_included"] + report["videos_dropped"] == 20
+
+    def test_underestimated_framing_is_refit(self):
+        builder = make_builder(3000)
+        videos = [make_video(i, 3000) for i in range(5)]
+        # Framing that fit_videos can't see: far more than its 30-token allowance per video
+        padded = lambda fitted: render(fitted) + "padding " * (150 * len(fitted))
+        prompt, report = builder.build(videos, padded)
+        assert report["prompt_tokens"] <= builder.input_budget
+
+    def test_raises_when_fixed_text_alone_is_too_big(self):
+        builder = make_builder(1000)
+        with pytest.raises(ValueError):
+            builder.build([make_video(0, 10)], lambda fitted: "x" * 10000 + render(fitted))
+
+    def test_shard_respects_budget(self):
+        builder = make_builder(100000)
+        videos = [make_video(i, 400) for i in range(10)]
+        shards = builder.shard(videos, 1200)
+        assert [v for shard in shards for v in shard] == videos
+        for shard in shards:
+            assert len(shard) == 1 or sum(builder.video_tokens(v) for v in shard) <= 1200
@@ -0,0 +1,148 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+import services.quota_service as quota_module
+from database import ApiQuotaUsage
+
+from services.quota_service import QuotaLedger, QuotaExceededError, quota_day
+from services.youtube_client import YouTubeAPIClient, YouTubeAPIError
+
+
+def test_admit_reserves_units_so_concurrent_calls_cannot_overshoot(db):
+    ledger = QuotaLedger(daily_limit=10, reserve_units=0)
+
+    def try_admit(_):
+        try:
+            return ledger.admit('videos')
+        except QuotaExceededError:
+            return 0
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        admitted = sum(pool.map(try_admit, range(50)))
+
+    assert admitted == 10
+    assert ledger.rejected_calls == 40
+    assert ledger.remaining_today() == 0
+
+
+def test_charge_settles_the_reservation(db):
+    ledger = QuotaLedger(daily_limit=10, reserve_units=0)
+    reserved = ledger.admit('videos')
+    ledger.charge('videos', settles=reserved)
+
+    report = ledger.get_report()
+    assert report["used_today"] == 1
+    assert report["reserved_units"] == 0
+    assert ledger.remaining_today() == 9
+
+
+def test_release_returns_units_for_calls_that_never_ran(db):
+    ledger = QuotaLedger(daily_limit=150, reserve_units=0)
+    reserved = ledger.admit('search')
+    with pytest.raises(QuotaExceededError):
+        ledger.admit('search')
+
+    ledger.release(reserved)
+    assert ledger.admit('search') == 100
+
+
+def test_client_releases_the_reservation_when_the_request_fails(db):
+    ledger = QuotaLedger(daily_limit=100, reserve_units=0)
+    client = YouTubeAPIClient('key', max_retries=0, ledger=ledger)
+
+    def refuse(request):
+        raise httpx.ConnectError("down", request=request)
+
+    client._client = httpx.AsyncClient(base_url="https://example.test", transport=httpx.MockTransport(refuse))
+
+    with pytest.raises(YouTubeAPIError):
+        asyncio.run(client.get('search', q='x'))
+
+    assert ledger.get_report()["reserved_units"] == 0
+    assert ledger.used_today() == 0
+
+
+def make_client(ledger, handler, keys='key'):
+    client = YouTubeAPIClient(keys, max_retries=2, ledger=ledger)
+    client._client = httpx.AsyncClient(base_url="https://example.test", transport=httpx.MockTransport(handler))
+    return client
+
+
+async def no_backoff(seconds):
+    pass
+
+
+def test_retries_are_admitted_again(db, monkeypatch):
+    monkeypatch.setattr(asyncio, 'sleep', no_backoff)
+    ledger = QuotaLedger(daily_limit=1, reserve_units=0)
+    client = make_client(ledger, lambda request: httpx.Response(503))
+
+    with pytest.raises(QuotaExceededError):
+        asyncio.run(client.get('videos', id='v1'))
+
+    assert ledger.used_today() == 1
+    assert ledger.get_report()["reserved_units"] == 0
+
+
+def test_key_failover_is_admitted_again(db):
+    ledger = QuotaLedger(daily_limit=1, reserve_units=0)
+    quota_error = {'error': {'code': 403, 'message': 'quota', 'errors': [{'reason': 'quotaExceeded'}]}}
+    client = make_client(ledger, lambda request: httpx.Response(403, json=quota_error), keys=['k1', 'k2'])
+
+    with pytest.raises(QuotaExceededError):
+        asyncio.run(client.get('videos', id='v1'))
+
+    assert ledger.used_today() == 1
+    assert client.key_pool.failovers == 1
+
+
+def test_sync_day_loads_usage_persisted_earlier_today(db):
+    db.add(ApiQuotaUsage(day=quota_day(), endpoint='videos', units=7, calls=7))
+    db.commit()
+    ledger = QuotaLedger(daily_limit=10, reserve_units=0)
+
+    asyncio.run(ledger.sync_day())
+    assert ledger.used_today() == 7
+    assert ledger.admit('videos', units=3) == 3
+    with pytest.raises(QuotaExceededError):
+        ledger.admit('videos')
+
+
+def test_admit_and_charge_never_touch_the_database(db, monkeypatch):
+    ledger = QuotaLedger(daily_limit=100, reserve_units=0, flush_every_calls=1000)
+    asyncio.run(ledger.sync_day())
+
+    def no_db():
+        raise AssertionError("database used under the ledger lock")
+
+    monkeypatch.setattr(quota_module, 'session_scope', no_db)
+    for _ in range(5):
+        ledger.charge('videos', settles=ledger.admit('videos'))
+    assert ledger.used_today() == 5
+
+
+def test_charges_are_flushed_in_the_background_and_on_close(db):
+    async def run():
+        ledger = QuotaLedger(daily_limit=100, reserve_units=0, flush_every_calls=2)
+        await ledger.sync_day()
+        for _ in range(3):
+            ledger.charge('videos', settles=ledger.admit('videos'))
+        await ledger.close()
+
+    asyncio.run(run())
+    row = db.query(ApiQuotaUsage).filter(ApiQuotaUsage.endpoint == 'videos').one()
+    assert (row.units, row.calls) == (3, 3)
+
+
+def test_charges_before_the_day_is_loaded_are_not_counted_twice(db):
+    ledger = QuotaLedger(daily_limit=100, reserve_units=0, flush_every_calls=1)
+    ledger.charge('videos')          # Flush is held back until today's baseline is loaded
+    ledger.flush()
+    asyncio.run(ledger.sync_day())
+    ledger.flush()
+
+    assert ledger.used_today() == 1
+    assert db.query(ApiQuotaUsage).one().units == 1
@@ -0,0 +1,50 @@
+import time
+
+from database import ChannelCache
+from services.db_service import DatabaseService
+from services.quota_service import QuotaLedger
+from services.refresh_scheduler import RefreshAheadScheduler
+
+
+class FakeRefresher:
+    def within_grace(self, expires_in_seconds):
+        return True
+
+    def is_refreshing(self, channel_id):
+        return False
+
+
+def make_scheduler():
+    return RefreshAheadScheduler(
+        FakeRefresher(), QuotaLedger(daily_limit=1000),
+        half_life_hours=6, min_score=1.5, forget_score=0.25
+    )
+
+
+def age(scheduler, channel_id, hours):
+    scheduler._access[channel_id]["last_access"] = time.monotonic() - hours * 3600
+
+
+def test_single_access_is_forgotten_within_a_day():
+    scheduler = make_scheduler()
+    scheduler.record_access('UC1')
+    age(scheduler, 'UC1', 11)
+    assert scheduler._forget_cold() == 0
+
+    age(scheduler, 'UC1', 13)
+    assert scheduler._forget_cold() == 1
+    assert 'UC1' not in scheduler._access
+
+
+def test_only_repeatedly_accessed_channels_are_refreshed_ahead(db, monkeypatch):
+    monkeypatch.setattr(DatabaseService, 'channel_cache_expires_in', lambda self, channel: 60)
+    for channel_id in ('UC1', 'UC2'):
+        db.add(ChannelCache(channel_id=channel_id, channel_title=channel_id, videos=[]))
+    db.commit()
+
+    scheduler = make_scheduler()
+    scheduler.record_access('UC1')
+    scheduler.record_access('UC2')
+    scheduler.record_access('UC2')
+
+    assert scheduler._pick_candidates() == ['UC2']
@@ -0,0 +1,85 @@
+import asyncio
+
+from services.singleflight import SingleFlight, singleflight
+from services.priority_lanes import BACKGROUND, current_lane, request_lane
+
+
+class Service:
+    def __init__(self):
+        self.singleflight = SingleFlight()
+        self.calls = 0
+        self.lanes = []
+
+    @singleflight('fetch')
+    async def fetch(self, key: str, limit: int = 10):
+        self.calls += 1
+        self.lanes.append(current_lane.get())
+        await asyncio.sleep(0.01)
+        return {"key": key, "limit": limit}
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    async def run():
+        service = Service()
+        results = await asyncio.gather(*[service.fetch("a") for _ in range(5)])
+        return service, results
+
+    service, results = asyncio.run(run())
+    assert service.calls == 1
+    assert all(result == {"key": "a", "limit": 10} for result in results)
+    assert service.singleflight.stats == {"calls": 5, "shared": 4}
+
+
+def test_defaults_normalize_the_key():
+    async def run():
+        service = Service()
+        await asyncio.gather(service.fetch("a"), service.fetch("a", 10), service.fetch(key="a", limit=10))
+        return service
+
+    assert asyncio.run(run()).calls == 1
+
+
+def test_different_arguments_do_not_share():
+    async def run():
+        service = Service()
+        await asyncio.gather(service.fetch("a"), service.fetch("b"), service.fetch("a", 20))
+        return service
+
+    assert asyncio.run(run()).calls == 3
+
+
+def test_followers_get_independent_copies():
+    async def run():
+        service = Service()
+        first, second = await asyncio.gather(service.fetch("a"), service.fetch("a"))
+        first["key"] = "changed"
+        return second
+
+    assert asyncio.run(run())["key"] == "a"
+
+
+def test_flight_is_forgotten_after_completion():
+    async def run():
+        service = Service()
+        await service.fetch("a")
+        await service.fetch("a")
+        return service
+
+    service = asyncio.run(run())
+    assert service.calls == 2
+    assert service.singleflight.get_stats()["in_flight"] == 0
+
+
+def test_lanes_never_share_a_flight():
+    async def background_fetch(service):
+        with request_lane(BACKGROUND):
+            return await service.fetch("a")
+
+    async def run():
+        service = Service()
+        await asyncio.gather(background_fetch(service), service.fetch("a"))
+        return service
+
+    service = asyncio.run(run())
+    assert service.calls == 2
+    assert sorted(service.lanes) == ["background", "interactive"]
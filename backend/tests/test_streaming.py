@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from services.streaming import IncrementalJSONParser
+
+
+DOCUMENT = {
+    "series_suggestions": [
+        {"title": "Part \"one\"", "tags": ["a", "b"]},
+        {"title": "Part {two}", "tags": []}
+    ],
+    "summary": "done"
+}
+
+
+def feed_in_chunks(parser, text, size):
+    events = []
+    for start in range(0, len(text), size):
+        events.extend(parser.feed(text[start:start + size]))
+    return events
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_items_are_emitted_as_they_complete(size):
+    parser = IncrementalJSONParser(max_depth=2)
+    events = feed_in_chunks(parser, json.dumps(DOCUMENT), size)
+
+    assert events == [
+        (["series_suggestions", 0], DOCUMENT["series_suggestions"][0]),
+        (["series_suggestions", 1], DOCUMENT["series_suggestions"][1]),
+        (["series_suggestions"], DOCUMENT["series_suggestions"]),
+        (["summary"], "done"),
+    ]
+    assert parser.done
+    assert parser.result() == DOCUMENT
+
+
+def test_first_item_arrives_before_the_document_closes():
+    parser = IncrementalJSONParser()
+    text = json.dumps(DOCUMENT)
+    cut = text.index('{"title": "Part {two}"')
+
+    events = parser.feed(text[:cut])
+    assert events == [(["series_suggestions", 0], DOCUMENT["series_suggestions"][0])]
+    assert not parser.done
+
+
+def test_preamble_and_code_fence_are_skipped():
+    parser = IncrementalJSONParser()
+    parser.feed("Here you go:\n```json\n" + json.dumps({"a": 1}) + "\n```")
+    assert parser.result() == {"a": 1}
+
+
+def test_deeper_values_are_not_emitted():
+    parser = IncrementalJSONParser(max_depth=1)
+    events = parser.feed(json.dumps(DOCUMENT))
+    assert [path for path, _ in events] == [["series_suggestions"], ["summary"]]
+
+
+def test_result_before_completion_raises():
+    parser = IncrementalJSONParser()
+    parser.feed('{"a": [1, 2')
+    with pytest.raises(ValueError):
+        parser.result()
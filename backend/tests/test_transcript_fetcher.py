@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+import pytest
+
+from services import transcript_fetcher
+from services.transcript_fetcher import TranscriptFetcher
+
+
+@pytest.fixture
+def slow_api(monkeypatch):
+    """get_transcript that blocks its worker thread for delays[video_id] seconds"""
+    calls = []
+    delays = {}
+
+    def get_transcript(video_id):
+        calls.append(video_id)
+        time.sleep(delays.get(video_id, 0))
+        return [{"text": video_id, "start": 0, "duration": 1}]
+
+    monkeypatch.setattr(transcript_fetcher.YouTubeTranscriptApi, "get_transcript", staticmethod(get_transcript))
+    return calls, delays
+
+
+def test_fetch_returns_transcript(slow_api):
+    fetcher = TranscriptFetcher(max_workers=2, max_concurrency=2, timeout_seconds=1)
+    assert asyncio.run(fetcher.fetch("a")) == [{"text": "a", "start": 0, "duration": 1}]
+    assert fetcher.get_metrics()["fetched"] == 1
+    fetcher.shutdown()
+
+
+def test_timed_out_thread_keeps_its_slot_until_it_finishes(slow_api):
+    calls, delays = slow_api
+    delays["slow"] = 0.3
+    fetcher = TranscriptFetcher(max_workers=4, max_concurrency=1, timeout_seconds=0.05, max_retries=0)
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await fetcher.fetch("slow")
+        # The caller gave up but the thread is still running, so the only slot stays taken
+        assert fetcher.scheduler.get_metrics()["in_flight"] == 1
+        started = time.monotonic()
+        result = await fetcher.fetch("fast")
+        return result, time.monotonic() - started
+
+    result, waited = asyncio.run(run())
+    assert result[0]["text"] == "fast"
+    assert waited >= 0.15
+    assert fetcher.get_metrics()["timeouts"] == 1
+    assert fetcher.scheduler.get_metrics()["in_flight"] == 0
+    fetcher.shutdown()
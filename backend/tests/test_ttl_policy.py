@@ -0,0 +1,14 @@
+from services.ttl_policy import AdaptiveTTLPolicy, TTLPolicy
+
+
+def test_fixed_policy_describes_its_single_ttl():
+    assert TTLPolicy(3600).describe('channel') == {"policy": "fixed", "ttl_seconds": 3600}
+
+
+def test_adaptive_description_matches_the_ttls_it_applies():
+    policy = AdaptiveTTLPolicy()
+    described = policy.describe('comments')
+    assert described["policy"] == "adaptive"
+    # Comments scale the one-day tier (1h) by 2
+    assert described["age_tiers"][0] == {"published_within_days": 1, "ttl_seconds": 7200.0}
+    assert described["age_tiers"][-1]["published_within_days"] is None
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from services.db_service import DatabaseService
+from services.youtube_service import YouTubeService
+
+
+class FakeClient:
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+
+    async def get(self, resource, **params):
+        self.calls.append((resource, params))
+        return self.responses[resource]
+
+
+def make_service(responses):
+    service = YouTubeService(api_key='key')
+    service.client = FakeClient(responses)
+    return service
+
+
+def test_unknown_channel_is_reported_as_not_found(db):
+    # With the fields mask the API leaves 'items' out when nothing matches
+    service = make_service({'channels': {'etag': 'e'}})
+    with pytest.raises(ValueError, match="Channel not found: UCmissing"):
+        asyncio.run(service.get_channel_info('UCmissing'))
+
+
+def comment_threads(count):
+    return {'items': [
+        {'snippet': {'topLevelComment': {'snippet': {
+            'authorDisplayName': f'user{idx}', 'textDisplay': f'comment {idx}',
+            'likeCount': 0, 'publishedAt': '2026-01-01T00:00:00Z'
+        }}}}
+        for idx in range(count)
+    ]}
+
+
+def store_comments(db, video_id, count, comment_count=None):
+    DatabaseService(db).save_video_metadata(
+        video_id=video_id, title='t', thumbnail_url='', view_count=1, channel_id='UC1', channel_title='c',
+        comments=[{'author': f'user{idx}', 'text': f'comment {idx}'} for idx in range(count)],
+        comment_count=comment_count
+    )
+
+
+def test_short_stored_comment_list_falls_through_to_the_network(db):
+    store_comments(db, 'v1', 20)
+    service = make_service({'commentThreads': comment_threads(100)})
+
+    comments = asyncio.run(service.get_comments('v1', max_results=100))
+    assert len(comments) == 100
+    assert len(service.client.calls) == 1
+
+
+def test_stored_comments_are_served_when_long_enough_or_complete(db):
+    store_comments(db, 'v1', 20)
+    store_comments(db, 'v2', 5, comment_count=5)
+    service = make_service({'commentThreads': comment_threads(100)})
+
+    assert len(asyncio.run(service.get_comments('v1', max_results=10))) == 10
+    assert len(asyncio.run(service.get_comments('v2', max_results=100))) == 5
+    assert service.client.calls == []